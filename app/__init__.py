@@ -1,23 +1,62 @@
-# Leave this file empty or use it to expose classes
+# Expose the core classes. GUI modules (Tk, ReportLab) are only imported on demand.
 from .database import Database
 from .auth import AuthManager
 
-import logging
 import sys
-from pathlib import Path
-
-# Create a logs directory if it doesn't exist
-Path("logs").mkdir(exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler("biolab.log"), # Saves to a file
-        logging.StreamHandler(sys.stdout)      # Still prints to terminal
-    ]
-)
-
-logger = logging.getLogger("BioLab")
-logger.info("BioLab System logging initialized.")
+import atexit
+import logging
+import logging.handlers
+import queue
+
+_listener = None
+
+
+def _stop_listener():
+    """Writes out queued records and closes the log handlers."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+# Drains the queue on exit so the last records reach the file.
+atexit.register(_stop_listener)
+
+
+def configure_logging(level=logging.INFO, stream=sys.stdout, console_level=None, log_file="biolab.log",
+                      max_bytes=5 * 1024 * 1024, backup_count=5):
+    """
+    Sets up logging for the whole application. Called once by the entry point
+    (main.py or the CLI) rather than on import. stream=None logs to the file only.
+
+    Loggers only put records on a queue; a QueueListener thread does the file
+    and console I/O, so logging never blocks the Tk thread on disk writes.
+    The log file rotates at max_bytes, keeping backup_count old files.
+    """
+    global _listener
+    _stop_listener()
+
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding="utf-8")
+    handlers = [file_handler]
+    if stream is not None:
+        console = logging.StreamHandler(stream)  # Still prints to terminal
+        console.setLevel(console_level or level)
+        handlers.append(console)
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    logging.getLogger("BioLab").info("BioLab System logging initialized.")
+    return _listener
@@ -0,0 +1,282 @@
+import heapq
+import logging
+import threading
+from datetime import date, datetime, timedelta
+
+from .expiry import to_day, JD_OFFSET, EXPIRING_SOON_DAYS, EXPIRY_TABLES
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK = 500
+
+
+def create_alert_table(conn):
+    """Alert records written by ExpiryWatcher; UNIQUE keeps each alert from being raised twice."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS expiry_alerts
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, item_id INTEGER NOT NULL,
+                     name TEXT, expiry TEXT, kind TEXT NOT NULL, due_day INTEGER NOT NULL,
+                     created_at TEXT NOT NULL, acknowledged INTEGER NOT NULL DEFAULT 0,
+                     UNIQUE (tbl, item_id, kind, expiry))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expiry_alerts_open ON expiry_alerts(acknowledged, id)")
+    # Last day whose events have been raised, so a restart catches up on missed days.
+    conn.execute("""CREATE TABLE IF NOT EXISTS expiry_watch
+                    (id INTEGER PRIMARY KEY CHECK (id = 1), checked_through INTEGER NOT NULL)""")
+
+
+def day_to_date(day):
+    return date.fromordinal(day - JD_OFFSET)
+
+
+class ExpiryWatcher:
+    """
+    Background thread that raises expiry alerts when they fall due.
+
+    Each dated item has two events: "expiring" lead_days before its expiry and
+    "expired" the day after. Events are loaded into a heap a window of
+    window_days at a time with indexed range queries on expiry_day; the thread
+    sleeps until the next event (or midnight) and writes an expiry_alerts row
+    for each one that fires, then passes the new alerts to on_alert (called on
+    the watcher thread). notify_change() re-reads one item after an edit, so
+    changed expiry dates take effect without rescanning the tables; rows
+    written any other way (imports, sync, other clients) are picked up from
+    change_log every poll_s seconds. Items already expiring or expired get an
+    alert for the latest event they have passed, unless they have one already.
+    """
+    def __init__(self, db, on_alert=None, lead_days=EXPIRING_SOON_DAYS, window_days=7, max_catch_up_days=31,
+                 tables=EXPIRY_TABLES, poll_s=30):
+        self.db = db
+        self.on_alert = on_alert
+        self.lead_days = lead_days
+        self.window_days = window_days
+        self.max_catch_up_days = max_catch_up_days
+        self.tables = tables
+        self.poll_s = poll_s
+        self._heap = []           # (due_day, table, item_id, kind, expiry_day)
+        self._current = {}        # (table, item_id) -> expiry_day the heap entries were made for
+        self._loaded_until = None
+        self._seq = None          # Last change_log entry looked at
+        self._data_version = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="expiry-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    # --- Event queue ---
+
+    def _events(self, table, item_id, expiry_day):
+        yield expiry_day - self.lead_days, table, item_id, "expiring", expiry_day
+        yield expiry_day + 1, table, item_id, "expired", expiry_day
+
+    def _load(self, first_day, last_day):
+        """Queues every event due in [first_day, last_day] (two index range scans per table)."""
+        loaded = 0
+        for table in self.tables:
+            rows = self.db.query(f"""SELECT id, expiry_day FROM {table}
+                                     WHERE expiry_day BETWEEN ? AND ? OR expiry_day BETWEEN ? AND ?""",
+                                 (first_day + self.lead_days, last_day + self.lead_days, first_day - 1, last_day - 1))
+            with self._cond:
+                for item_id, expiry_day in rows:
+                    self._current[(table, item_id)] = expiry_day
+                    for event in self._events(table, item_id, expiry_day):
+                        if first_day <= event[0] <= last_day:
+                            heapq.heappush(self._heap, event)
+                            loaded += 1
+        self._loaded_until = last_day
+        logger.debug(f"Expiry watcher: queued {loaded} event(s) due {day_to_date(first_day)}..{day_to_date(last_day)}")
+
+    def _load_missed(self, first_day, today):
+        """
+        Queues the latest event each item has passed by today if it fell due
+        before first_day and has no alert yet: items already expiring or
+        expired when the watcher first runs, written while it was not running,
+        or whose events lie beyond the catch-up limit.
+        """
+        loaded = 0
+        for table in self.tables:
+            rows = self.db.query(f"""SELECT id, expiry_day FROM {table} t WHERE expiry_day < ?
+                                     AND NOT EXISTS (SELECT 1 FROM expiry_alerts a
+                                                     WHERE a.tbl = ? AND a.item_id = t.id AND a.expiry = t.expiry
+                                                     AND a.kind = CASE WHEN t.expiry_day < ?
+                                                                       THEN 'expired' ELSE 'expiring' END)""",
+                                 (first_day + self.lead_days, table, today), cache=False)
+            with self._cond:
+                for item_id, expiry_day in rows:
+                    event = [e for e in self._events(table, item_id, expiry_day) if e[0] <= today][-1]
+                    if event[0] >= first_day:
+                        continue    # Queued by _load
+                    self._current[(table, item_id)] = expiry_day
+                    heapq.heappush(self._heap, event)
+                    loaded += 1
+        logger.debug(f"Expiry watcher: queued {loaded} event(s) due before {day_to_date(first_day)}")
+
+    def _queue_item(self, table, item_id, expiry_day, today):
+        """Requeues the events of an added or edited item: the latest one it has passed and those still ahead."""
+        key = (table, item_id)
+        if expiry_day is None:
+            self._current.pop(key, None)
+            return
+        if self._current.get(key) == expiry_day or self._loaded_until is None:
+            return
+        self._current[key] = expiry_day
+        events = list(self._events(table, item_id, expiry_day))
+        passed = [e for e in events if e[0] <= today]
+        if passed:
+            heapq.heappush(self._heap, passed[-1])
+        for event in events:
+            # Later events are picked up when their window is loaded.
+            if today < event[0] <= self._loaded_until:
+                heapq.heappush(self._heap, event)
+
+    def notify_change(self, table, item_id):
+        """Call after an item is added, edited or deleted; its events are recomputed."""
+        if table not in self.tables:
+            return
+        rows = self.db.query(f"SELECT expiry_day FROM {table} WHERE id=?", (item_id,), cache=False)
+        with self._cond:
+            self._queue_item(table, item_id, rows[0][0] if rows else None, to_day(date.today()))
+            self._cond.notify()
+
+    def _max_seq(self):
+        return self.db.query("SELECT IFNULL(MAX(seq), 0) FROM change_log", cache=False)[0][0]
+
+    def _poll_changes(self, today):
+        """
+        Requeues the items other writers changed since the last poll (see
+        changes.ChangeFeed); a change_log pruned past our position means a rescan.
+        """
+        data_version = self.db.connection().execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        last, newest = self._seq, self._max_seq()
+        if newest == last:
+            return
+        self._seq = newest
+        oldest = self.db.query("SELECT MIN(seq) FROM change_log", cache=False)[0][0]
+        if oldest > last + 1:
+            self._load_missed(today + 1, today)
+            self._load(today + 1, self._loaded_until)
+            return
+        for table in self.tables:
+            ids = [r[0] for r in self.db.query("""SELECT DISTINCT row_id FROM change_log
+                                                  WHERE tbl = ? AND seq > ? AND seq <= ?""",
+                                               (table, last, newest), cache=False)]
+            for i in range(0, len(ids), FETCH_CHUNK):
+                chunk = ids[i:i + FETCH_CHUNK]
+                found = dict(self.db.query(f"SELECT id, expiry_day FROM {table} "
+                                           f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk, cache=False))
+                with self._cond:
+                    for item_id in chunk:
+                        self._queue_item(table, item_id, found.get(item_id), today)
+
+    # --- Worker ---
+
+    def _due(self, today):
+        """Pops every valid event due by today."""
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= today:
+                event = heapq.heappop(self._heap)
+                # Entries for an expiry date that has since changed are stale.
+                if self._current.get((event[1], event[2])) == event[4]:
+                    due.append(event)
+        return due
+
+    def _raise(self, events):
+        """Writes alert records; returns the ones that were not raised before."""
+        now = datetime.now().isoformat(timespec="seconds")
+        alerts = []
+        with self.db.transaction() as conn:
+            for due_day, table, item_id, kind, expiry_day in events:
+                row = conn.execute(f"SELECT name, expiry FROM {table} WHERE id=? AND expiry_day=?",
+                                   (item_id, expiry_day)).fetchone()
+                if row is None:
+                    continue
+                cur = conn.execute("""INSERT OR IGNORE INTO expiry_alerts
+                                      (tbl, item_id, name, expiry, kind, due_day, created_at)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                                   (table, item_id, row[0], row[1], kind, due_day, now))
+                if cur.rowcount:
+                    alerts.append({"id": cur.lastrowid, "table": table, "item_id": item_id, "name": row[0],
+                                   "expiry": row[1], "kind": kind})
+        return alerts
+
+    def _seconds_to_midnight(self):
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return (midnight - now).total_seconds() + 1
+
+    def _checked_through(self):
+        rows = self.db.query("SELECT checked_through FROM expiry_watch WHERE id = 1", cache=False)
+        return rows[0][0] if rows else None
+
+    def _run(self):
+        try:
+            self._watch()
+        finally:
+            self.db.release()
+
+    def _watch(self):
+        today = to_day(date.today())
+        checked = self._checked_through()
+        self._data_version = self.db.connection().execute("PRAGMA data_version").fetchone()[0]
+        self._seq = self._max_seq()
+        # Raise what fell due while the application was closed (within limits).
+        first = today if checked is None else max(checked + 1, today - self.max_catch_up_days)
+        self._load_missed(min(first, today), today)
+        self._load(min(first, today), today + self.window_days)
+        while True:
+            today = to_day(date.today())
+            if today >= self._loaded_until:
+                self._load(self._loaded_until + 1, today + self.window_days)
+            self._poll_changes(today)
+            events = self._due(today)
+            if events:
+                try:
+                    alerts = self._raise(events)
+                except Exception as e:
+                    logger.error(f"Expiry watcher: failed to record alerts: {e}")
+                    alerts = []
+                if alerts:
+                    logger.info(f"Expiry watcher: {len(alerts)} new alert(s)")
+                    if self.on_alert:
+                        try:
+                            self.on_alert(alerts)
+                        except Exception as e:
+                            logger.error(f"Expiry watcher: alert callback failed: {e}")
+            if checked != today:
+                checked = today
+                self.db.execute("INSERT INTO expiry_watch (id, checked_through) VALUES (1, ?) "
+                                "ON CONFLICT(id) DO UPDATE SET checked_through = excluded.checked_through", (today,))
+            with self._cond:
+                if self._stopped:
+                    break
+                if not (self._heap and self._heap[0][0] <= today):
+                    # Nothing else is due today: sleep until midnight, the next poll or the next change.
+                    self._cond.wait(min(self._seconds_to_midnight(), self.poll_s))
+                if self._stopped:
+                    break
+
+
+def open_alerts(db, limit=100):
+    """Unacknowledged alerts, newest first."""
+    return db.query("""SELECT id, tbl, item_id, name, expiry, kind, created_at FROM expiry_alerts
+                       WHERE acknowledged = 0 ORDER BY id DESC LIMIT ?""", (limit,))
+
+
+def acknowledge(db, alert_ids=None):
+    """Marks the given alerts (or all open ones) as seen."""
+    if alert_ids is None:
+        return db.execute("UPDATE expiry_alerts SET acknowledged = 1 WHERE acknowledged = 0")
+    ids = list(alert_ids)
+    if not ids:
+        return True
+    return db.execute(f"UPDATE expiry_alerts SET acknowledged = 1 WHERE id IN ({', '.join('?' * len(ids))})", ids)
@@ -0,0 +1,146 @@
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+
+from .importer import TABLE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+INSERT_SQL = """INSERT INTO audit_log (ts, user, action, tbl, row_id, before, after)
+                VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+
+def create_audit_table(conn):
+    """Structured audit trail; indexed for 'who changed this record' and per-user history."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS audit_log
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT NOT NULL, user TEXT, action TEXT NOT NULL,
+                     tbl TEXT, row_id INTEGER, before TEXT, after TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_row ON audit_log(tbl, row_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log(user, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_ts ON audit_log(ts)")
+
+
+class AuditTrail:
+    """
+    Non-blocking writer for audit_log. record() only puts the event on a queue;
+    a background thread writes whatever has accumulated (up to batch_size rows,
+    waiting at most linger_s for more) with one executemany per transaction.
+    The thread starts with the first event; flush() waits until everything
+    queued so far is stored and close() does the same before stopping.
+    """
+    _STOP = object()
+
+    def __init__(self, db, batch_size=500, linger_s=0.5):
+        self.db = db
+        self.batch_size = batch_size
+        self.linger_s = linger_s
+        self.user = None          # Set by AuthManager.login (or the CLI) for the session
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # --- Recording ---
+
+    def record(self, action, table=None, row_id=None, before=None, after=None, user=None):
+        """Queues one event; before/after are dicts (or anything JSON-serializable)."""
+        event = (datetime.now().isoformat(timespec="milliseconds"), user or self.user, action, table, row_id,
+                 None if before is None else json.dumps(before, default=str),
+                 None if after is None else json.dumps(after, default=str))
+        self._ensure_started()
+        self._queue.put(event)
+
+    def snapshot(self, table, row_id):
+        """Current values of a row's user-facing columns (None if it does not exist)."""
+        cols = TABLE_COLUMNS[table]
+        rows = self.db.query(f"SELECT {', '.join(cols)} FROM {table} WHERE id=?", (row_id,), cache=False)
+        return dict(zip(cols, rows[0])) if rows else None
+
+    def record_change(self, action, table, row_id, before=None):
+        """
+        Records an insert, update or delete of one inventory row. Pass the
+        snapshot() taken before an update or delete; the new values are read
+        here. Updates keep only the columns that changed.
+        """
+        after = None if action == "delete" else self.snapshot(table, row_id)
+        if action == "update" and before and after:
+            changed = [c for c in after if after[c] != before.get(c)]
+            before = {c: before.get(c) for c in changed}
+            after = {c: after[c] for c in changed}
+        self.record(action, table, row_id, before, after)
+
+    # --- Writer ---
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        try:
+            self._drain()
+        finally:
+            self.db.release()
+
+    def _drain(self):
+        stop = False
+        while not stop:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.linger_s
+            while True:
+                if item is self._STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)     # flush(): everything queued before it is in this batch
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        if self.db.executemany(INSERT_SQL, batch):
+            logger.debug(f"Audit: wrote {len(batch)} event(s)")
+        else:
+            # The text log keeps a copy, so nothing is lost silently.
+            for event in batch:
+                logger.error(f"Audit: could not store event {event}")
+
+    def flush(self, timeout=10):
+        """Blocks until the events queued so far are written."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        """Writes the remaining events and stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def history(db, table, row_id, limit=100):
+    """Audit events of one record, newest first (index lookup on tbl, row_id)."""
+    return db.query("""SELECT id, ts, user, action, before, after FROM audit_log
+                       WHERE tbl=? AND row_id=? ORDER BY id DESC LIMIT ?""", (table, row_id, limit), cache=False)
+
+
+def user_activity(db, user, since=None, limit=100):
+    """Audit events of one user, newest first, optionally from an ISO timestamp on."""
+    return db.query("""SELECT id, ts, action, tbl, row_id, before, after FROM audit_log
+                       WHERE user=? AND ts >= ? ORDER BY ts DESC LIMIT ?""", (user, since or "", limit), cache=False)
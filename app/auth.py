@@ -1,6 +1,5 @@
 import hashlib
 import logging
-from tkinter import messagebox
 
 logger = logging.getLogger(__name__)
 
@@ -8,6 +7,7 @@ class AuthManager:
     """Handles user security, password hashing, and session validation."""
     def __init__(self, db):
         self.db = db
+        self.current_user = None
 
     def hash_password(self, password):
         """Hashes plain text password using SHA-256."""
@@ -19,24 +19,63 @@ class AuthManager:
             return False
         
         hashed = self.hash_password(password)
-        res = self.db.query("SELECT * FROM users WHERE username=? AND password=?", (username, hashed))
+        res = self.db.query("SELECT * FROM users WHERE username=? AND password=?", (username, hashed), cache=False)
         
         if res:
             logger.info(f"AUDIT: Successful login for user '{username}'")
+            self.current_user = self.db.audit.user = username
+            self.db.audit.record("login", user=username)
             return True
         
         logger.warning(f"SECURITY: Failed login attempt for '{username}'")
+        self.db.audit.record("login_failed", after={"username": username}, user=username)
         return False
 
-    def register(self, username, password):
-        """Creates a new user account with a hashed password."""
+    def create_user(self, username, password):
+        """Stores a new user with a hashed password. Returns False if the name is taken."""
         if not username or not password:
-            messagebox.showwarning("Input Error", "Username and Password cannot be empty.")
             return False
-            
         hashed = self.hash_password(password)
         if self.db.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed)):
             logger.info(f"AUDIT: Registered new user '{username}'")
+            self.db.audit.record("user_add", "users", after={"username": username})
+            return True
+        return False
+
+    def set_password(self, username, password):
+        """Replaces a user's password. Returns False if the user does not exist."""
+        if not password or not self.db.query("SELECT 1 FROM users WHERE username=?", (username,)):
+            return False
+        if self.db.execute("UPDATE users SET password=? WHERE username=?", (self.hash_password(password), username)):
+            logger.info(f"AUDIT: Password changed for user '{username}'")
+            self.db.audit.record("user_passwd", "users", after={"username": username})
+            return True
+        return False
+
+    def delete_user(self, username):
+        """Removes a user account. Returns False if the user does not exist."""
+        if not self.db.query("SELECT 1 FROM users WHERE username=?", (username,)):
+            return False
+        if self.db.execute("DELETE FROM users WHERE username=?", (username,)):
+            logger.info(f"AUDIT: Deleted user '{username}'")
+            self.db.audit.record("user_delete", "users", before={"username": username})
+            return True
+        return False
+
+    def list_users(self):
+        """Returns all usernames in alphabetical order."""
+        return [r[0] for r in self.db.query("SELECT username FROM users ORDER BY username")]
+
+    def register(self, username, password):
+        """Creates a new user account from the login screen, reporting the outcome in a dialog."""
+        # Imported here so that headless use of AuthManager does not load Tk.
+        from tkinter import messagebox
+
+        if not username or not password:
+            messagebox.showwarning("Input Error", "Username and Password cannot be empty.")
+            return False
+            
+        if self.create_user(username, password):
             messagebox.showinfo("Success", "Account created successfully!")
             return True
         
@@ -0,0 +1,228 @@
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import namedtuple
+
+from .export import open_readonly
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = "backups"          # next to the database file
+KEEP_SNAPSHOTS = 14
+PAGES_PER_STEP = 1024           # 4 MB with the default page size
+STEP_SLEEP_S = 0.01
+STAMP_FORMAT = "%Y%m%d-%H%M%S-%f"
+OLD_STAMP_FORMAT = "%Y%m%d-%H%M%S"     # snapshots written before microseconds were added
+RETRY_S = 3600
+
+BackupResult = namedtuple("BackupResult", "path pages size_bytes seconds pruned")
+
+
+class BackupError(Exception):
+    """A snapshot that could not be written or failed its integrity check."""
+
+
+class BackupCancelled(BackupError):
+    """Raised inside the copy when the backup service is stopped."""
+
+
+def backup_dir(db_name):
+    return Path(db_name).resolve().parent / BACKUP_DIR
+
+
+def snapshots(db_name, dest_dir=None):
+    """Snapshots of a database (db-YYYYmmdd-HHMMSS-ffffff.db[.gz]) in dest_dir, oldest first."""
+    dest = Path(dest_dir) if dest_dir else backup_dir(db_name)
+    stem = Path(db_name).stem
+    found = []
+    for path in dest.glob(f"{stem}-*.db*"):
+        stamp = path.name[len(stem) + 1:].split(".")[0]
+        for fmt in (STAMP_FORMAT, OLD_STAMP_FORMAT):
+            try:
+                found.append((datetime.strptime(stamp, fmt), path))
+                break
+            except ValueError:
+                pass    # The other format, or not one of ours
+    return [path for _, path in sorted(found)]
+
+
+def check_integrity(conn):
+    """Raises BackupError unless PRAGMA integrity_check reports ok."""
+    problems = [r[0] for r in conn.execute("PRAGMA integrity_check(20)")]
+    if problems != ["ok"]:
+        raise BackupError("Integrity check failed: " + "; ".join(problems))
+
+
+def backup_database(db_name, dest_dir=None, keep=KEEP_SNAPSHOTS, compress=True, pages=PAGES_PER_STEP,
+                    sleep_s=STEP_SLEEP_S, cancel=None):
+    """
+    Writes a consistent snapshot of a live database with the SQLite online
+    backup API, `pages` pages per step with a short sleep in between.
+
+    The copy is read through its own read-only connection. In WAL mode a read
+    transaction is held for the whole copy: writers carry on (they only
+    append to the WAL) and the snapshot is the state at the start. In other
+    journal modes the shared lock is only held during each step, and SQLite
+    restarts the copy if another connection commits meanwhile. The copy is
+    integrity-checked, gzip-compressed (.db.gz) and renamed into place, and
+    all but the newest `keep` snapshots are deleted. An existing snapshot is
+    never overwritten (BackupError). Setting the cancel event
+    aborts the copy (BackupCancelled). Returns a BackupResult.
+    """
+    start = time.perf_counter()
+    dest = Path(dest_dir) if dest_dir else backup_dir(db_name)
+    dest.mkdir(parents=True, exist_ok=True)
+    name = f"{Path(db_name).stem}-{datetime.now().strftime(STAMP_FORMAT)}.db"
+    final = dest / (name + ".gz" if compress else name)
+    tmp = dest / (name + ".part")
+    if final.exists() or tmp.exists():
+        raise BackupError(f"{final} already exists")
+
+    def step(status, remaining, total):
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled("Backup cancelled")
+        if remaining and sleep_s:
+            time.sleep(sleep_s)    # Leaves the disk (and, outside WAL, the lock) to the application
+
+    src = open_readonly(db_name)
+    dst = sqlite3.connect(tmp)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1")    # Starts the read snapshot
+        src.backup(dst, pages=pages, progress=step)
+        src.rollback()
+        # A standalone file: no WAL flag in the header of the copy.
+        dst.execute("PRAGMA journal_mode=DELETE")
+        check_integrity(dst)
+        total_pages = dst.execute("PRAGMA page_count").fetchone()[0]
+        dst.close()
+        if compress:
+            with open(tmp, "rb") as f_in, gzip.open(f"{final}.part", "wb", compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.replace(f"{final}.part", final)
+            tmp.unlink()
+        else:
+            os.replace(tmp, final)
+    except BaseException:
+        dst.close()
+        for leftover in (tmp, Path(f"{final}.part")):
+            leftover.unlink(missing_ok=True)
+        raise
+    finally:
+        src.close()
+
+    pruned = prune(db_name, dest, keep)
+    result = BackupResult(str(final), total_pages, final.stat().st_size, time.perf_counter() - start, pruned)
+    logger.info(f"Backup written: {final} ({total_pages:,} pages, {result.size_bytes / 1e6:.1f} MB, "
+                f"{result.seconds:.1f} s, {len(pruned)} old snapshot(s) removed)")
+    return result
+
+
+def prune(db_name, dest_dir=None, keep=KEEP_SNAPSHOTS):
+    """Deletes all but the newest `keep` snapshots; returns the removed paths."""
+    old = snapshots(db_name, dest_dir)[:-keep] if keep > 0 else []
+    for path in old:
+        try:
+            path.unlink()
+        except OSError as e:
+            logger.error(f"Could not remove old backup {path}: {e}")
+    return [str(p) for p in old]
+
+
+def verify_snapshot(path):
+    """Integrity-checks a snapshot (decompressing .gz ones to a temporary file); raises BackupError."""
+    path = Path(path)
+    check_path = path
+    if path.suffix == ".gz":
+        check_path = path.with_name(path.name + ".check")
+        with gzip.open(path, "rb") as f_in, open(check_path, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    try:
+        conn = open_readonly(check_path)
+        try:
+            check_integrity(conn)
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"Not a readable database: {e}")
+    finally:
+        if check_path != path:
+            check_path.unlink(missing_ok=True)
+
+
+class BackupService:
+    """
+    Background thread taking a snapshot every interval_s seconds (see
+    backup_database). The first one is due interval_s after the newest
+    existing snapshot, so restarting the application does not trigger a
+    backup each time. run_now() asks for one immediately; stop() aborts a
+    copy in progress. on_done(result_or_exception) is called on the backup
+    thread.
+    """
+    def __init__(self, db_name, interval_s=24 * 3600, dest_dir=None, keep=KEEP_SNAPSHOTS, on_done=None, **options):
+        self.db_name = db_name
+        self.interval_s = interval_s
+        self.dest_dir = dest_dir
+        self.keep = keep
+        self.on_done = on_done
+        self.options = options
+        self.last_result = None
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+        self._requested = False
+        self._thread = threading.Thread(target=self._run, name="backup-service", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._cancel.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def run_now(self):
+        with self._cond:
+            self._requested = True
+            self._cond.notify()
+
+    def _next_due(self):
+        existing = snapshots(self.db_name, self.dest_dir)
+        last = existing[-1].stat().st_mtime if existing else 0
+        return last + self.interval_s
+
+    def _run(self):
+        due = self._next_due()
+        while not self._cancel.is_set():
+            with self._cond:
+                while not (self._requested or self._cancel.is_set()) and time.time() < due:
+                    self._cond.wait(due - time.time())
+                self._requested = False
+            if self._cancel.is_set():
+                break
+            try:
+                outcome = self.last_result = backup_database(self.db_name, self.dest_dir, self.keep,
+                                                             cancel=self._cancel, **self.options)
+            except BackupCancelled:
+                logger.info("Backup cancelled at shutdown.")
+                break
+            except Exception as e:
+                logger.error(f"Backup failed: {e}")
+                outcome = e
+            # A failed backup is retried within the hour.
+            due = time.time() + (self.interval_s if not isinstance(outcome, Exception) else
+                                 min(self.interval_s, RETRY_S))
+            if self.on_done:
+                try:
+                    self.on_done(outcome)
+                except Exception as e:
+                    logger.error(f"Backup callback failed: {e}")
@@ -0,0 +1,90 @@
+import logging
+
+from .importer import TABLE_COLUMNS
+from .quantities import QUANTITY_COLUMNS, parse_quantity, parse_adjustment, adjust_quantity
+
+logger = logging.getLogger(__name__)
+
+# Columns the grids can set on many selected rows at once.
+BATCH_FIELDS = {
+    "chemicals": ("class", "expiry"),
+    "biological": ("bsl", "container", "expiry"),
+}
+CHUNK = 500     # ids per IN (...) lookup
+
+
+def _current(conn, table, ids, cols):
+    """{id: {col: value}} of the rows that exist, read in chunks through the primary key."""
+    values = {}
+    for i in range(0, len(ids), CHUNK):
+        part = ids[i:i + CHUNK]
+        for r in conn.execute(f"SELECT id, {', '.join(cols)} FROM {table} WHERE id IN ({', '.join('?' * len(part))})",
+                              part):
+            values[r[0]] = dict(zip(cols, r[1:]))
+    return values
+
+
+def _unique(ids):
+    return list(dict.fromkeys(int(i) for i in ids))
+
+
+def delete_rows(db, table, ids):
+    """Deletes rows in one transaction (one executemany); returns the ids that were deleted."""
+    ids = _unique(ids)
+    with db.transaction() as conn:
+        before = _current(conn, table, ids, TABLE_COLUMNS[table])
+        conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in before])
+    for row_id, values in before.items():
+        db.audit.record("delete", table, row_id, values)
+    logger.warning(f"Batch delete: {len(before)} {table} row(s) removed")
+    return list(before)
+
+
+def update_field(db, table, ids, column, value):
+    """
+    Sets one column (see BATCH_FIELDS) on many rows in one transaction. Rows
+    that already hold the value are not written, so their versions stay put.
+    Returns the ids that changed.
+    """
+    if column not in BATCH_FIELDS.get(table, ()):
+        raise ValueError(f"'{column}' cannot be batch-edited in {table}")
+    with db.transaction() as conn:
+        before = _current(conn, table, _unique(ids), (column,))
+        changed = [i for i, v in before.items() if v[column] != value]
+        conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", [(value, i) for i in changed])
+    for row_id in changed:
+        db.audit.record("update", table, row_id, before[row_id], {column: value})
+    logger.info(f"Batch update: {column} = '{value}' on {len(changed)} {table} row(s)")
+    return changed
+
+
+def adjust_quantities(db, table, ids, adjustment):
+    """
+    Adds a signed quantity ("-50 mL") or percentage ("-10%") to the stock
+    of many rows in one transaction; results never go below zero. Returns
+    (changed ids, skipped ids): rows are skipped when their quantity is
+    unparseable, in another kind of unit or would not change (already zero).
+    Raises ValueError for an invalid or zero adjustment.
+    """
+    parsed = parse_adjustment(adjustment)
+    if parsed is None:
+        raise ValueError(f"Not an adjustment: '{adjustment}' (e.g. -50 mL, +2 vials, -10%)")
+    kind, amount, _ = parsed
+    if amount == (1 if kind == "scale" else 0):
+        raise ValueError(f"'{adjustment}' does not change any quantity")
+    col = QUANTITY_COLUMNS[table]
+    with db.transaction() as conn:
+        before = _current(conn, table, _unique(ids), (col,))
+        updates, skipped = [], []
+        for row_id, v in before.items():
+            new = adjust_quantity(v[col], parsed)
+            if new is None or parse_quantity(new)[0] == parse_quantity(v[col])[0]:
+                skipped.append(row_id)
+            else:
+                updates.append((new, row_id))
+        conn.executemany(f"UPDATE {table} SET {col} = ? WHERE id = ?", updates)
+    for new, row_id in updates:
+        db.audit.record("update", table, row_id, before[row_id], {col: new})
+    logger.info(f"Batch quantity adjustment '{adjustment}': {len(updates)} {table} row(s) changed, "
+                f"{len(skipped)} skipped")
+    return [row_id for _, row_id in updates], skipped
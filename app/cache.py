@@ -0,0 +1,124 @@
+import re
+import logging
+import threading
+from datetime import date
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Tables a SELECT reads from, and the table an INSERT/UPDATE/DELETE writes to.
+READ_TABLES_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+WRITE_TABLE_RE = re.compile(r"^\s*(?:(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)"
+                            r"\s+([A-Za-z_]\w*)", re.IGNORECASE)
+CACHEABLE_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+
+
+def written_table(sql):
+    """Table modified by a single-table write statement, or None when it cannot be told."""
+    m = WRITE_TABLE_RE.match(sql)
+    return m.group(1).lower() if m else None
+
+
+class QueryCache:
+    """
+    LRU cache of SELECT results keyed by (sql, params).
+
+    Each entry remembers the tables its query reads. A write to a table evicts
+    the entries that depend on it; derived tables (e.g. the FTS index kept in
+    sync by triggers) count as their source table. Results are bounded by entry
+    count and by the total number of cached rows. Thread-safe.
+    """
+    def __init__(self, max_entries=256, max_rows=100_000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.derived = {}
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (tables, rows)
+        self._rows = 0
+        self._generation = 0
+        self._day = date.today()
+        self._lock = threading.Lock()
+
+    def add_derived(self, table, *sources):
+        """Declares that table is written by triggers on the source tables."""
+        self.derived.setdefault(table.lower(), set()).update(s.lower() for s in sources)
+
+    def tables_of(self, sql):
+        tables = set()
+        for t in READ_TABLES_RE.findall(sql):
+            t = t.lower()
+            tables.add(t)
+            tables.update(self.derived.get(t, ()))
+        return frozenset(tables)
+
+    @staticmethod
+    def cacheable(sql):
+        return bool(CACHEABLE_RE.match(sql))
+
+    # --- Lookup ---
+
+    def get(self, key):
+        """Returns (rows, generation). rows is None on a miss; pass generation to put()."""
+        with self._lock:
+            if date.today() != self._day:
+                # Expiry statuses are computed against today's date.
+                self._clear()
+                self._day = date.today()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, self._generation
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], self._generation
+
+    def put(self, key, rows, generation):
+        """Stores a result unless a write happened since the matching get()."""
+        if len(rows) > self.max_rows:
+            return
+        with self._lock:
+            if generation != self._generation or key in self._entries:
+                return
+            self._entries[key] = (self.tables_of(key[0]), rows)
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, (_, old) = self._entries.popitem(last=False)
+                self._rows -= len(old)
+                self.evictions += 1
+
+    # --- Invalidation ---
+
+    def invalidate(self, tables=None):
+        """Drops entries reading any of tables, or everything when tables is None."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if tables is None:
+                self._clear()
+                return
+            tables = {t.lower() for t in tables}
+            stale = [k for k, (deps, _) in self._entries.items() if deps & tables]
+            for k in stale:
+                self._rows -= len(self._entries.pop(k)[1])
+        logger.debug(f"Query cache: invalidated {len(stale)} entr{'y' if len(stale) == 1 else 'ies'} "
+                     f"for {', '.join(sorted(tables))}")
+
+    def _clear(self):
+        self._entries.clear()
+        self._rows = 0
+
+    def stats(self):
+        """Counters for tuning max_entries/max_rows."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "max_entries": self.max_entries,
+                "max_rows": self.max_rows,
+            }
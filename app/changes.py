@@ -0,0 +1,161 @@
+import logging
+
+from .triggers import defer_on_bulk_insert
+
+logger = logging.getLogger(__name__)
+
+VERSIONED_TABLES = ("chemicals", "biological")
+
+# update_row() outcomes
+UPDATED, CONFLICT, DELETED = "updated", "conflict", "deleted"
+
+
+def _user_columns(table):
+    # Imported here: importer -> search -> changes would otherwise be circular.
+    from .importer import TABLE_COLUMNS
+    return TABLE_COLUMNS[table]
+
+
+def create_change_tracking(conn, keep=100_000):
+    """
+    Adds a version column to the inventory tables (bumped by a trigger on
+    every edit, whoever makes it) and change_log, a sequence of (table, row,
+    operation) filled by triggers, which open windows poll to pick up other
+    users' edits and sync.py turns into changesets for other sites. Each
+    entry also records the row's version before and after the change, its
+    uid (set only on rows received from another site) and, for changes
+    applied from a changeset, the site they originate from. Only the newest
+    `keep` entries are kept, and never ones not yet sent to a sync peer.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS change_log
+                    (seq INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, row_id INTEGER NOT NULL,
+                     op TEXT NOT NULL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_tbl ON change_log(tbl, seq)")
+    log_cols = [r[1] for r in conn.execute("PRAGMA table_info(change_log)")]
+    if "version" not in log_cols:
+        for col in ("uid TEXT", "version INTEGER", "base INTEGER", "origin TEXT"):
+            conn.execute(f"ALTER TABLE change_log ADD COLUMN {col}")
+        for table in VERSIONED_TABLES:
+            for suffix in ("ai", "au", "ad"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {table}_changes_{suffix}")
+    # Deletes of rows received from other sites are looked up by uid when their edits arrive.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_uid ON change_log(uid) WHERE uid IS NOT NULL")
+    for table in VERSIONED_TABLES:
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]
+        if "version" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if "uid" not in cols:
+            # "site:id" of the row at the site that created it; NULL for rows created here.
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN uid TEXT")
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_uid ON {table}(uid) WHERE uid IS NOT NULL")
+        # Writers that set version themselves (e.g. a compare-and-set) are left alone.
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_version_au
+                         AFTER UPDATE OF {', '.join(_user_columns(table))} ON {table}
+                         WHEN new.version = old.version BEGIN
+                             UPDATE {table} SET version = version + 1 WHERE id = new.id;
+                         END""")
+        conn.execute(insert_trigger_sql(table))
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_changes_au AFTER UPDATE OF version ON {table} BEGIN
+                             INSERT INTO change_log (tbl, row_id, op, uid, version, base)
+                             VALUES ('{table}', new.id, 'update', new.uid, new.version, old.version);
+                         END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_changes_ad AFTER DELETE ON {table} BEGIN
+                             INSERT INTO change_log (tbl, row_id, op, uid, version, base)
+                             VALUES ('{table}', old.id, 'delete', old.uid, old.version, old.version);
+                         END""")
+    # sync_peers is created before this runs (see sync.create_sync_tables). Peers never
+    # sent a changeset (NULL sent_seq) get every row in their first one, so they do not count.
+    conn.execute("""DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?
+                    AND seq <= (SELECT IFNULL(MIN(sent_seq), 1e18) FROM sync_peers)""", (keep,))
+
+
+def insert_trigger_sql(table):
+    return f"""CREATE TRIGGER IF NOT EXISTS {table}_changes_ai AFTER INSERT ON {table} BEGIN
+                  INSERT INTO change_log (tbl, row_id, op, uid, version, base)
+                  VALUES ('{table}', new.id, 'insert', new.uid, new.version, 0);
+              END"""
+
+
+def backfill(conn, table, after_id=0):
+    """Set-based form of the insert trigger for rows with id > after_id."""
+    conn.execute(f"INSERT INTO change_log (tbl, row_id, op, uid, version, base) "
+                 f"SELECT '{table}', id, 'insert', uid, version, 0 FROM {table} WHERE id > ? ORDER BY id",
+                 (after_id,))
+
+
+defer_on_bulk_insert("changes_ai", VERSIONED_TABLES, insert_trigger_sql, backfill)
+
+
+def current_version(db, table, row_id):
+    rows = db.query(f"SELECT version FROM {table} WHERE id=?", (row_id,), cache=False)
+    return rows[0][0] if rows else None
+
+
+def update_row(db, table, row_id, values, version):
+    """
+    Compare-and-set update: writes {column: value} only if the row is still at
+    `version` (the one the user loaded). Returns UPDATED, CONFLICT (someone
+    else saved first), DELETED (the row is gone) or None on a database error.
+    """
+    cols = list(values)
+    sql = (f"UPDATE {table} SET {', '.join(f'{c}=?' for c in cols)}, version = version + 1 "
+           f"WHERE id=? AND version=?")
+    count = db.update(sql, [values[c] for c in cols] + [row_id, version])
+    if count is None:
+        return None
+    if count:
+        return UPDATED
+    return CONFLICT if current_version(db, table, row_id) is not None else DELETED
+
+
+class ChangeFeed:
+    """
+    Tells an open window which rows of its table other connections changed.
+
+    poll() first compares PRAGMA data_version, which only moves when another
+    connection commits, so an idle database costs one pragma per call. Only
+    then is change_log read past the last sequence number seen. Own writes
+    may come back too; VirtualGrid.apply_change is idempotent.
+    """
+    def __init__(self, db, table, max_changes=500):
+        self.db = db
+        self.table = table
+        self.max_changes = max_changes
+        self.last_seq = self._max_seq()
+        self._data_version = self._read_data_version()
+
+    def _max_seq(self):
+        return self.db.query("SELECT IFNULL(MAX(seq), 0) FROM change_log", cache=False)[0][0]
+
+    def _read_data_version(self):
+        return self.db.connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        """
+        Returns [(op, row_id)] changed since the last call (last operation per
+        row), or None when there are too many to apply one by one (or the log
+        was pruned past our position) and the caller should reload.
+        """
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return []
+        self._data_version = data_version
+        last, newest = self.last_seq, self._max_seq()
+        if newest == last:
+            return []
+        # Rows written by other SQLite clients only carry their text columns so far.
+        self.db.refresh_derived()
+        oldest = self.db.query("SELECT MIN(seq) FROM change_log", cache=False)[0][0]
+        self.last_seq = newest
+        if oldest > last + 1 and last:
+            return None         # Pruned past our position
+        rows = self.db.query("""SELECT row_id, op FROM change_log WHERE tbl = ? AND seq > ? AND seq <= ?
+                                ORDER BY seq LIMIT ?""", (self.table, last, newest, self.max_changes + 1),
+                             cache=False)
+        if len(rows) > self.max_changes:
+            return None
+        latest = {}
+        for row_id, op in rows:
+            latest.pop(row_id, None)      # Re-inserted so the dict keeps last-change order
+            latest[row_id] = op
+        return [(op, row_id) for row_id, op in latest.items()]
@@ -0,0 +1,530 @@
+"""
+Command-line interface: python -m app <command> (or ./biolab <command>).
+
+Works directly on Database and AuthManager; Tk and ReportLab are never imported,
+so commands start quickly and can be scripted.
+"""
+import sys
+import time
+import csv
+import json
+import getpass
+import logging
+import argparse
+
+from . import configure_logging
+from .database import Database
+from .auth import AuthManager
+from .search import build_filter
+from .grid import SORTABLE_COLUMNS, sort_key
+from .importer import TABLE_COLUMNS, import_file
+from .export import export_rows
+from .expiry import TODAY_SQL, EXPIRING_SOON_DAYS, EXPIRY_TABLES
+from .quantities import stock_totals, format_quantity
+from .summary import inventory_kpis, rebuild as rebuild_summaries
+from .alerts import open_alerts, acknowledge
+from .audit import history, user_activity
+from .fuzzy import fuzzy_search, TRIGRAM_COLUMNS
+from .hazards import segregation_report, format_segregation, STORAGE_GROUP
+from .backup import backup_database, snapshots, verify_snapshot, BackupError, KEEP_SNAPSHOTS
+from .sync import (site_name, set_site, peers, export_changeset, apply_changeset, conflicts, resolve_conflict,
+                   SyncError)
+from .storage import (KINDS, StorageError, add_unit, children, get_unit, box_contents, move_samples, remove_samples,
+                      sample_location, parse_position, position_label)
+
+logger = logging.getLogger(__name__)
+
+
+class CLIError(Exception):
+    """A user error reported on stderr with exit status 2."""
+
+
+# --- Output ---
+
+def _print_rows(headers, rows, fmt, out=None):
+    out = out or sys.stdout
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    elif fmt == "jsonl":
+        for r in rows:
+            out.write(json.dumps(dict(zip(headers, r)), ensure_ascii=False) + "\n")
+    else:
+        cells = [["" if v is None else str(v) for v in r] for r in rows]
+        widths = [min(max([len(h)] + [len(r[i]) for r in cells]), 40) for i, h in enumerate(headers)]
+        line = lambda vals: "  ".join(v[:w].ljust(w) for v, w in zip(vals, widths)).rstrip()
+        out.write(line(headers) + "\n")
+        out.write("  ".join("-" * w for w in widths) + "\n")
+        for r in cells:
+            out.write(line(r) + "\n")
+
+
+def _filters(table, args):
+    """{column: text} from the positional search text and -f COLUMN=VALUE options."""
+    filters = {}
+    if getattr(args, "text", None):
+        filters["name"] = " ".join(args.text)
+    for item in args.filter or ():
+        col, sep, value = item.partition("=")
+        col = col.strip().lower()
+        if not sep or col not in TABLE_COLUMNS[table]:
+            raise CLIError(f"Invalid filter '{item}' (expected COLUMN=VALUE, COLUMN one of: "
+                           f"{', '.join(TABLE_COLUMNS[table])})")
+        filters[col] = value
+    return filters
+
+
+def _read_password(args, prompt="Password: "):
+    if args.password:
+        return args.password
+    password = getpass.getpass(prompt)
+    if password != getpass.getpass("Repeat password: "):
+        raise CLIError("Passwords do not match.")
+    return password
+
+
+# --- Commands ---
+
+def _os_user():
+    """Audit name for CLI changes, which are made without a BioLab login."""
+    try:
+        return f"cli:{getpass.getuser()}"
+    except Exception:
+        return "cli"
+
+
+def cmd_search(db, args):
+    table = args.table
+    if args.fuzzy:
+        if table not in TRIGRAM_COLUMNS or not db.fuzzy_enabled:
+            raise CLIError(f"Typo-tolerant search is not available for {table}")
+        rows = fuzzy_search(db, " ".join(args.text), table, limit=args.limit or 20)
+        _print_rows(("id", "name", "synonyms", "score"), [(*r[:3], f"{r[3]:.2f}") for r in rows], args.format)
+        return 0
+    where, params = build_filter(table, _filters(table, args), fts=db.fts_enabled)
+    if args.sort not in SORTABLE_COLUMNS[table]:
+        raise CLIError(f"Cannot sort on '{args.sort}' (one of: {', '.join(SORTABLE_COLUMNS[table])})")
+    order = "id" if args.sort == "id" else f"{sort_key(args.sort)}, id"
+    columns = ("id",) + TABLE_COLUMNS[table]
+    sql = f"SELECT {', '.join(columns)} FROM {table} WHERE ({where}) ORDER BY {order}"
+    if args.limit:
+        sql += f" LIMIT {int(args.limit)}"
+    _print_rows(columns, db.query(sql, params), args.format)
+    return 0
+
+
+def cmd_import(db, args):
+    mapping = {}
+    for item in args.map or ():
+        heading, sep, col = item.rpartition("=")
+        if not sep:
+            raise CLIError(f"Invalid mapping '{item}' (expected HEADING=COLUMN)")
+        mapping[heading] = col.strip()
+    try:
+        result = import_file(db, args.file, args.table, mapping=mapping, batch_size=args.batch_size,
+                             delimiter=args.delimiter)
+    except (OSError, ValueError) as e:
+        raise CLIError(str(e))
+    print(f"Imported {result.inserted} row(s) into {args.table} in {result.seconds:.2f}s; "
+          f"{result.rejected} rejected.")
+    if result.reject_path:
+        print(f"Rejected rows written to {result.reject_path}")
+    return 1 if result.rejected else 0
+
+
+def cmd_export(db, args):
+    where, params = build_filter(args.table, _filters(args.table, args), fts=db.fts_enabled)
+    compress = True if args.gzip else None
+    written = export_rows(db.db_name, args.table, args.output, where, params, fmt=args.format, compress=compress)
+    print(f"Exported {written} row(s) to {args.output}")
+    return 0
+
+
+def cmd_expiry(db, args):
+    """Lists items that have expired or expire within --days, soonest first."""
+    tables = [args.table] if args.table else list(EXPIRY_TABLES)
+    headers = ("table", "id", "name", "expiry", "days_left", "status")
+    horizon, params = (TODAY_SQL, ()) if args.expired else (f"{TODAY_SQL} + ?", (args.days,))
+    rows = []
+    for table in tables:
+        # Range scan on the expiry_day index; rows without a date have NULL and drop out.
+        rows += db.query(f"""SELECT '{table}', id, name, expiry, expiry_day - {TODAY_SQL},
+                                    CASE WHEN expiry_day < {TODAY_SQL} THEN 'expired' ELSE 'expiring' END
+                             FROM {table} WHERE expiry_day < {horizon} ORDER BY expiry_day""", params)
+    rows.sort(key=lambda r: r[4])
+    _print_rows(headers, rows, args.format)
+    return 0
+
+
+def cmd_alerts(db, args):
+    """Lists unacknowledged expiry alerts raised by the application, or acknowledges them."""
+    if args.ack_all:
+        acknowledge(db)
+        return 0
+    if args.ack:
+        acknowledge(db, args.ack)
+        return 0
+    headers = ("alert", "table", "id", "name", "expiry", "kind", "raised")
+    _print_rows(headers, open_alerts(db, args.limit), args.format)
+    return 0
+
+
+def cmd_audit(db, args):
+    """Change history of one record (TABLE ID) or of one user (--user), newest first."""
+    if args.user:
+        headers = ("event", "time", "action", "table", "id", "before", "after")
+        rows = user_activity(db, args.user, args.since, args.limit)
+    elif args.table and args.id is not None:
+        headers = ("event", "time", "user", "action", "before", "after")
+        rows = history(db, args.table, args.id, args.limit)
+    else:
+        raise CLIError("give TABLE ID or --user NAME")
+    _print_rows(headers, rows, args.format)
+    return 0
+
+
+def cmd_stock(db, args):
+    """Totals the parsed quantities of the matching rows, per unit."""
+    where, params = build_filter(args.table, _filters(args.table, args), fts=db.fts_enabled)
+    rows = [(unit or "(unparsed)", format_quantity(total, unit) if unit else "", total, items)
+            for unit, total, items in stock_totals(db, args.table, where, params)]
+    _print_rows(("unit", "total", "value", "items"), rows, args.format)
+    return 0
+
+
+def cmd_stats(db, args):
+    """Inventory KPIs from the trigger-maintained summary tables."""
+    if args.rebuild:
+        with db.transaction() as conn:
+            rebuild_summaries(conn)
+    kpis = inventory_kpis(db, top=args.top, soon_days=args.days)
+    if args.format == "json":
+        print(json.dumps(kpis, indent=2, ensure_ascii=False))
+        return 0
+    for table, k in kpis.items():
+        print(f"{table}: {k['total']:,} items, {k['expired']:,} expired, "
+              f"{k['expiring']:,} expiring within {args.days} days")
+        for dim, values in k.items():
+            if isinstance(values, list):
+                print(f"  by {dim}: " + (", ".join(f"{key or '(none)'} {n:,}" for key, n in values) or "-"))
+    return 0
+
+
+def cmd_hazards(db, args):
+    """Storage segregation check: incompatible GHS pictograms sharing a storage group."""
+    by = args.by or STORAGE_GROUP["chemicals"]
+    if by not in TABLE_COLUMNS["chemicals"]:
+        raise CLIError(f"Cannot group on '{by}' (one of: {', '.join(TABLE_COLUMNS['chemicals'])})")
+    report = segregation_report(db, "chemicals", group_by=by)
+    if args.format == "json":
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(format_segregation(report, by))
+    return 0
+
+
+def cmd_storage(db, args):
+    """Sample storage: the unit tree, box contents, adding units and storing samples."""
+    try:
+        if args.action == "tree":
+            def walk(parent_id, depth):
+                for unit_id, kind, name, rows, cols, used in children(db, parent_id):
+                    usage = f"  {used}/{rows * cols}" if kind == "box" else ""
+                    print(f"{'  ' * depth}{name}  [{kind} {unit_id}]{usage}")
+                    if kind != "box":
+                        walk(unit_id, depth + 1)
+            walk(None, 0)
+        elif args.action == "add":
+            rows, cols = args.size or (None, None)
+            print(add_unit(db, args.kind, args.name, args.parent, rows, cols))
+        elif args.action == "box":
+            box = get_unit(db, args.box)
+            if not box or box["kind"] != "box":
+                raise CLIError(f"No box with id {args.box}")
+            rows = [(position_label(pos, box["cols"]), sid, name) for pos, sid, name in box_contents(db, args.box)]
+            _print_rows(["position", "sample_id", "name"], rows, args.format)
+        elif args.action == "store":
+            positions = None
+            if args.at:
+                box = get_unit(db, args.unit)
+                if not box or box["kind"] != "box":
+                    raise CLIError("--at needs UNIT to be a box")
+                positions = [parse_position(p, box["rows"], box["cols"]) for p in args.at]
+            placed = move_samples(db, args.samples, args.unit, positions)
+            print(f"{len(placed)} sample(s) stored.")
+        elif args.action == "remove":
+            remove_samples(db, args.samples)
+        elif args.action == "where":
+            for sample_id in args.samples:
+                loc = sample_location(db, sample_id)
+                print(f"{sample_id}\t{loc[2] if loc else '(not stored)'}")
+    except StorageError as e:
+        raise CLIError(str(e))
+    return 0
+
+
+def _box_size(text):
+    rows, _, cols = text.lower().partition("x")
+    if not (rows.isdigit() and cols.isdigit()):
+        raise argparse.ArgumentTypeError("expected ROWSxCOLS, e.g. 9x9")
+    return int(rows), int(cols)
+
+
+def cmd_backup(db, args):
+    """Online snapshots of the database (safe while the application is in use)."""
+    try:
+        if args.action == "list":
+            rows = [(p.name, f"{p.stat().st_size / 1e6:.1f} MB") for p in snapshots(db.db_name, args.dir)]
+            _print_rows(["snapshot", "size"], rows, "table")
+        elif args.action == "verify":
+            verify_snapshot(args.file)
+            print(f"{args.file}: ok")
+        else:
+            while True:
+                r = backup_database(db.db_name, args.dir, keep=args.keep, compress=not args.no_compress)
+                print(f"{r.path}  ({r.pages:,} pages, {r.size_bytes / 1e6:.1f} MB, {r.seconds:.1f} s)")
+                if not args.every:
+                    break
+                time.sleep(args.every * 3600)
+    except BackupError as e:
+        raise CLIError(str(e))
+    return 0
+
+
+def cmd_sync(db, args):
+    """Changeset sync between sites: export what a peer has not seen yet, apply what a peer sent."""
+    try:
+        if args.action == "site":
+            if args.set:
+                set_site(db, args.set)
+            print(site_name(db))
+        elif args.action == "peers":
+            _print_rows(["site", "sent_seq", "received_seq", "last_sent", "last_received"], peers(db), args.format)
+        elif args.action == "export":
+            r = export_changeset(db, args.peer, args.file, full=args.full)
+            print(f"{r.changes:,} change(s) for '{args.peer}' written to {r.path}" + (" (all rows)" if r.full else ""))
+        elif args.action == "apply":
+            r = apply_changeset(db, args.file, force=args.force)
+            print(f"{r.applied:,} applied, {r.skipped:,} skipped, {r.conflicts:,} conflict(s)")
+            if r.conflicts:
+                print("See 'sync conflicts'; settle them with 'sync resolve ID --theirs' or '--ours'.")
+        elif args.action == "conflicts":
+            _print_rows(["id", "peer", "table", "uid", "op", "local_version", "version", "received_at"],
+                        conflicts(db), args.format)
+        elif args.action == "resolve":
+            if not resolve_conflict(db, args.id, theirs=args.theirs):
+                raise CLIError(f"No conflict {args.id}")
+    except SyncError as e:
+        raise CLIError(str(e))
+    return 0
+
+
+def cmd_users(db, args):
+    auth = AuthManager(db)
+    if args.action == "list":
+        for name in auth.list_users():
+            print(name)
+        return 0
+    if args.action == "add":
+        if not auth.create_user(args.username, _read_password(args)):
+            raise CLIError(f"Could not create user '{args.username}' (empty password or name taken).")
+        print(f"User '{args.username}' created.")
+    elif args.action == "passwd":
+        if not auth.set_password(args.username, _read_password(args, "New password: ")):
+            raise CLIError(f"No such user '{args.username}'.")
+        print(f"Password changed for '{args.username}'.")
+    elif args.action == "delete":
+        if not auth.delete_user(args.username):
+            raise CLIError(f"No such user '{args.username}'.")
+        print(f"User '{args.username}' deleted.")
+    return 0
+
+
+# --- Argument Parsing ---
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="biolab", description="BioLab inventory command-line tools.")
+    parser.add_argument("--db", default="biolab.db", help="database file (default: biolab.db)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    parser.add_argument("--stats", action="store_true", help="print query statistics to stderr when done")
+    parser.add_argument("--slow-ms", type=float, default=200,
+                        help="log statements slower than this with their query plan (default: 200)")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+    tables = tuple(TABLE_COLUMNS)
+    formats = ("table", "csv", "jsonl")
+    filter_help = ("filter as COLUMN=VALUE (repeatable); expiry accepts 2025, 2025-03 or 2025-01..2025-06; "
+                   "mol_info accepts elements (Hg|Pb, Na&Cl, -Cl), a weight range (150..200) or a formula; "
+                   "ghs accepts pictograms (GHS02&GHS03, toxic|health, -corrosive) and codes (H300, H3xx)")
+
+    p = sub.add_parser("search", help="search an inventory")
+    p.add_argument("table", choices=tables)
+    p.add_argument("text", nargs="*", help="name (and synonym) search terms")
+    p.add_argument("-f", "--filter", action="append", metavar="COLUMN=VALUE", help=filter_help)
+    p.add_argument("--sort", default="id", help="indexed column to sort on (default: id)")
+    p.add_argument("--limit", type=int, default=0, help="maximum number of rows (default: all)")
+    p.add_argument("--fuzzy", action="store_true",
+                   help="tolerate typos in the name: list the most similar names and synonyms (chemicals)")
+    p.add_argument("--format", choices=formats, default="table")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("import", help="bulk-import a CSV/TSV file")
+    p.add_argument("table", choices=tables)
+    p.add_argument("file")
+    p.add_argument("--map", action="append", metavar="HEADING=COLUMN",
+                   help="map a file heading to a table column (repeatable)")
+    p.add_argument("--delimiter", help="field delimiter (default: detected)")
+    p.add_argument("--batch-size", type=int, default=20000)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="export rows to CSV or JSON Lines (.gz to compress)")
+    p.add_argument("table", choices=tables)
+    p.add_argument("output")
+    p.add_argument("-f", "--filter", action="append", metavar="COLUMN=VALUE", help=filter_help)
+    p.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file name")
+    p.add_argument("--gzip", action="store_true", help="compress even without a .gz suffix")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("expiry", help="report expired and soon-to-expire items")
+    p.add_argument("table", nargs="?", choices=tables)
+    p.add_argument("--days", type=int, default=EXPIRING_SOON_DAYS,
+                   help=f"include items expiring within this many days (default: {EXPIRING_SOON_DAYS})")
+    p.add_argument("--expired", action="store_true", help="only items that have already expired")
+    p.add_argument("--format", choices=formats, default="table")
+    p.set_defaults(func=cmd_expiry)
+
+    p = sub.add_parser("alerts", help="list or acknowledge expiry alerts")
+    p.add_argument("--ack", type=int, nargs="+", metavar="ALERT", help="acknowledge these alert ids")
+    p.add_argument("--ack-all", action="store_true", help="acknowledge every open alert")
+    p.add_argument("--limit", type=int, default=100, help="maximum number of alerts listed (default: 100)")
+    p.add_argument("--format", choices=formats, default="table")
+    p.set_defaults(func=cmd_alerts)
+
+    p = sub.add_parser("audit", help="who changed a record (audit TABLE ID) or what a user did (--user)")
+    p.add_argument("table", nargs="?", choices=tables)
+    p.add_argument("id", nargs="?", type=int)
+    p.add_argument("--user", help="list this user's actions instead")
+    p.add_argument("--since", help="with --user: only events from this ISO date/time on")
+    p.add_argument("--limit", type=int, default=100, help="maximum number of events (default: 100)")
+    p.add_argument("--format", choices=formats, default="table")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("stock", help="total quantities on hand, e.g. stock chemicals sodium azide")
+    p.add_argument("table", choices=tables)
+    p.add_argument("text", nargs="*", help="name (and synonym) search terms")
+    p.add_argument("-f", "--filter", action="append", metavar="COLUMN=VALUE",
+                   help=filter_help + "; quantity/qty accepts <100 mL, >=2 kg or 100 mL..1 L")
+    p.add_argument("--format", choices=formats, default="table")
+    p.set_defaults(func=cmd_stock)
+
+    p = sub.add_parser("stats", help="inventory KPIs (counts by class, hazard, BSL, expiry)")
+    p.add_argument("--top", type=int, default=5, help="values listed per breakdown (default: 5)")
+    p.add_argument("--days", type=int, default=EXPIRING_SOON_DAYS, help="'expiring soon' window in days")
+    p.add_argument("--rebuild", action="store_true", help="recompute the summary tables first")
+    p.add_argument("--format", choices=("table", "json"), default="table")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("hazards", help="chemicals with incompatible GHS hazards stored together, per class")
+    p.add_argument("--by", help="column standing for the storage area (default: class)")
+    p.add_argument("--format", choices=("table", "json"), default="table")
+    p.set_defaults(func=cmd_hazards)
+
+    p = sub.add_parser("storage", help="sample storage locations (sites, freezers, racks, boxes)")
+    actions = p.add_subparsers(dest="action", required=True, metavar="action")
+    actions.add_parser("tree", help="print the storage hierarchy with box usage")
+    a = actions.add_parser("add", help="add a unit and print its id")
+    a.add_argument("kind", choices=KINDS)
+    a.add_argument("name")
+    a.add_argument("--parent", type=int, help="id of the enclosing unit (not for sites)")
+    a.add_argument("--size", type=_box_size, metavar="ROWSxCOLS", help="box size (default: 9x9)")
+    a = actions.add_parser("box", help="list the samples in a box")
+    a.add_argument("box", type=int)
+    a.add_argument("--format", choices=formats, default="table")
+    a = actions.add_parser("store", help="store or move samples into the first free positions under a unit")
+    a.add_argument("unit", type=int)
+    a.add_argument("samples", type=int, nargs="+")
+    a.add_argument("--at", nargs="+", metavar="POSITION", help="exact box positions (e.g. A1 A2), one per sample")
+    for action, text in (("remove", "take samples out of storage"), ("where", "print where samples are stored")):
+        a = actions.add_parser(action, help=text)
+        a.add_argument("samples", type=int, nargs="+")
+    p.set_defaults(func=cmd_storage)
+
+    p = sub.add_parser("backup", help="snapshot the database while it is in use (online backup)")
+    actions = p.add_subparsers(dest="action", required=True, metavar="action")
+    a = actions.add_parser("run", help="write a compressed, integrity-checked snapshot")
+    a.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS,
+                   help=f"snapshots kept, older ones are deleted (default: {KEEP_SNAPSHOTS})")
+    a.add_argument("--no-compress", action="store_true", help="write a plain .db file")
+    a.add_argument("--every", type=float, metavar="HOURS", help="keep running, taking a snapshot every HOURS")
+    actions.add_parser("list", help="list existing snapshots, oldest first")
+    a = actions.add_parser("verify", help="integrity-check a snapshot file")
+    a.add_argument("file")
+    for a in actions.choices.values():
+        a.add_argument("--dir", help="snapshot directory (default: backups/ next to the database)")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("sync", help="exchange changesets with the databases at other sites")
+    actions = p.add_subparsers(dest="action", required=True, metavar="action")
+    a = actions.add_parser("site", help="print (or --set) this site's name")
+    a.add_argument("--set", metavar="NAME", help="name this site (run on every copy of a copied database)")
+    a = actions.add_parser("export", help="write the changes a peer site has not received yet")
+    a.add_argument("peer")
+    a.add_argument("file", help="changeset file to write (gzip JSON Lines)")
+    a.add_argument("--full", action="store_true", help="send every row, not just the changes")
+    a = actions.add_parser("apply", help="apply a changeset from a peer site")
+    a.add_argument("file")
+    a.add_argument("--force", action="store_true", help="apply even if out of order or meant for another site")
+    for action, text in (("peers", "list peer sites and their sync points"),
+                         ("conflicts", "list changes that clashed with local edits")):
+        a = actions.add_parser(action, help=text)
+        a.add_argument("--format", choices=formats, default="table")
+    a = actions.add_parser("resolve", help="settle a conflict")
+    a.add_argument("id", type=int)
+    side = a.add_mutually_exclusive_group(required=True)
+    side.add_argument("--theirs", action="store_true", help="take the incoming change")
+    side.add_argument("--ours", action="store_true", help="keep the local row")
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser("users", help="manage login accounts")
+    actions = p.add_subparsers(dest="action", required=True, metavar="action")
+    actions.add_parser("list", help="list usernames")
+    for action, text in (("add", "create a user"), ("passwd", "change a password"), ("delete", "remove a user")):
+        a = actions.add_parser(action, help=text)
+        a.add_argument("username")
+        if action != "delete":
+            a.add_argument("--password", help="password (default: prompt)")
+    p.set_defaults(func=cmd_users)
+    return parser
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line. Search terms may follow options too (search
+    chemicals --fuzzy acetonitril): argparse fills a nargs="*" positional
+    before the first option, so the terms left over are added to it here.
+    """
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra:
+        if not hasattr(args, "text") or any(a.startswith("-") for a in extra):
+            parser.error(f"unrecognized arguments: {' '.join(extra)}")
+        args.text += extra
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(stream=sys.stderr, console_level=logging.INFO if args.verbose else logging.WARNING)
+    db = Database(args.db, slow_query_ms=args.slow_ms)
+    db.audit.user = _os_user()
+    try:
+        return args.func(db, args)
+    except CLIError as e:
+        print(f"biolab: error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if args.stats:
+            print(db.stats_summary(), file=sys.stderr)
+        db.close()
@@ -1,75 +1,453 @@
+import time
+import random
 import sqlite3
 import logging
+import threading
+from contextlib import contextmanager
+from .search import create_fts_tables, FTS_COLUMNS
+from .grid import SORTABLE_COLUMNS, sort_key
+from .expiry import create_expiry_columns
+from .quantities import register_functions, create_quantity_columns
+from .summary import create_summary_tables, SUMMARY_DIMENSIONS
+from .alerts import create_alert_table
+from .audit import create_audit_table, AuditTrail
+from .changes import create_change_tracking
+from .sync import create_sync_tables
+from .fuzzy import create_trigram_tables, TRIGRAM_COLUMNS
+from .formulas import register_functions as register_formula_functions, create_formula_columns, FORMULA_COLUMNS
+from .hazards import register_functions as register_hazard_functions, create_hazard_columns, HAZARD_COLUMNS
+from .storage import create_storage_tables
+from .triggers import create_derive_queue, pending_derived, refresh_derived
+from .cache import QueryCache, written_table
+from .instrumentation import QueryStats
 
 # Configure logger for the database module
 logger = logging.getLogger(__name__)
 
 class Database:
     """
-    Handles all SQLite database persistence, table initialization, 
+    Handles all SQLite database persistence, table initialization,
     and safe execution of SQL queries.
+
+    Connections are long-lived: each thread gets its own connection the first
+    time it touches the database, with the performance pragmas applied once.
+    Worker threads call release() when they finish; close() on shutdown
+    releases every connection that is still open.
+
+    query_cache_size > 0 enables an LRU cache of SELECT results (see cache.py),
+    invalidated per table by execute()/insert(), wholesale by other writes made
+    in a transaction(), and whenever PRAGMA data_version shows that another
+    connection or process committed.
+
+    Every statement is timed (see instrumentation.py): statements slower than
+    slow_query_ms are logged with their query plan, and stats_interval_s > 0
+    writes a periodic activity summary to the log.
+
+    Several PCs may share one database file: write transactions wait up to
+    busy_timeout_ms for the lock and are retried lock_retries more times with
+    a randomized back-off before giving up; rows carry a version for
+    compare-and-set edits (see changes.py).
+
+    audit is the session's AuditTrail (see audit.py): structured change
+    records written to audit_log in batches from a background thread.
+
+    Parsed quantities, formulas, hazards and box bitmaps are computed in
+    Python. The schema holds plain-SQL triggers only, so other SQLite tools
+    can write the file too: rows they touch are queued and filled in at the
+    next commit, open or change poll (see triggers.py).
     """
-    def __init__(self, db_name="biolab.db"):
+    def __init__(self, db_name="biolab.db", journal_mode="WAL", busy_timeout_ms=5000,
+                 cache_size_kb=16384, mmap_size=256 * 1024 * 1024,
+                 query_cache_size=0, query_cache_rows=100_000, slow_query_ms=200, stats_interval_s=0,
+                 lock_retries=3):
         self.db_name = db_name
+        # WAL lets readers and a writer work side by side. It needs shared memory,
+        # so pass journal_mode="DELETE" when biolab.db lives on a network share.
+        self.journal_mode = journal_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.lock_retries = lock_retries
+
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.fts_enabled = False
+        self.fuzzy_enabled = False
+        self.cache = QueryCache(query_cache_size, query_cache_rows) if query_cache_size else None
+        self.stats = QueryStats(slow_query_ms)
+        self.audit = AuditTrail(self)
         self._create_tables()
+        self.stats.start_reporter(stats_interval_s, extra=self._stats_extra)
+
+    # --- Connection Management ---
+
+    def _connect(self):
+        """Opens a new connection and applies the per-connection pragmas once."""
+        # isolation_level=None puts the driver in autocommit mode so that
+        # transaction() controls BEGIN/COMMIT explicitly.
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout_ms / 1000,
+                               isolation_level=None, check_same_thread=False)
+        mode = conn.execute(f"PRAGMA journal_mode={self.journal_mode}").fetchone()[0]
+        if mode.upper() != self.journal_mode.upper():
+            logger.warning(f"Journal mode '{self.journal_mode}' unavailable, using '{mode}'.")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # SQL functions that compute the parsed quantity, formula and hazard columns
+        register_functions(conn)
+        register_formula_functions(conn)
+        register_hazard_functions(conn)
+
+        with self._lock:
+            self._connections.append(conn)
+        self.stats.count("connections")
+        if self.cache is not None:
+            # Entries cached by other connections predate this one's data_version baseline.
+            self._local.data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            self.cache.invalidate()
+        logger.debug(f"Opened connection to {self.db_name} for thread {threading.current_thread().name}")
+        return conn
+
+    def connection(self):
+        """Returns the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn not in self._connections:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def release(self):
+        """Closes the calling thread's connection, if any (call at the end of a worker thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn not in self._connections:
+                return      # Already closed by close()
+            self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error closing connection: {e}")
+        logger.debug(f"Released connection of thread {threading.current_thread().name}")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Explicit transaction scope. Commits on success and rolls back on error.
+        Nested scopes join the outermost transaction on the same thread.
+        """
+        conn = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._begin(conn)
+        self._local.depth = 1
+        self._local.written = set()
+        self._local.tracked = 0
+        start = conn.total_changes
+        try:
+            yield conn
+            self._refresh_derived(conn)
+            conn.execute("COMMIT")
+            self.stats.count("commits")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            self.stats.count("rollbacks")
+            raise
+        finally:
+            self._local.depth = 0
+        if self.cache is not None and conn.total_changes != start:
+            # Rows changed by statements other than execute()/insert() (executemany,
+            # DDL, ...) are not attributed to a table, so everything is dropped.
+            untracked = conn.total_changes - start > self._local.tracked
+            self.cache.invalidate(None if untracked else self._local.written)
+
+    def _refresh_derived(self, conn):
+        """Fills in the derived data of rows queued by this transaction (or by other clients), see triggers.py."""
+        if not self._schema_ready:
+            return
+        before = conn.total_changes
+        tables = refresh_derived(conn)
+        if tables:
+            self._local.written.update(tables)
+            self._local.tracked += conn.total_changes - before
+
+    def refresh_derived(self):
+        """
+        Fills in the derived data of rows written by other SQLite clients (which
+        only queue them). Costs one indexed lookup when there is nothing to do.
+        """
+        if pending_derived(self.connection()):
+            with self.transaction():
+                pass    # transaction() refreshes the queue before committing
+
+    def _begin(self, conn):
+        """BEGIN IMMEDIATE, retried with back-off while another connection holds the write lock."""
+        for attempt in range(self.lock_retries + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if ("locked" not in str(e) and "busy" not in str(e)) or attempt == self.lock_retries:
+                    raise
+                self.stats.count("lock_retries")
+                delay = random.uniform(0.05, 0.2) * 2 ** attempt
+                logger.warning(f"Database locked by another user; retrying in {delay:.2f}s "
+                               f"({attempt + 1}/{self.lock_retries})")
+                time.sleep(delay)
+
+    def close(self):
+        """Closes every connection opened by this Database (call on shutdown)."""
+        self.audit.close()
+        self.stats.stop_reporter()
+        if self.stats.counters["queries"] or self.stats.counters["writes"]:
+            logger.info(self.stats_summary())
+        with self._lock:
+            conns, self._connections = self._connections, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.error(f"Error closing connection: {e}")
+        logger.info(f"Closed {len(conns)} database connection(s).")
+
+    # --- Schema ---
 
     def _create_tables(self):
         """Initializes required tables if they do not exist."""
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 # Create Users, Chemicals, and Biologicals tables
-                cursor.execute('''CREATE TABLE IF NOT EXISTS users 
+                cursor.execute('''CREATE TABLE IF NOT EXISTS users
                                (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password TEXT)''')
-                
-                cursor.execute('''CREATE TABLE IF NOT EXISTS chemicals 
-                                (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, synonyms TEXT, class TEXT, 
+
+                cursor.execute('''CREATE TABLE IF NOT EXISTS chemicals
+                                (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, synonyms TEXT, class TEXT,
                                 mol_info TEXT, quantity TEXT, ghs TEXT, expiry TEXT)''')
-                
-                cursor.execute("""CREATE TABLE IF NOT EXISTS biological 
+
+                cursor.execute("""CREATE TABLE IF NOT EXISTS biological
                                 (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, type TEXT, organism TEXT,
                                     medium TEXT, container TEXT, qty TEXT, bsl TEXT,expiry TEXT)""")
-                conn.commit()
+
+                # Rows whose derived columns must be recomputed (filled by plain-SQL triggers)
+                create_derive_queue(conn)
+                # Full-text indexes behind the search boxes
+                self.fts_enabled = create_fts_tables(conn)
+                # Trigram index behind typo-tolerant name search
+                self.fuzzy_enabled = self.fts_enabled and create_trigram_tables(conn)
+                if self.cache is not None:
+                    for table in FTS_COLUMNS:
+                        self.cache.add_derived(f"{table}_fts", table)
+                    for table in TRIGRAM_COLUMNS:
+                        for derived in ("terms", "trgm", "trgm_vocab"):
+                            self.cache.add_derived(f"{table}_{derived}", table)
+                    for table in FORMULA_COLUMNS:
+                        self.cache.add_derived(f"{table}_elements", table)
+                    for table in HAZARD_COLUMNS:
+                        self.cache.add_derived(f"{table}_hazard_codes", table)
+                    self.cache.add_derived("sample_positions", "biological")
+                    self.cache.add_derived("storage_units", "sample_positions")
+                    for derived in ("inventory_summary", "expiry_histogram"):
+                        self.cache.add_derived(derived, *SUMMARY_DIMENSIONS)
+                self._create_sort_indexes(conn)
+                # Typed, indexed expiry day numbers (migrates older rows once)
+                create_expiry_columns(conn)
+                # Parsed, indexed quantities (converts older rows once)
+                create_quantity_columns(conn)
+                # Parsed formulas, molecular weights and element composition
+                create_formula_columns(conn)
+                # Pictogram bitmask and hazard statement codes
+                create_hazard_columns(conn)
+                # Trigger-maintained counts behind the hub dashboard
+                create_summary_tables(conn)
+                create_alert_table(conn)
+                # Freezer/rack/box locations of biological samples
+                create_storage_tables(conn)
+                create_audit_table(conn)
+                # Site name and per-peer sync points of changeset sync
+                create_sync_tables(conn)
+                # Row versions and the change sequence behind multi-user refresh and sync
+                create_change_tracking(conn)
+                # Rows written by other SQLite clients since the last run are refreshed on commit
+                self._schema_ready = True
                 logger.info("Database schema verified/created successfully.")
         except sqlite3.Error as e:
             logger.critical(f"Database Initialization Failed: {e}")
-        self.show_schema('biolab.db', 'chemicals')
-        self.show_schema('biolab.db', 'biologicals')
-    
+        self.show_schema(self.db_name, 'chemicals')
+        self.show_schema(self.db_name, 'biological')
+
+    def _create_sort_indexes(self, conn):
+        """
+        Indexes the sort expression of every sortable grid column (grid.sort_key)
+        so ORDER BY and keyset paging never scan. Plain column indexes of older
+        versions are replaced.
+        """
+        for table, cols in SORTABLE_COLUMNS.items():
+            for col in cols:
+                if col == "id":
+                    continue
+                name = f"idx_{table}_{col}"
+                create_sql = f"CREATE INDEX IF NOT EXISTS {name} ON {table}({sort_key(col)})"
+                stored = conn.execute("SELECT sql FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone()
+                if stored and stored[0] != create_sql.replace("IF NOT EXISTS ", "", 1):
+                    conn.execute(f"DROP INDEX {name}")
+                    logger.info(f"Replaced index {name}.")
+                conn.execute(create_sql)
+
     def show_schema(self, db_path, table_name):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
         # Fetch column info: id, name, type, notnull, default_value, pk
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        schema = cursor.fetchall()
-        
-        print(f"{'ID':<4} {'Column Name':<20} {'Type':<10} {'PK':<3}")
-        print("-" * 40)
-        for col in schema:
-            print(f"{col[0]:<4} {col[1]:<20} {col[2]:<10} {col[5]:<3}")
-        
-        conn.close()
-    
-    def query(self, sql, params=()):
+        schema = self.query(f"PRAGMA table_info({table_name})")
+
+        # Logged at debug level so that CLI output on stdout stays clean.
+        lines = [f"{'ID':<4} {'Column Name':<20} {'Type':<10} {'PK':<3}", "-" * 40]
+        lines += [f"{col[0]:<4} {col[1]:<20} {col[2]:<10} {col[5]:<3}" for col in schema]
+        logger.debug(f"Schema of {table_name}:\n" + "\n".join(lines))
+
+    # --- Queries ---
+
+    def query(self, sql, params=(), cache=True):
         """Executes a SELECT query and returns all matching rows."""
+        key = generation = None
+        if cache and self.cache is not None and self.cache.cacheable(sql):
+            conn = self.connection()
+            if not self._local.depth:
+                self._check_data_version(conn)
+                key = (sql, tuple(params))
+                rows, generation = self.cache.get(key)
+                if rows is not None:
+                    return list(rows)
+        conn = self.connection()
+        start = time.perf_counter()
         try:
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute(sql, params)
-                return cursor.fetchall()
+            rows = conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            interrupted = str(e) == "interrupted"
+            self.stats.record(sql, (time.perf_counter() - start) * 1000, error=not interrupted)
+            if interrupted:
+                # A newer search cancelled this one (see SearchExecutor).
+                logger.debug(f"SQL Query interrupted | SQL: {sql}")
+                return []
+            logger.error(f"SQL Query Error: {e} | SQL: {sql}")
+            return []
         except sqlite3.Error as e:
+            self.stats.record(sql, (time.perf_counter() - start) * 1000, error=True)
             logger.error(f"SQL Query Error: {e} | SQL: {sql}")
             return []
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.stats.record(sql, elapsed, len(rows)):
+            self.stats.log_slow(conn, sql, params, elapsed)
+        if key is not None:
+            self.cache.put(key, rows, generation)
+            return list(rows)
+        return rows
+
+    def _check_data_version(self, conn):
+        """Drops the query cache when another connection has committed since the last check."""
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._local.data_version:
+            self._local.data_version = version
+            logger.debug("Query cache: database changed by another connection.")
+            self.cache.invalidate()
+
+    def _track_write(self, conn, sql, params, many=False):
+        """Runs one write statement (or executemany batch) inside transaction() and records the table it changed."""
+        before = conn.total_changes
+        start = time.perf_counter()
+        try:
+            cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+        except sqlite3.Error:
+            self.stats.record(sql, (time.perf_counter() - start) * 1000, error=True, write=True)
+            raise
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.stats.record(sql, elapsed, cursor.rowcount, write=True):
+            # The plan of a batch is not shown (no single parameter set to explain it with).
+            self.stats.log_slow(conn, sql, () if many else params, elapsed)
+        table = written_table(sql)
+        if table is not None:
+            self._local.written.add(table)
+            self._local.tracked += conn.total_changes - before
+        return cursor
+
+    # --- Statistics ---
+
+    def cache_stats(self):
+        """Hit/miss counters of the query cache, or None when it is disabled."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def stats_snapshot(self, top=None):
+        """Statement timings and counters (see QueryStats.snapshot), plus the query cache counters."""
+        snap = self.stats.snapshot(top)
+        snap["query_cache"] = self.cache_stats()
+        return snap
+
+    def stats_summary(self, top=10):
+        """Text report of stats_snapshot for the log, the CLI (--stats) and the UI."""
+        return self.stats.summary(top, extra=self._stats_extra())
+
+    def _stats_extra(self):
+        c = self.cache_stats()
+        if c is None:
+            return {}
+        return {"Query cache": f"{c['hits']} hits, {c['misses']} misses ({c['hit_rate']:.0%}), "
+                               f"{c['entries']} entries / {c['rows']} rows, {c['evictions']} evictions, "
+                               f"{c['invalidations']} invalidations"}
+
+    def insert(self, sql, params=()):
+        """Executes an INSERT and returns the new row id, or None on failure."""
+        try:
+            with self.transaction() as conn:
+                return self._track_write(conn, sql, params).lastrowid
+        except sqlite3.IntegrityError:
+            logger.warning("Database Integrity Error: Duplicate entry or constraint violation.")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"SQL Execution Error: {e}")
+            return None
+
+    def update(self, sql, params=()):
+        """Executes an UPDATE or DELETE and returns the number of rows it changed, or None on failure."""
+        try:
+            with self.transaction() as conn:
+                return self._track_write(conn, sql, params).rowcount
+        except sqlite3.IntegrityError:
+            logger.warning("Database Integrity Error: Duplicate entry or constraint violation.")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"SQL Execution Error: {e}")
+            return None
 
     def execute(self, sql, params=()):
         """Executes INSERT, UPDATE, or DELETE commands."""
         try:
-            with sqlite3.connect(self.db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute(sql, params)
-                conn.commit()
-                return True
+            with self.transaction() as conn:
+                self._track_write(conn, sql, params)
+            return True
+        except sqlite3.IntegrityError:
+            logger.warning("Database Integrity Error: Duplicate entry or constraint violation.")
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"SQL Execution Error: {e}")
+            return False
+
+    def executemany(self, sql, seq_of_params):
+        """Runs one INSERT, UPDATE or DELETE for every parameter tuple in a single transaction."""
+        try:
+            with self.transaction() as conn:
+                self._track_write(conn, sql, seq_of_params, many=True)
+            return True
         except sqlite3.IntegrityError:
             logger.warning("Database Integrity Error: Duplicate entry or constraint violation.")
             return False
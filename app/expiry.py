@@ -0,0 +1,102 @@
+import re
+import logging
+from functools import lru_cache
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+# Expiry dates are indexed as integer day numbers: CAST(julianday(expiry) AS INTEGER).
+# For a Python date that is date.toordinal() + JD_OFFSET.
+JD_OFFSET = 1721424
+EXPIRING_SOON_DAYS = 30
+
+EXPIRY_TABLES = ("chemicals", "biological")
+
+# Today's day number, evaluated by SQLite at query time.
+TODAY_SQL = "CAST(julianday(date('now', 'localtime')) AS INTEGER)"
+STATUS_SQL = (f"CASE WHEN expiry_day < {TODAY_SQL} THEN 'expired' "
+              f"WHEN expiry_day < {TODAY_SQL} + {EXPIRING_SOON_DAYS} THEN 'expiring' ELSE '' END")
+
+# Formats accepted from older rows and imports, normalized to YYYY-MM-DD.
+ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y")
+
+
+def to_day(d):
+    """Day number of a date, matching the expiry_day column."""
+    return d.toordinal() + JD_OFFSET
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """Parses an expiry string in any accepted format. Returns a date or None."""
+    text = (text or "").strip()
+    if ISO_RE.fullmatch(text):
+        try:
+            return date.fromisoformat(text)
+        except ValueError:
+            return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _bound(text, end):
+    """First (or last, when end=True) day number covered by YYYY, YYYY-MM or YYYY-MM-DD."""
+    m = re.fullmatch(r"(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?", text.strip())
+    if not m:
+        return None
+    year, month, day = int(m.group(1)), m.group(2), m.group(3)
+    try:
+        if day:
+            return to_day(date(year, int(month), int(day)))
+        if month:
+            month = int(month)
+            if not end:
+                return to_day(date(year, month, 1))
+            nxt = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+            return to_day(nxt) - 1
+        return to_day(date(year, 12, 31) if end else date(year, 1, 1))
+    except ValueError:
+        return None
+
+
+def parse_filter(text):
+    """
+    Turns an expiry filter into an inclusive (first_day, last_day) range:
+    "2025" (year), "2025-03" (month), "2025-03-14" (day) or "2025-01..2025-06"
+    (range; either side may be left open). Returns None when unparseable.
+    """
+    text = (text or "").strip()
+    if ".." in text:
+        lo, hi = text.split("..", 1)
+        lo_day = _bound(lo, False) if lo.strip() else to_day(date.min)
+        hi_day = _bound(hi, True) if hi.strip() else to_day(date.max)
+        if lo_day is None or hi_day is None:
+            return None
+        return lo_day, hi_day
+    lo_day, hi_day = _bound(text, False), _bound(text, True)
+    return (lo_day, hi_day) if lo_day is not None else None
+
+
+def create_expiry_columns(conn):
+    """
+    Adds the indexed expiry_day column to each inventory table. On the first
+    run, existing expiry strings in other date formats are rewritten as
+    YYYY-MM-DD so that they get a day number.
+    """
+    for table in EXPIRY_TABLES:
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]
+        if "expiry_day" not in cols:
+            rows = conn.execute(f"""SELECT id, expiry FROM {table} WHERE expiry IS NOT NULL AND expiry != ''
+                                    AND expiry NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'""").fetchall()
+            fixed = [(d.isoformat(), row_id) for row_id, d in ((r[0], parse_date(r[1])) for r in rows) if d]
+            conn.executemany(f"UPDATE {table} SET expiry=? WHERE id=?", fixed)
+            conn.execute(f"""ALTER TABLE {table} ADD COLUMN expiry_day INTEGER
+                             GENERATED ALWAYS AS (CAST(julianday(expiry) AS INTEGER)) VIRTUAL""")
+            logger.info(f"Migrated {table}.expiry: {len(fixed)} date(s) normalized, "
+                        f"{len(rows) - len(fixed)} left unparsed.")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_expiry_day ON {table}(expiry_day)")
@@ -0,0 +1,185 @@
+import os
+import csv
+import gzip
+import json
+import sqlite3
+import logging
+from pathlib import Path
+from datetime import datetime
+
+from .importer import TABLE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+def open_readonly(db_name):
+    """Opens a separate read-only connection for long-running exports."""
+    return sqlite3.connect(Path(db_name).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def write_pdf(db_name, out_path, title, headers, sql, params=(), progress=None, cancel=None,
+              fetch_size=500, font_size=8, row_height=15):
+    """
+    Streams the rows of sql into a landscape A4 PDF, one fixed-size table per page.
+
+    Rows are read with fetchmany and each page is drawn straight onto the canvas,
+    so ReportLab never has to split one huge table. Meant to run in a child
+    process: progress (a queue) receives ("progress", done, total) messages and
+    a final ("done", path) / ("cancelled",) / ("error", message); setting the
+    cancel event stops the export without writing the file.
+    """
+    # ReportLab is only needed here, so it is not imported with the UI.
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    def report(*msg):
+        if progress is not None:
+            progress.put(msg)
+
+    conn = None
+    try:
+        conn = open_readonly(db_name)
+        total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+        cursor = conn.execute(sql, params)
+
+        page_w, page_h = landscape(A4)
+        margin = 36
+        styles = getSampleStyleSheet()
+        header_h = 60
+        rows_per_page = max(int((page_h - 2 * margin - header_h) // row_height) - 1, 1)
+        col_w = (page_w - 2 * margin) / len(headers)
+        max_chars = max(int(col_w / (font_size * 0.55)), 4)
+        style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), font_size),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ])
+        generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        def cell(v):
+            s = "" if v is None else str(v)
+            return s if len(s) <= max_chars else s[:max_chars - 1] + "…"
+
+        pdf = canvas.Canvas(str(out_path), pagesize=(page_w, page_h), pageCompression=1)
+        pdf.setTitle(title)
+        page_no, done, chunk = 0, 0, []
+
+        def draw_page(chunk):
+            nonlocal page_no
+            page_no += 1
+            heading = Paragraph(title, styles['Title'])
+            heading.wrapOn(pdf, page_w - 2 * margin, header_h)
+            heading.drawOn(pdf, margin, page_h - margin - 30)
+            pdf.setFont("Helvetica", 9)
+            pdf.drawString(margin, page_h - margin - header_h + 10, f"Generated on: {generated}")
+            pdf.drawRightString(page_w - margin, margin / 2, f"Page {page_no}")
+
+            table = Table([headers] + chunk, colWidths=[col_w] * len(headers), rowHeights=row_height)
+            table.setStyle(style)
+            _, h = table.wrapOn(pdf, page_w - 2 * margin, page_h)
+            table.drawOn(pdf, margin, page_h - margin - header_h - h)
+            pdf.showPage()
+
+        while True:
+            if cancel is not None and cancel.is_set():
+                report("cancelled")
+                return False
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for r in rows:
+                chunk.append([cell(v) for v in r[:len(headers)]])
+                if len(chunk) == rows_per_page:
+                    draw_page(chunk)
+                    chunk = []
+            done += len(rows)
+            report("progress", done, total)
+
+        if chunk or page_no == 0:
+            draw_page(chunk)
+        pdf.save()
+        logger.info(f"PDF Exported: {out_path} ({done} rows, {page_no} pages)")
+        report("done", str(out_path))
+        return True
+    except Exception as e:
+        logger.error(f"PDF Generation Failed: {e}")
+        report("error", str(e))
+        return False
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def export_format(path):
+    """Infers (format, gzip) from a file name such as inventory.csv or inventory.jsonl.gz."""
+    suffixes = [s.lower() for s in Path(path).suffixes]
+    compressed = bool(suffixes) and suffixes[-1] == ".gz"
+    ext = suffixes[-2] if compressed and len(suffixes) > 1 else (suffixes[-1] if suffixes else "")
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl", compressed
+    return "csv", compressed
+
+
+def export_rows(db_name, table, out_path, where="1", params=(), fmt=None, compress=None,
+                chunk_size=5000, progress=None, cancel=None):
+    """
+    Streams every row of an inventory table matching where/params (as built by
+    search.build_filter) to CSV or JSON Lines, optionally gzip-compressed.
+
+    Rows are pulled from the cursor with fetchmany, so memory use does not depend
+    on the row count. The file is written under a .part name and renamed when
+    complete, so a reader never sees a half-written export. Returns the number
+    of rows written, or None when cancelled.
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown inventory table: {table}")
+    guessed_fmt, guessed_gz = export_format(out_path)
+    fmt = fmt or guessed_fmt
+    compress = guessed_gz if compress is None else compress
+    columns = ("id",) + TABLE_COLUMNS[table]
+    sql = f"SELECT {', '.join(columns)} FROM {table} WHERE ({where}) ORDER BY id"
+
+    tmp_path = f"{out_path}.part"
+    opener = gzip.open if compress else open
+    conn = open_readonly(db_name)
+    written = 0
+    try:
+        cursor = conn.execute(sql, params)
+        with opener(tmp_path, "wt", newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+            while True:
+                if cancel is not None and cancel.is_set():
+                    break
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if fmt == "csv":
+                    writer.writerows(rows)
+                else:
+                    f.writelines(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + "\n" for r in rows)
+                written += len(rows)
+                if progress is not None:
+                    progress(written)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    finally:
+        conn.close()
+
+    if cancel is not None and cancel.is_set():
+        Path(tmp_path).unlink(missing_ok=True)
+        logger.info(f"Data export cancelled: {out_path}")
+        return None
+    os.replace(tmp_path, out_path)
+    logger.info(f"Data Exported: {written} {table} row(s) to {out_path} ({fmt}{', gzip' if compress else ''})")
+    return written
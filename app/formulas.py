@@ -0,0 +1,333 @@
+import re
+import json
+import logging
+from functools import lru_cache
+
+from .triggers import defer_on_bulk_insert, register_derived, queue_sql, ensure_trigger
+
+logger = logging.getLogger(__name__)
+
+# Free-text "Formula/Wt" column of each table. Parsed copies are kept in formula
+# (Hill notation), mol_weight (REAL, g/mol) and the {table}_elements composition table.
+FORMULA_COLUMNS = {"chemicals": "mol_info"}
+
+# Standard atomic weights (g/mol); mass number of the longest-lived isotope for
+# elements without one. D (deuterium) is kept apart since it is written as such.
+ATOMIC_WEIGHTS = {
+    "H": 1.008, "D": 2.014, "He": 4.0026, "Li": 6.94, "Be": 9.0122, "B": 10.81, "C": 12.011, "N": 14.007,
+    "O": 15.999, "F": 18.998, "Ne": 20.180, "Na": 22.990, "Mg": 24.305, "Al": 26.982, "Si": 28.085,
+    "P": 30.974, "S": 32.06, "Cl": 35.45, "Ar": 39.95, "K": 39.098, "Ca": 40.078, "Sc": 44.956, "Ti": 47.867,
+    "V": 50.942, "Cr": 51.996, "Mn": 54.938, "Fe": 55.845, "Co": 58.933, "Ni": 58.693, "Cu": 63.546,
+    "Zn": 65.38, "Ga": 69.723, "Ge": 72.630, "As": 74.922, "Se": 78.971, "Br": 79.904, "Kr": 83.798,
+    "Rb": 85.468, "Sr": 87.62, "Y": 88.906, "Zr": 91.224, "Nb": 92.906, "Mo": 95.95, "Tc": 97.0,
+    "Ru": 101.07, "Rh": 102.91, "Pd": 106.42, "Ag": 107.87, "Cd": 112.41, "In": 114.82, "Sn": 118.71,
+    "Sb": 121.76, "Te": 127.60, "I": 126.90, "Xe": 131.29, "Cs": 132.91, "Ba": 137.33, "La": 138.91,
+    "Ce": 140.12, "Pr": 140.91, "Nd": 144.24, "Pm": 145.0, "Sm": 150.36, "Eu": 151.96, "Gd": 157.25,
+    "Tb": 158.93, "Dy": 162.50, "Ho": 164.93, "Er": 167.26, "Tm": 168.93, "Yb": 173.05, "Lu": 174.97,
+    "Hf": 178.49, "Ta": 180.95, "W": 183.84, "Re": 186.21, "Os": 190.23, "Ir": 192.22, "Pt": 195.08,
+    "Au": 196.97, "Hg": 200.59, "Tl": 204.38, "Pb": 207.2, "Bi": 208.98, "Po": 209.0, "At": 210.0,
+    "Rn": 222.0, "Fr": 223.0, "Ra": 226.0, "Ac": 227.0, "Th": 232.04, "Pa": 231.04, "U": 238.03,
+    "Np": 237.0, "Pu": 244.0, "Am": 243.0, "Cm": 247.0, "Bk": 247.0, "Cf": 251.0, "Es": 252.0, "Fm": 257.0,
+    "Md": 258.0, "No": 259.0, "Lr": 266.0, "Rf": 267.0, "Db": 268.0, "Sg": 269.0, "Bh": 270.0, "Hs": 277.0,
+    "Mt": 278.0, "Ds": 281.0, "Rg": 282.0, "Cn": 285.0, "Nh": 286.0, "Fl": 289.0, "Mc": 290.0, "Lv": 293.0,
+    "Ts": 294.0, "Og": 294.0,
+}
+_SYMBOLS = {s.lower(): s for s in ATOMIC_WEIGHTS}
+# Elements found in most reagents, least common first (others are assumed rarer still)
+COMMON_ELEMENTS = {el: i for i, el in enumerate(("Br", "F", "Mg", "Ca", "P", "Cl", "K", "S", "Na", "N", "C", "O", "H"))}
+
+# Parts of a hydrate or adduct with their coefficient: "CuSO4·5H2O", "CaSO4.0.5H2O"
+PART_RE = re.compile(r"(?:^|[·•*.])(\d+(?:\.\d+)?)?([^·•*.]+)")
+# Element with its count, opening bracket, or closing bracket with the group's count.
+# A polymer's repeat count ("(C2H4O)n") is unknown: its elements are kept with count None.
+TOKEN_RE = re.compile(r"([A-Z][a-z]?)(\d*)|([(\[{])|([)\]}])([nxm]|\d*)")
+# A trailing ionic charge ("NH4+", "SO4^2-") is ignored.
+CHARGE_RE = re.compile(r"(?:\^\d*)?[+-]$")
+# Words that may accompany a weight ("180.16 g/mol", "MW 58.44")
+WEIGHT_WORDS_RE = re.compile(r"g\s*/\s*mol|\b(?:MW|FW|Mr|Da)\b", re.IGNORECASE)
+NUMBER = r"~?\s*(\d+(?:[.,]\d+)?)"
+
+
+def parse_formula(text):
+    """
+    Parses a molecular formula ("C2H6O", "Ca(OH)2", "CuSO4·5H2O",
+    "C14H22O(C2H4O)n") into {element: count}. Counts inside an indefinite
+    repeat are None. Returns None when the text is not a formula.
+    """
+    text = CHARGE_RE.sub("", (text or "").strip())
+    composition, end = {}, 0
+    for m in PART_RE.finditer(text):
+        if m.start() != end:
+            return None
+        end = m.end()
+        group = _parse_group(m.group(2))
+        if group is None:
+            return None
+        _merge(composition, group, float(m.group(1)) if m.group(1) else 1)
+    if end != len(text) or not composition:
+        return None
+    return {el: (int(c) if c is not None and c == int(c) else c) for el, c in composition.items()}
+
+
+def _parse_group(text):
+    stack, pos = [{}], 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            return None
+        pos = m.end()
+        element, count, opening, closing, group_count = m.groups()
+        if element:
+            if element not in ATOMIC_WEIGHTS:
+                return None
+            _merge(stack[-1], {element: int(count) if count else 1}, 1)
+        elif opening:
+            stack.append({})
+        else:
+            if len(stack) == 1:
+                return None
+            group = stack.pop()
+            _merge(stack[-1], group, None if group_count.isalpha() else int(group_count or 1))
+    return stack[0] if len(stack) == 1 and stack[0] else None
+
+
+def _add(a, b):
+    return None if a is None or b is None else a + b
+
+
+def _merge(into, group, n):
+    """Adds n times group to into; n=None (an unknown repeat) makes the counts unknown."""
+    for el, c in group.items():
+        into[el] = _add(into.get(el, 0), None if c is None or n is None else c * n)
+
+
+def hill_formula(composition):
+    """Hill notation: C, then H, then the rest alphabetically (all alphabetical without carbon)."""
+    if "C" in composition:
+        order = ["C"] + (["H"] if "H" in composition else []) + sorted(set(composition) - {"C", "H"})
+    else:
+        order = sorted(composition)
+    return "".join(el + ("" if composition[el] == 1 else f"{composition[el]:g}") for el in order)
+
+
+def formula_weight(composition):
+    """Molar mass in g/mol, or None when a count is indefinite."""
+    if any(c is None for c in composition.values()):
+        return None
+    return round(sum(ATOMIC_WEIGHTS[el] * c for el, c in composition.items()), 3)
+
+
+@lru_cache(maxsize=8192)
+def parse_mol_info(text):
+    """
+    Splits a "Formula/Wt" entry such as "C2H6O / 46.07", "NaCl" or "180.16 g/mol"
+    into (composition, hill formula, molecular weight). The first token that
+    parses as a formula is taken; the weight is the stated number if there is
+    one (it may be that of a particular salt or hydrate), else the one computed
+    from the formula. Missing parts are None.
+    """
+    text = (text or "").strip()
+    composition, rest = None, text
+    for m in re.finditer(r"[^\s/,;]+", text):
+        token = m.group().strip("()") if m.group().startswith("(") and m.group().endswith(")") else m.group()
+        if re.fullmatch(r"~?[\d.,]+", token):
+            continue
+        parsed = parse_formula(token)
+        if not parsed:
+            continue
+        rest = text[:m.start()] + " " + text[m.end():]
+        # A lone symbol-like word ("In stock") only counts when nothing but a weight is beside it.
+        if re.search(r"\d|[A-Z].*[A-Z]", token) or not re.search(r"[^\W\d_]", WEIGHT_WORDS_RE.sub("", rest)):
+            composition = parsed
+            break
+        rest = text
+    weight = re.search(NUMBER, rest)
+    weight = float(weight.group(1).replace(",", ".")) if weight else None
+    if composition is None:
+        return None, None, weight
+    exact = all(c is not None for c in composition.values())
+    return composition, hill_formula(composition) if exact else None, weight or formula_weight(composition)
+
+
+def formula(text):
+    """SQL function: Hill formula of a "Formula/Wt" entry (NULL if none or indefinite)."""
+    return parse_mol_info(text)[1]
+
+
+def mol_weight(text):
+    """SQL function: molecular weight of a "Formula/Wt" entry (NULL if unknown)."""
+    return parse_mol_info(text)[2]
+
+
+def formula_elements(text):
+    """SQL function: composition as a JSON object {element: count} for json_each() (NULL if none)."""
+    composition = parse_mol_info(text)[0]
+    return json.dumps(composition) if composition else None
+
+
+def register_functions(conn):
+    """Makes formula()/mol_weight()/formula_elements() available to refresh() on this connection."""
+    conn.create_function("formula", 1, formula, deterministic=True)
+    conn.create_function("mol_weight", 1, mol_weight, deterministic=True)
+    conn.create_function("formula_elements", 1, formula_elements, deterministic=True)
+
+
+# --- Schema ---
+
+def create_formula_columns(conn):
+    """
+    Adds the indexed formula/mol_weight columns and {table}_elements (one row
+    per element of each item, keyed by element so that "contains Hg" is an
+    index range), plus the triggers that queue rows for refresh() when the
+    text column is written (see triggers.py). Existing rows are parsed once.
+    The connection must have register_functions() applied.
+    """
+    for table, col in FORMULA_COLUMNS.items():
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]
+        new = "mol_weight" not in cols
+        if new:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN formula TEXT")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN mol_weight REAL")
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS {table}_elements
+                         (element TEXT NOT NULL, item_id INTEGER NOT NULL, count REAL,
+                          PRIMARY KEY (element, item_id)) WITHOUT ROWID""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_elements_item ON {table}_elements(item_id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_formula ON {table}(formula)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_mol_weight ON {table}(mol_weight)")
+        ensure_trigger(conn, insert_trigger_sql(table))
+        ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS {table}_formula_au AFTER UPDATE OF {col} ON {table}
+                                 BEGIN
+                                     {queue_sql(f'{table}_formula', 'new.id')}
+                                 END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_formula_ad AFTER DELETE ON {table} BEGIN
+                             DELETE FROM {table}_elements WHERE item_id = old.id;
+                         END""")
+        if new:
+            backfill(conn, table)
+            parsed = conn.execute(f"SELECT COUNT(mol_weight), COUNT(formula), COUNT(*) FROM {table}").fetchone()
+            logger.info(f"Migrated {table}.{col}: {parsed[1]} formula(s) and {parsed[0]} weight(s) "
+                        f"parsed in {parsed[2]} row(s).")
+
+
+def insert_trigger_sql(table):
+    return f"""CREATE TRIGGER IF NOT EXISTS {table}_formula_ai AFTER INSERT ON {table} BEGIN
+                  {queue_sql(f'{table}_formula', 'new.id')}
+              END"""
+
+
+def refresh(conn, table, where="1", params=()):
+    """Recomputes formula, mol_weight and the element rows of the rows t of table matching where."""
+    col = FORMULA_COLUMNS[table]
+    conn.execute(f"UPDATE {table} AS t SET formula = formula(t.{col}), mol_weight = mol_weight(t.{col}) "
+                 f"WHERE {where}", params)
+    conn.execute(f"DELETE FROM {table}_elements WHERE item_id IN (SELECT t.id FROM {table} t WHERE {where})", params)
+    conn.execute(f"""INSERT INTO {table}_elements (element, item_id, count)
+                     SELECT j.key, t.id, j.value FROM {table} t, json_each(formula_elements(t.{col})) j
+                     WHERE {where}""", params)
+
+
+def backfill(conn, table, after_id=0):
+    """Set-based form of the insert trigger for rows with id > after_id."""
+    refresh(conn, table, "t.id > ?", (after_id,))
+
+
+defer_on_bulk_insert("formula_ai", FORMULA_COLUMNS, insert_trigger_sql, backfill)
+for _table in FORMULA_COLUMNS:
+    register_derived(f"{_table}_formula", _table, refresh)
+
+
+# --- Search ---
+
+def element_symbol(text):
+    """
+    Canonical spelling of an element symbol, or None. All-lower-case input is
+    accepted ("hg" -> "Hg"); otherwise the case must be right, so that "CO"
+    stays carbon monoxide rather than cobalt.
+    """
+    text = (text or "").strip()
+    if text in ATOMIC_WEIGHTS:
+        return text
+    return _SYMBOLS.get(text) if text.islower() else None
+
+
+def composition_filter(table, any_of=(), all_of=(), none_of=(), formula=None, mw_min=None, mw_max=None):
+    """
+    Builds an indexed (where, params) over the parsed formula data, to combine
+    with search.build_filter(): items containing any of / all of / none of the
+    given elements, with exactly this formula (any notation; compared in Hill
+    order) or with a molecular weight within [mw_min, mw_max].
+    """
+    clauses, params = [], []
+    elements = f"{table}_elements"
+    if len(set(all_of)) == 1:
+        any_of, all_of = tuple(any_of) + tuple(all_of), ()
+    if any_of:
+        clauses.append(f"id IN (SELECT item_id FROM {elements} WHERE element IN ({', '.join('?' * len(any_of))}))")
+        params.extend(any_of)
+    if all_of:
+        # Driven by the rarest element's primary-key range; the others are point lookups.
+        rarest, *others = sorted(set(all_of), key=lambda el: COMMON_ELEMENTS.get(el, -1))
+        joins = " ".join(f"JOIN {elements} e{i} ON e{i}.element = ? AND e{i}.item_id = e0.item_id"
+                         for i in range(1, len(others) + 1))
+        clauses.append(f"id IN (SELECT e0.item_id FROM {elements} e0 {joins} WHERE e0.element = ?)")
+        params.extend(others + [rarest])
+    if none_of:
+        clauses.append(f"id NOT IN (SELECT item_id FROM {elements} WHERE element IN "
+                       f"({', '.join('?' * len(none_of))}))")
+        params.extend(none_of)
+    if formula:
+        composition = parse_formula(formula)
+        clauses.append("formula = ?")
+        params.append(hill_formula(composition) if composition else formula)
+    if mw_min is not None:
+        clauses.append("mol_weight >= ?")
+        params.append(mw_min)
+    if mw_max is not None:
+        clauses.append("mol_weight <= ?")
+        params.append(mw_max)
+    return (" AND ".join(clauses) or "1"), params
+
+
+def formula_clause(table, text):
+    """
+    Turns a Formula/Wt filter into composition_filter() terms:
+      "150..200", ">150", "<= 200"   molecular weight range (either end open)
+      "Hg|Pb", "Hg or Pb"            contains any of these elements
+      "Hg&Cl", "Hg and Cl", "Hg"     contains all of them
+      "-Cl", "not Cl"                contains none of them
+      "C2H6O", "=CH3CH2OH"           exact formula, in any notation
+    Returns None when the text is none of these, so callers can fall back to a
+    text match.
+    """
+    text = (text or "").strip()
+    m = re.fullmatch(rf"(<=|>=|<|>)\s*{NUMBER}", text)
+    if m:
+        value = float(m.group(2).replace(",", "."))
+        return composition_filter(table, **{"mw_min" if m.group(1).startswith(">") else "mw_max": value})
+    m = re.fullmatch(rf"(?:{NUMBER})?\s*\.\.\s*(?:{NUMBER})?", text)
+    if m and (m.group(1) or m.group(2)):
+        lo, hi = (float(g.replace(",", ".")) if g else None for g in m.groups())
+        return composition_filter(table, mw_min=lo, mw_max=hi)
+    if text.startswith("="):
+        composition = parse_formula(text[1:])
+        return composition_filter(table, formula=text[1:]) if composition else None
+    m = re.fullmatch(r"(?:-|not\s+)(.+)", text, re.IGNORECASE)
+    if m:
+        none_of = _symbols(m.group(1), r"\s*(?:[|&,]|\bor\b|\band\b)\s*")
+        return composition_filter(table, none_of=none_of) if none_of else None
+    any_of = _symbols(text, r"\s*(?:\||\bor\b)\s*")
+    if any_of and len(any_of) > 1:
+        return composition_filter(table, any_of=any_of)
+    all_of = _symbols(text, r"\s*(?:&|,|\band\b|\s)\s*")
+    if all_of:
+        return composition_filter(table, all_of=all_of)
+    if parse_formula(text):
+        return composition_filter(table, formula=text)
+    return None
+
+
+def _symbols(text, separator):
+    """Element symbols separated by `separator`, or None if any part is not a symbol."""
+    parts = [p for p in re.split(separator, text.strip(), flags=re.IGNORECASE) if p]
+    symbols = [element_symbol(p) for p in parts]
+    return symbols if parts and all(symbols) else None
@@ -0,0 +1,217 @@
+import re
+import math
+import time
+import sqlite3
+import logging
+from collections import Counter
+
+from .triggers import defer_on_bulk_insert
+
+logger = logging.getLogger(__name__)
+
+# Name and synonym columns of each table covered by typo-tolerant search.
+TRIGRAM_COLUMNS = {
+    "chemicals": ("name", "synonyms"),
+}
+
+
+def _parts(ref):
+    """json_each() source splitting a synonym list on ';' or ', ' ("1,4-Dioxane" stays whole)."""
+    return f"""json_each('[' || replace(replace(json_quote(IFNULL({ref}, '')), ', ', ';'), ';', '","') || ']')"""
+
+
+def _terms(table, row):
+    """SELECT of the distinct lower-case terms (name, each synonym) of one row."""
+    name, synonyms = TRIGRAM_COLUMNS[table]
+    return f"""SELECT lower(trim({row}.{name})) AS term
+               UNION SELECT lower(trim(value)) FROM {_parts(f'{row}.{synonyms}')}"""
+
+
+def _count(table, row, sign):
+    terms = f"{table}_terms"
+    if sign > 0:
+        return f"""INSERT INTO {terms}(term, items) SELECT term, 1 FROM ({_terms(table, row)}) WHERE term != ''
+                   ON CONFLICT(term) DO UPDATE SET items = items + 1;"""
+    return f"""UPDATE {terms} SET items = items - 1 WHERE term IN ({_terms(table, row)});
+               DELETE FROM {terms} WHERE items <= 0 AND term IN ({_terms(table, row)});"""
+
+
+def create_trigram_tables(conn):
+    """
+    Creates {table}_terms, the distinct names and synonyms of a table with
+    their row counts (kept current by triggers), and {table}_trgm, an FTS5
+    trigram index over those terms. Inventories repeat the same names many
+    times, so the index stays small however many rows there are. Returns
+    False when this SQLite build has no trigram tokenizer (< 3.34).
+    """
+    for table, cols in TRIGRAM_COLUMNS.items():
+        terms, trgm = f"{table}_terms", f"{table}_trgm"
+        existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (terms,)).fetchone()
+        try:
+            # detail='none': candidates are re-scored in Python, so positions are not needed.
+            conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {trgm} USING fts5(
+                             term, content='{terms}', content_rowid='id', tokenize='trigram', detail='none')""")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Trigram index unavailable, fuzzy search disabled: {e}")
+            return False
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {trgm}_vocab USING fts5vocab({trgm}, row)")
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS {terms}
+                         (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE, items INTEGER NOT NULL)""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {trgm}_ai AFTER INSERT ON {terms} BEGIN
+                             INSERT INTO {trgm}(rowid, term) VALUES (new.id, new.term);
+                         END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {trgm}_ad AFTER DELETE ON {terms} BEGIN
+                             INSERT INTO {trgm}({trgm}, rowid, term) VALUES ('delete', old.id, old.term);
+                         END""")
+
+        conn.execute(insert_trigger_sql(table))
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_terms_ad AFTER DELETE ON {table} BEGIN
+                             {_count(table, 'old', -1)}
+                         END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_terms_au AFTER UPDATE OF {', '.join(cols)} ON {table}
+                         BEGIN
+                             {_count(table, 'new', 1)}
+                             {_count(table, 'old', -1)}
+                         END""")
+        if not existed:
+            backfill(conn, table)
+            logger.info(f"Built trigram index {trgm} over {conn.execute(f'SELECT COUNT(*) FROM {terms}').fetchone()[0]} "
+                        f"distinct term(s).")
+    return True
+
+
+def insert_trigger_sql(table):
+    return f"""CREATE TRIGGER IF NOT EXISTS {table}_terms_ai AFTER INSERT ON {table} BEGIN
+                  {_count(table, 'new', 1)}
+              END"""
+
+
+def backfill(conn, table, after_id=0):
+    """Set-based form of the insert trigger for rows with id > after_id."""
+    name, synonyms = TRIGRAM_COLUMNS[table]
+    conn.execute(f"""INSERT INTO {table}_terms(term, items)
+                     SELECT term, COUNT(*) FROM (
+                         SELECT t.id, lower(trim(t.{name})) AS term FROM {table} t WHERE t.id > ?
+                         UNION SELECT t.id, lower(trim(j.value)) FROM {table} t, {_parts('t.' + synonyms)} j
+                               WHERE t.id > ?)
+                     WHERE term != '' GROUP BY term
+                     ON CONFLICT(term) DO UPDATE SET items = items + excluded.items""", (after_id, after_id))
+
+
+defer_on_bulk_insert("terms_ai", TRIGRAM_COLUMNS, insert_trigger_sql, backfill)
+
+
+# --- Scoring ---
+
+def trigrams(text, pad=True):
+    """Set of lower-case trigrams; padded like pg_trgm so that word starts and ends count."""
+    text = " ".join(text.lower().split())
+    if pad:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(query, term):
+    """Trigram similarity (0..1); a term containing the query verbatim scores at least 0.8."""
+    q, term = " ".join(query.lower().split()), term.lower()
+    q_grams, t_grams = trigrams(q), trigrams(term)
+    score = len(q_grams & t_grams) / len(q_grams | t_grams)
+    if q in term:
+        score = max(score, 0.8 + 0.2 * len(q) / len(term))
+    return score
+
+
+# --- Search ---
+
+# (database file, table) -> (newest change_log seq, {trigram: terms containing it}, total terms)
+_doc_counts = {}
+
+
+def doc_counts(db, table):
+    """
+    Number of terms containing each trigram. fts5vocab computes these by
+    walking the whole index, so they are cached until the inventory changes:
+    every write (by any client) adds a change_log entry, so a newer sequence
+    number means a name added since the counts were read must be found too.
+    """
+    key = (db.db_name, table)
+    seq = db.query("SELECT IFNULL(MAX(seq), 0) FROM change_log", cache=False)[0][0]
+    cached = _doc_counts.get(key)
+    if cached is None or cached[0] != seq:
+        counts = dict(db.query(f"SELECT term, doc FROM {table}_trgm_vocab", cache=False))
+        total = db.query(f"SELECT COUNT(*) FROM {table}_terms", cache=False)[0][0]
+        cached = _doc_counts[key] = (seq, counts, total)
+    return cached[1], cached[2]
+
+
+def similar_terms(db, query, table="chemicals", limit=10, candidates=200, max_grams=12, max_postings=20_000,
+                  min_score=0.3):
+    """
+    Names and synonyms resembling query: [(term, items, score)] best first.
+
+    The query's trigrams are probed rarest first (at most max_grams, and
+    while their combined posting lists stay within max_postings); terms are
+    ranked by the summed idf of the trigrams they share with the query and
+    the best `candidates` are re-scored with similarity(). When even the
+    rarest trigram is too common, all of them are AND-ed instead (so no
+    typo is tolerated for such queries).
+    """
+    grams = trigrams(query or "", pad=False)
+    if not grams:
+        return []
+    trgm = f"{table}_trgm"
+    counts, total = doc_counts(db, table)
+    # Trigrams the index has never seen (typos, mostly) cannot match anything.
+    known = sorted((counts[g], g) for g in grams if g in counts)
+    if not known:
+        return []
+    quote = lambda g: '"' + g.replace('"', '""') + '"'
+
+    if known[0][0] > max_postings:
+        ids = [r[0] for r in db.query(f"SELECT rowid FROM {trgm} WHERE {trgm} MATCH ? LIMIT ?",
+                                      (" AND ".join(quote(g) for _, g in known), candidates))]
+    else:
+        hits, postings = Counter(), 0
+        for docs, gram in known[:max_grams]:
+            if postings + docs > max_postings:
+                break
+            postings += docs
+            weight = math.log((total + 1) / docs)
+            for (term_id,) in db.query(f"SELECT rowid FROM {trgm} WHERE {trgm} MATCH ?", (quote(gram),),
+                                       cache=False):
+                hits[term_id] += weight
+        ids = [term_id for term_id, _ in hits.most_common(candidates)]
+    if not ids:
+        return []
+    rows = db.query(f"SELECT term, items FROM {table}_terms WHERE id IN ({', '.join('?' * len(ids))})", ids,
+                    cache=False)
+    scored = ((term, items, similarity(query, term)) for term, items in rows)
+    return sorted((s for s in scored if s[2] >= min_score), key=lambda s: (-s[2], -s[1], s[0]))[:limit]
+
+
+def fuzzy_search(db, query, table="chemicals", limit=20, min_score=0.3):
+    """
+    Typo-tolerant row search: [(id, name, synonyms, score)], rows of the most
+    similar term first. Rows are fetched by phrase through {table}_fts.
+    Queries shorter than three characters return [].
+    """
+    start = time.perf_counter()
+    terms = similar_terms(db, query, table, min_score=min_score)
+    name, synonyms = TRIGRAM_COLUMNS[table]
+    results, seen = [], set()
+    for term, _, score in terms:
+        if len(results) >= limit:
+            break
+        if not re.search(r"\w", term):
+            continue    # No words for the full-text index to look up
+        phrase = '"' + term.replace('"', '""') + '"'
+        rows = db.query(f"""SELECT id, {name}, {synonyms} FROM {table}
+                            WHERE id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ? LIMIT ?)""",
+                        (f"{{{name} {synonyms}}} : {phrase}", limit + len(seen)))
+        for row in rows:
+            if row[0] not in seen and len(results) < limit:
+                seen.add(row[0])
+                results.append((*row, score))
+    logger.debug(f"Fuzzy search '{query}': {len(terms)} similar term(s), {len(results)} row(s) "
+                 f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return results
@@ -0,0 +1,250 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Indexed columns the grids may sort on. Database creates an index for each.
+SORTABLE_COLUMNS = {
+    "chemicals": ("id", "name", "class", "ghs", "expiry"),
+    "biological": ("id", "name", "type", "organism", "bsl", "expiry"),
+}
+
+
+def sort_key(col):
+    """
+    SQL expression a grid sorts on. Keyset comparisons skip NULLs, so missing
+    values sort as ''; the indexes are built on the same expression.
+    """
+    return "id" if col == "id" else f"IFNULL({col}, '')"
+
+
+class VirtualGrid:
+    """
+    A windowed Treeview over an inventory table.
+
+    Only a few pages of rows are materialized at a time. Scrolling near either
+    edge fetches the neighbouring page with keyset pagination ((col, id) > (?, ?)
+    on an indexed column) and drops the page furthest away, so Tk memory stays
+    flat no matter how many rows match. Heading clicks sort with ORDER BY.
+    Treeview item ids are the database ids. extra_columns are SQL expressions
+    selected after the displayed columns (e.g. the expiry status) for tags_for.
+    """
+    def __init__(self, tree, db, table, columns, scrollbar=None, tags_for=None,
+                 extra_columns=(), page_size=200, max_pages=3):
+        self.tree = tree
+        self.db = db
+        self.table = table
+        self.columns = list(columns)
+        self.select_list = ", ".join(self.columns + list(extra_columns))
+        self.scrollbar = scrollbar
+        self.tags_for = tags_for or (lambda row: ())
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+
+        self.where, self.params = "1", []
+        self.sort_col, self.descending = "id", False
+        self.more_before = self.more_after = False
+        self._rows = {}
+        self._fetching = False
+
+        self._headings = dict(zip(self.columns, tree["columns"]))
+        for col, heading in self._headings.items():
+            if col in SORTABLE_COLUMNS[table]:
+                tree.heading(heading, command=lambda c=col: self.sort_by(c))
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    # --- SQL ---
+
+    def _page(self, where, params, key=None, forward=True, limit=None):
+        """Fetches one page after (forward) or before key in the current sort order."""
+        col = self.sort_col
+        expr = sort_key(col)
+        desc = self.descending == forward
+        op, direction = ("<", "DESC") if desc else (">", "ASC")
+
+        sql = f"SELECT {self.select_list} FROM {self.table} WHERE ({where})"
+        args = list(params)
+        if key is not None:
+            if col == "id":
+                sql += f" AND id {op} ?"
+                args.append(key[1])
+            else:
+                # The redundant single-column bound lets SQLite seek the expression index.
+                sql += f" AND {expr} {op}= ? AND ({expr}, id) {op} (?, ?)"
+                args.extend((key[0], *key))
+        order = f"id {direction}" if col == "id" else f"{expr} {direction}, id {direction}"
+        sql += f" ORDER BY {order} LIMIT ?"
+        args.append(limit or self.page_size)
+
+        rows = self.db.query(sql, args)
+        return rows if forward else rows[::-1]
+
+    def _key(self, row):
+        value = row[self.columns.index(self.sort_col)]
+        return ("" if value is None else value, row[0])
+
+    def first_page(self, where="1", params=()):
+        """Runs the first-page query for a filter. Safe to call from a worker thread."""
+        return where, list(params), self._page(where, params)
+
+    def current_query(self):
+        """SQL and parameters for every row of the active filter, in display order."""
+        direction = "DESC" if self.descending else "ASC"
+        order = f"id {direction}" if self.sort_col == "id" else f"{sort_key(self.sort_col)} {direction}, id {direction}"
+        return f"SELECT {self.select_list} FROM {self.table} WHERE ({self.where}) ORDER BY {order}", list(self.params)
+
+    # --- Rendering ---
+
+    def show(self, where, params, rows):
+        """Replaces the grid contents with the first page of a new result."""
+        self.where, self.params = where, list(params)
+        self.tree.delete(*self.tree.get_children())
+        self._rows.clear()
+        self.more_before = False
+        self.more_after = len(rows) == self.page_size
+        self._insert(rows)
+        self.tree.yview_moveto(0)
+
+    def reload(self):
+        """Re-runs the current filter from the top."""
+        self.show(*self.first_page(self.where, self.params))
+
+    def _insert(self, rows, index="end"):
+        for offset, r in enumerate(rows):
+            iid = str(r[0])
+            self._rows[iid] = r
+            pos = index if index == "end" else index + offset
+            self.tree.insert("", pos, iid=iid, values=r[:len(self.columns)], tags=self.tags_for(r))
+
+    def _remove(self, iids):
+        for iid in iids:
+            self._rows.pop(iid, None)
+        self.tree.delete(*iids)
+
+    def _position(self, key, exclude=None):
+        """
+        Index at which a row with this sort key belongs in the materialized window,
+        or None when it sorts outside the window (beyond rows not yet fetched).
+        """
+        children = [c for c in self.tree.get_children() if c != exclude]
+        for i, c in enumerate(children):
+            k = self._key(self._rows[c])
+            if (k < key) if self.descending else (k > key):
+                return None if i == 0 and self.more_before else i
+        return None if self.more_after else len(children)
+
+    def apply_change(self, op, row_id):
+        """
+        Applies one row-level change ("insert", "update" or "delete") without
+        re-running the whole query. The row is re-read by id under the active
+        filter, so edits that no longer match the search boxes drop out.
+        """
+        row = None
+        if op != "delete":
+            rows = self.db.query(f"SELECT {self.select_list} FROM {self.table} WHERE id=? AND ({self.where})",
+                                 [row_id, *self.params])
+            row = rows[0] if rows else None
+        self._apply(str(row_id), row)
+
+    def _apply(self, iid, row):
+        """Puts a re-read row (None: gone or filtered out) in its sorted place."""
+        pos = self._position(self._key(row), exclude=iid) if row else None
+        if pos is None:
+            if iid in self._rows:
+                self._remove([iid])
+            return
+        if iid in self._rows:
+            # Update in place so selection and focus survive the edit.
+            self._rows[iid] = row
+            self.tree.item(iid, values=row[:len(self.columns)], tags=self.tags_for(row))
+            if self.tree.index(iid) != pos:
+                # Detach first so pos counts the remaining siblings only.
+                self.tree.detach(iid)
+                self.tree.move(iid, "", pos)
+        else:
+            self._insert([row], index=pos)
+
+    def apply_changes(self, changes, chunk=500):
+        """
+        Applies a ChangeFeed.poll() result or a batch edit: [(op, row_id)], or
+        None to reload. Changed rows are re-read with one query per `chunk`
+        ids and deleted ones leave the Treeview in one call.
+        """
+        if changes is None:
+            self.reload()
+            return
+        deleted = [str(row_id) for op, row_id in changes if op == "delete"]
+        gone = [iid for iid in deleted if iid in self._rows]
+        if gone:
+            self._remove(gone)
+        ids = list(dict.fromkeys(row_id for op, row_id in changes if op != "delete"))
+        for i in range(0, len(ids), chunk):
+            part = ids[i:i + chunk]
+            rows = {r[0]: r for r in self.db.query(
+                f"SELECT {self.select_list} FROM {self.table} WHERE id IN ({', '.join('?' * len(part))}) "
+                f"AND ({self.where})", [*part, *self.params])}
+            for row_id in part:
+                self._apply(str(row_id), rows.get(row_id))
+
+    def row(self, iid):
+        """The full row (displayed and extra columns) behind a Treeview item, if loaded."""
+        return self._rows.get(str(iid))
+
+    def sort_by(self, col):
+        """Sorts on an indexed column in SQL; a second click reverses the order."""
+        if col == self.sort_col:
+            self.descending = not self.descending
+        else:
+            self.sort_col, self.descending = col, False
+        for c, heading in self._headings.items():
+            arrow = (" ▼" if self.descending else " ▲") if c == col else ""
+            self.tree.heading(heading, text=heading + arrow)
+        logger.info(f"Grid {self.table}: sorting by {col} {'DESC' if self.descending else 'ASC'}")
+        self.reload()
+
+    # --- Scrolling ---
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if self._fetching:
+            return
+        if float(last) > 0.9 and self.more_after:
+            self.tree.after_idle(self._fetch_after)
+        elif float(first) < 0.1 and self.more_before:
+            self.tree.after_idle(self._fetch_before)
+
+    def _fetch_after(self):
+        children = self.tree.get_children()
+        if self._fetching or not self.more_after or not children:
+            return
+        self._fetching = True
+        try:
+            rows = self._page(self.where, self.params, self._key(self._rows[children[-1]]))
+            self.more_after = len(rows) == self.page_size
+            top = float(self.tree.yview()[0]) * len(children)
+            self._insert(rows)
+            excess = len(children) + len(rows) - self.max_rows
+            if excess > 0:
+                self._remove(children[:excess])
+                self.more_before = True
+                self.tree.yview_moveto(max(top - excess, 0) / len(self.tree.get_children()))
+        finally:
+            self._fetching = False
+
+    def _fetch_before(self):
+        children = self.tree.get_children()
+        if self._fetching or not self.more_before or not children:
+            return
+        self._fetching = True
+        try:
+            rows = self._page(self.where, self.params, self._key(self._rows[children[0]]), forward=False)
+            self.more_before = len(rows) == self.page_size
+            top = float(self.tree.yview()[0]) * len(children)
+            self._insert(rows, index=0)
+            excess = len(children) + len(rows) - self.max_rows
+            if excess > 0:
+                self._remove(children[len(children) - excess:])
+                self.more_after = True
+            self.tree.yview_moveto((top + len(rows)) / len(self.tree.get_children()))
+        finally:
+            self._fetching = False
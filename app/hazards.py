@@ -0,0 +1,288 @@
+import re
+import json
+import logging
+from functools import lru_cache
+
+from .triggers import defer_on_bulk_insert, register_derived, queue_sql, ensure_trigger
+
+logger = logging.getLogger(__name__)
+
+# Free-text hazard column of each table. Parsed copies are kept in ghs_mask (one
+# bit per pictogram) and {table}_hazard_codes (every GHS, H and P code of an item).
+HAZARD_COLUMNS = {"chemicals": "ghs"}
+# Column that stands for the storage area in segregation_report()
+STORAGE_GROUP = {"chemicals": "class"}
+
+# Pictogram -> (bit, name accepted in filters)
+PICTOGRAMS = {
+    "GHS01": (1 << 0, "explosive"),
+    "GHS02": (1 << 1, "flammable"),
+    "GHS03": (1 << 2, "oxidizer"),
+    "GHS04": (1 << 3, "gas"),
+    "GHS05": (1 << 4, "corrosive"),
+    "GHS06": (1 << 5, "toxic"),
+    "GHS07": (1 << 6, "harmful"),
+    "GHS08": (1 << 7, "health"),
+    "GHS09": (1 << 8, "environment"),
+}
+ALL_MASKS = range(1 << len(PICTOGRAMS))
+
+# Pictogram implied by each H statement, so entries listing only H codes are classified too.
+H_PICTOGRAMS = {
+    "GHS01": ("H200", "H201", "H202", "H203", "H204", "H205", "H240", "H241"),
+    "GHS02": ("H220", "H221", "H222", "H223", "H224", "H225", "H226", "H228", "H229", "H230", "H231", "H232",
+              "H242", "H250", "H251", "H252", "H260", "H261"),
+    "GHS03": ("H270", "H271", "H272"),
+    "GHS04": ("H280", "H281"),
+    "GHS05": ("H290", "H314", "H318"),
+    "GHS06": ("H300", "H301", "H310", "H311", "H330", "H331"),
+    "GHS07": ("H302", "H312", "H315", "H317", "H319", "H332", "H335", "H336"),
+    "GHS08": ("H304", "H334", "H340", "H341", "H350", "H351", "H360", "H361", "H362", "H370", "H371",
+              "H372", "H373"),
+    "GHS09": ("H400", "H410", "H411"),
+}
+_H_BITS = {h: PICTOGRAMS[p][0] for p, codes in H_PICTOGRAMS.items() for h in codes}
+
+# Pictograms that must not share a storage area (see segregation_report)
+INCOMPATIBLE = (
+    ("GHS02", "GHS03", "flammables with oxidizers"),
+    ("GHS01", "GHS02", "explosives with flammables"),
+    ("GHS01", "GHS03", "explosives with oxidizers"),
+    ("GHS04", "GHS02", "compressed gases with flammables"),
+)
+
+CODE_RE = re.compile(r"\b(GHS0[1-9]|EUH\d{3}[A-Za-z]{0,2}|H\d{3}[A-Za-z]{0,2}|P\d{3}(?:\s*\+\s*P\d{3})*)\b",
+                     re.IGNORECASE)
+
+
+@lru_cache(maxsize=8192)
+def parse_hazards(text):
+    """
+    Extracts the hazard codes of an entry such as "GHS02, GHS07" or
+    "H225 H319; P210+P233" into (mask, codes): the pictogram bitmask (stated
+    pictograms plus those implied by H statements) and the sorted codes, with
+    combined P statements split ("P210+P233" -> P210, P233).
+    """
+    codes = set()
+    for code in CODE_RE.findall(text or ""):
+        codes.update(c.strip().upper() for c in code.split("+"))
+    mask = 0
+    for code in codes:
+        mask |= PICTOGRAMS[code][0] if code in PICTOGRAMS else _H_BITS.get(code[:4], 0)
+    return mask, tuple(sorted(codes))
+
+
+def ghs_mask(text):
+    """SQL function: pictogram bitmask of a hazard entry (0 if none)."""
+    return parse_hazards(text)[0]
+
+
+def hazard_codes(text):
+    """SQL function: codes of a hazard entry as a JSON array for json_each() (NULL if none)."""
+    codes = parse_hazards(text)[1]
+    return json.dumps(codes) if codes else None
+
+
+def register_functions(conn):
+    """Makes ghs_mask()/hazard_codes() available to refresh() on this connection."""
+    conn.create_function("ghs_mask", 1, ghs_mask, deterministic=True)
+    conn.create_function("hazard_codes", 1, hazard_codes, deterministic=True)
+
+
+def pictogram_names(mask):
+    """Pictogram codes set in a mask, e.g. 6 -> ['GHS02', 'GHS03']."""
+    return [code for code, (bit, _) in PICTOGRAMS.items() if mask & bit]
+
+
+# --- Schema ---
+
+def create_hazard_columns(conn):
+    """
+    Adds the indexed ghs_mask column and {table}_hazard_codes (keyed by code,
+    so "every H3xx" is an index range), plus the triggers that queue rows for
+    refresh() when the text column is written (see triggers.py). Existing
+    rows are parsed once. The connection must have register_functions() applied.
+    """
+    for table, col in HAZARD_COLUMNS.items():
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]
+        new = "ghs_mask" not in cols
+        if new:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ghs_mask INTEGER NOT NULL DEFAULT 0")
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS {table}_hazard_codes
+                         (code TEXT NOT NULL, item_id INTEGER NOT NULL,
+                          PRIMARY KEY (code, item_id)) WITHOUT ROWID""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_hazard_codes_item ON {table}_hazard_codes(item_id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ghs_mask ON {table}(ghs_mask)")
+        # Covers the segregation report's GROUP BY, so it never touches the table
+        group = STORAGE_GROUP[table]
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{group}_ghs_mask ON {table}({group}, ghs_mask)")
+        ensure_trigger(conn, insert_trigger_sql(table))
+        ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS {table}_hazard_au AFTER UPDATE OF {col} ON {table} BEGIN
+                                     {queue_sql(f'{table}_hazard', 'new.id')}
+                                 END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_hazard_ad AFTER DELETE ON {table} BEGIN
+                             DELETE FROM {table}_hazard_codes WHERE item_id = old.id;
+                         END""")
+        if new:
+            backfill(conn, table)
+            parsed = conn.execute(f"SELECT COUNT(*) FILTER (WHERE ghs_mask != 0), COUNT(*) FROM {table}").fetchone()
+            logger.info(f"Migrated {table}.{col}: {parsed[0]} of {parsed[1]} row(s) carry hazard pictograms.")
+
+
+def insert_trigger_sql(table):
+    return f"""CREATE TRIGGER IF NOT EXISTS {table}_hazard_ai AFTER INSERT ON {table} BEGIN
+                  {queue_sql(f'{table}_hazard', 'new.id')}
+              END"""
+
+
+def refresh(conn, table, where="1", params=()):
+    """Recomputes ghs_mask and the hazard code rows of the rows t of table matching where."""
+    col = HAZARD_COLUMNS[table]
+    conn.execute(f"UPDATE {table} AS t SET ghs_mask = ghs_mask(t.{col}) WHERE {where}", params)
+    conn.execute(f"DELETE FROM {table}_hazard_codes WHERE item_id IN (SELECT t.id FROM {table} t WHERE {where})",
+                 params)
+    conn.execute(f"""INSERT OR IGNORE INTO {table}_hazard_codes (code, item_id)
+                     SELECT j.value, t.id FROM {table} t, json_each(hazard_codes(t.{col})) j
+                     WHERE {where}""", params)
+
+
+def backfill(conn, table, after_id=0):
+    """Set-based form of the insert trigger for rows with id > after_id."""
+    refresh(conn, table, "t.id > ?", (after_id,))
+
+
+defer_on_bulk_insert("hazard_ai", HAZARD_COLUMNS, insert_trigger_sql, backfill)
+for _table in HAZARD_COLUMNS:
+    register_derived(f"{_table}_hazard", _table, refresh)
+
+
+# --- Search ---
+
+def mask_clause(all_of=0, any_of=0, none_of=0):
+    """
+    Bitwise condition on ghs_mask as an (sql, params) IN list of every mask
+    that satisfies it. There are only 512 masks, so the IN list is short
+    and, unlike `ghs_mask & ? != 0`, it can use the index.
+    """
+    masks = [m for m in ALL_MASKS
+             if m & all_of == all_of and (not any_of or m & any_of) and not m & none_of]
+    if len(masks) == len(ALL_MASKS):
+        return "1", []
+    if not masks:
+        return "0", []
+    return f"ghs_mask IN ({', '.join(map(str, masks))})", []
+
+
+def _code_range(code):
+    """
+    Key range of a code and its variants ("H360" also finds H360FD), or of a
+    series written "H3xx", "H3*" or "H3".
+    """
+    prefix = code.upper().rstrip("X*")
+    return prefix, prefix + "\uffff"
+
+
+def _term(text):
+    """('mask', bit) for a pictogram (code or name), ('code', (low, high)) for a statement code, else None."""
+    text = text.strip()
+    upper = text.upper()
+    if upper in PICTOGRAMS:
+        return "mask", PICTOGRAMS[upper][0]
+    for bit, name in PICTOGRAMS.values():
+        if text.lower() in (name, name + "s"):
+            return "mask", bit
+    if re.fullmatch(r"(EUH|[HP])\d{0,3}(?:x*|\*)|(EUH|H)\d{3}[A-Za-z]{0,2}", text, re.IGNORECASE):
+        return "code", _code_range(text)
+    return None
+
+
+def hazard_clause(table, text):
+    """
+    Turns a hazard filter into indexed conditions:
+      "GHS02", "flammable"                 pictogram (stated or implied by an H code)
+      "GHS02 & GHS03", "GHS02, oxidizer"   all of them
+      "GHS06 | GHS08", "toxic or health"   any of them
+      "-GHS05", "not corrosive"            none of them
+      "H300", "H3xx", "P2*"                statement code or series
+    Returns None when the text is none of these, so callers can fall back to
+    a text match.
+    """
+    text = (text or "").strip()
+    m = re.fullmatch(r"(?:-|not\s+)(.+)", text, re.IGNORECASE)
+    negate = bool(m)
+    if negate:
+        text = m.group(1)
+    for mode, separator in (("any", r"\s*(?:\||\bor\b)\s*"), ("all", r"\s*(?:&|,|\band\b|\s)\s*")):
+        parts = [p for p in re.split(separator, text, flags=re.IGNORECASE) if p]
+        terms = [_term(p) for p in parts]
+        if parts and all(terms) and (mode == "all" or len(terms) > 1):
+            break
+    else:
+        return None
+    mode = "none" if negate else mode
+    bits = 0
+    for kind, value in terms:
+        bits |= value if kind == "mask" else 0
+    ranges = [value for kind, value in terms if kind == "code"]
+
+    clauses, params = [], []
+    codes = f"{table}_hazard_codes"
+    lookups = [f"SELECT item_id FROM {codes} WHERE code BETWEEN ? AND ?" for _ in ranges]
+    for low, high in ranges:
+        params.extend((low, high))
+    if mode == "any":
+        # Either a pictogram bit or a code; the union of both lookups
+        if lookups:
+            mask_sql = mask_clause(any_of=bits)[0] if bits else "0"
+            return f"({mask_sql} OR id IN ({' UNION ALL '.join(lookups)}))", params
+        return mask_clause(any_of=bits)
+    if bits:
+        clauses.append(mask_clause(**{mode + "_of": bits})[0])
+    if lookups:
+        joined = " INTERSECT ".join(lookups) if mode == "all" else " UNION ALL ".join(lookups)
+        clauses.append(f"id {'NOT IN' if mode == 'none' else 'IN'} ({joined})")
+    return " AND ".join(clauses), params
+
+
+# --- Segregation ---
+
+def segregation_report(db, table="chemicals", group_by=None, rules=INCOMPATIBLE):
+    """
+    Checks every storage group (the values of group_by, STORAGE_GROUP by
+    default) for incompatible pictograms sharing it, in one GROUP BY over
+    (group, ghs_mask), which the default group's index covers:
+    [{"group", "items", "hazardous", "pictograms": {code: items},
+      "conflicts": [(description, items_a, items_b)]}], groups with conflicts first.
+    """
+    group_by = group_by or STORAGE_GROUP[table]
+    if not re.fullmatch(r"\w+", group_by):
+        raise ValueError(f"Invalid group column: {group_by}")
+    groups = {}
+    for group, mask, items in db.query(f"SELECT {group_by}, ghs_mask, COUNT(*) FROM {table} GROUP BY 1, 2",
+                                       cache=False):
+        group = (group or "").strip()
+        g = groups.setdefault(group, {"group": group, "items": 0, "hazardous": 0,
+                                      "pictograms": dict.fromkeys(PICTOGRAMS, 0), "conflicts": []})
+        g["items"] += items
+        g["hazardous"] += items if mask else 0
+        for code in pictogram_names(mask):
+            g["pictograms"][code] += items
+    for g in groups.values():
+        for a, b, description in rules:
+            if g["pictograms"][a] and g["pictograms"][b]:
+                g["conflicts"].append((description, g["pictograms"][a], g["pictograms"][b]))
+        g["pictograms"] = {code: n for code, n in g["pictograms"].items() if n}
+    return sorted(groups.values(), key=lambda g: (not g["conflicts"], -g["hazardous"], g["group"]))
+
+
+def format_segregation(report, group_label="class"):
+    """Plain-text rendering of segregation_report() for the CLI and the GUI."""
+    lines = []
+    conflicted = [g for g in report if g["conflicts"]]
+    lines.append(f"{len(conflicted)} of {len(report)} {group_label} group(s) store incompatible hazards together.")
+    for g in report:
+        pictograms = ", ".join(f"{code} {n:,}" for code, n in g["pictograms"].items()) or "-"
+        lines.append(f"\n{g['group'] or '(none)'}: {g['items']:,} item(s), {g['hazardous']:,} hazardous ({pictograms})")
+        for description, a, b in g["conflicts"]:
+            lines.append(f"  ! {description}: {a:,} / {b:,} item(s)")
+    return "\n".join(lines)
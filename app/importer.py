@@ -0,0 +1,153 @@
+import csv
+import time
+import logging
+from pathlib import Path
+from collections import namedtuple
+
+from .expiry import parse_date
+from .triggers import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+# Insertable columns of each inventory table, in INSERT order.
+TABLE_COLUMNS = {
+    "chemicals": ("name", "synonyms", "class", "mol_info", "quantity", "ghs", "expiry"),
+    "biological": ("name", "type", "organism", "medium", "container", "qty", "bsl", "expiry"),
+}
+
+# Spreadsheet headings (lower-case, single-spaced) recognised for each column.
+HEADER_ALIASES = {
+    "chemicals": {
+        "chemical name": "name", "chemical": "name", "reagent": "name",
+        "synonym": "synonyms", "other names": "synonyms",
+        "chemical class": "class", "category": "class",
+        "formula": "mol_info", "formula/wt": "mol_info", "mol. wt": "mol_info", "mol info": "mol_info",
+        "molecular weight": "mol_info",
+        "qty": "quantity", "current qty": "quantity", "amount": "quantity", "stock": "quantity",
+        "hazard": "ghs", "hazard (ghs)": "ghs", "ghs codes": "ghs",
+    },
+    "biological": {
+        "sample name": "name", "sample": "name",
+        "sample type": "type", "source organism": "organism", "source": "organism", "species": "organism",
+        "preservative/medium": "medium", "preservative": "medium",
+        "container type": "container", "vol / qty": "qty", "volume": "qty", "quantity": "qty",
+        "bsl level": "bsl", "biosafety level": "bsl",
+    },
+}
+COMMON_ALIASES = {"expiry date": "expiry", "expiration": "expiry", "expiration date": "expiry",
+                  "exp": "expiry", "expiry (yyyy-mm-dd)": "expiry"}
+
+ImportResult = namedtuple("ImportResult", "inserted rejected reject_path seconds")
+
+
+def _normalize_header(h):
+    return " ".join(h.strip().lower().split())
+
+
+def map_headers(table, headers, mapping=None):
+    """
+    Returns {source column index: table column}. An explicit mapping of
+    {source heading: table column} takes precedence over the built-in aliases.
+    """
+    columns = TABLE_COLUMNS[table]
+    aliases = {c: c for c in columns}
+    aliases.update(COMMON_ALIASES)
+    aliases.update(HEADER_ALIASES[table])
+    explicit = {_normalize_header(k): v for k, v in (mapping or {}).items()}
+
+    result = {}
+    for i, h in enumerate(headers):
+        key = _normalize_header(h)
+        col = explicit.get(key) or aliases.get(key)
+        if col in columns and col not in result.values():
+            result[i] = col
+        else:
+            logger.info(f"Import: ignoring column '{h}'")
+    if "name" not in result.values():
+        raise ValueError(f"No column maps to 'name' (headers: {', '.join(headers)})")
+    return result
+
+
+def _sniff_delimiter(path, sample):
+    if Path(path).suffix.lower() in (".tsv", ".tab"):
+        return "\t"
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def import_file(db, path, table, mapping=None, batch_size=20000, reject_path=None, delimiter=None):
+    """
+    Streams a CSV/TSV file into an inventory table.
+
+    Rows are validated a batch at a time (a name is required; a non-empty expiry
+    must be a recognisable date and is stored as YYYY-MM-DD) and written with
+    executemany, one transaction per batch. Rejected rows are copied, with the
+    reason, to reject_path (default: <file>.rejects.csv) which is only created
+    when something was rejected.
+    """
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown inventory table: {table}")
+    columns = TABLE_COLUMNS[table]
+    reject_path = Path(reject_path or f"{path}.rejects.csv")
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    start = time.perf_counter()
+    inserted = rejected = 0
+    reject_file = reject_writer = None
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        delimiter = delimiter or _sniff_delimiter(path, f.read(8192))
+        f.seek(0)
+        reader = csv.reader(f, delimiter=delimiter)
+        headers = next(reader, None)
+        if not headers:
+            raise ValueError("The file is empty.")
+        col_map = map_headers(table, headers, mapping)
+        positions = [next((i for i, c in col_map.items() if c == col), None) for col in columns]
+        name_pos, expiry_pos = columns.index("name"), columns.index("expiry")
+
+        def flush(batch, bad):
+            nonlocal inserted, rejected, reject_file, reject_writer
+            if batch:
+                with db.transaction() as conn, bulk_insert(conn, table):
+                    conn.executemany(sql, batch)
+                inserted += len(batch)
+            if bad:
+                if reject_writer is None:
+                    reject_file = open(reject_path, "w", newline="", encoding="utf-8")
+                    reject_writer = csv.writer(reject_file)
+                    reject_writer.writerow(["line", "error"] + headers)
+                reject_writer.writerows(bad)
+                rejected += len(bad)
+
+        try:
+            batch, bad = [], []
+            for line_no, raw in enumerate(reader, start=2):
+                if not any(v.strip() for v in raw):
+                    continue
+                values = [raw[p].strip() if p is not None and p < len(raw) else "" for p in positions]
+                if not values[name_pos]:
+                    bad.append([line_no, "missing name"] + raw)
+                    continue
+                if values[expiry_pos]:
+                    d = parse_date(values[expiry_pos])
+                    if d is None:
+                        bad.append([line_no, f"invalid expiry date '{values[expiry_pos]}'"] + raw)
+                        continue
+                    values[expiry_pos] = d.isoformat()
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    flush(batch, bad)
+                    batch, bad = [], []
+            flush(batch, bad)
+        finally:
+            if reject_file:
+                reject_file.close()
+
+    seconds = time.perf_counter() - start
+    logger.info(f"Inventory Import: {inserted} row(s) into {table} from {path} in {seconds:.2f}s "
+                f"({inserted / seconds if seconds else 0:,.0f} rows/s), {rejected} rejected")
+    # One summary event per file; per-row audit records would double the cost of an import.
+    db.audit.record("import", table, after={"file": str(path), "inserted": inserted, "rejected": rejected})
+    return ImportResult(inserted, rejected, str(reject_path) if rejected else None, seconds)
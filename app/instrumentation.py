@@ -0,0 +1,147 @@
+import re
+import time
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+BUCKET_LABELS = tuple(f"<={b:g}ms" for b in BUCKETS_MS) + (f">{BUCKETS_MS[-1]:g}ms",)
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Collapses whitespace so one statement always maps to one key."""
+    return WHITESPACE_RE.sub(" ", sql).strip()
+
+
+class StatementStats:
+    """Timing histogram and row counts of one SQL statement."""
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "errors", "buckets", "plan")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.plan = None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "errors": self.errors,
+            "histogram": {label: n for label, n in zip(BUCKET_LABELS, self.buckets) if n},
+            "plan": self.plan,
+        }
+
+
+class QueryStats:
+    """
+    Per-statement timings, row counts and connection/commit counters for
+    Database. Statements slower than slow_ms are logged at WARNING level with
+    their EXPLAIN QUERY PLAN. Thread-safe; recording costs a dict lookup.
+    """
+    def __init__(self, slow_ms=200.0):
+        self.slow_ms = slow_ms
+        self.counters = {"connections": 0, "queries": 0, "writes": 0, "commits": 0,
+                         "rollbacks": 0, "errors": 0, "slow": 0, "lock_retries": 0}
+        self._statements = {}
+        self._started = time.time()
+        self._lock = threading.Lock()
+        self._reporter = None
+        self._stop = threading.Event()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def record(self, sql, elapsed_ms, rows=0, error=False, write=False):
+        """Adds one execution of sql. Returns True when it was slower than slow_ms."""
+        key = normalize_sql(sql)
+        slow = self.slow_ms is not None and elapsed_ms >= self.slow_ms
+        with self._lock:
+            st = self._statements.get(key)
+            if st is None:
+                st = self._statements[key] = StatementStats()
+            st.count += 1
+            st.total_ms += elapsed_ms
+            st.max_ms = max(st.max_ms, elapsed_ms)
+            st.rows += max(rows, 0)
+            st.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+            self.counters["writes" if write else "queries"] += 1
+            if error:
+                st.errors += 1
+                self.counters["errors"] += 1
+            if slow:
+                self.counters["slow"] += 1
+        return slow
+
+    def log_slow(self, conn, sql, params, elapsed_ms):
+        """Logs a slow statement with its query plan (best effort)."""
+        try:
+            plan = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        except Exception as e:
+            plan = [f"(plan unavailable: {e})"]
+        with self._lock:
+            st = self._statements.get(normalize_sql(sql))
+            if st is not None:
+                st.plan = plan
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms >= {self.slow_ms:g} ms): {normalize_sql(sql)} "
+                       f"| params: {list(params)[:10]} | plan: {' / '.join(plan)}")
+
+    # --- Reporting ---
+
+    def snapshot(self, top=None):
+        """All counters and per-statement stats, slowest total time first."""
+        with self._lock:
+            statements = sorted(((sql, st.as_dict()) for sql, st in self._statements.items()),
+                                key=lambda item: item[1]["total_ms"], reverse=True)
+            return {
+                "uptime_s": round(time.time() - self._started, 1),
+                "slow_ms": self.slow_ms,
+                "counters": dict(self.counters),
+                "statements": dict(statements[:top] if top else statements),
+            }
+
+    def summary(self, top=10, extra=None):
+        """Human-readable report of snapshot(top) for logs, the CLI and the UI."""
+        snap = self.snapshot(top)
+        c = snap["counters"]
+        lines = [f"Database activity over {snap['uptime_s']:.0f}s: {c['queries']} queries, {c['writes']} writes, "
+                 f"{c['commits']} commits, {c['rollbacks']} rollbacks, {c['errors']} errors, "
+                 f"{c['slow']} slow (>= {snap['slow_ms']:g} ms), {c['lock_retries']} lock retries, "
+                 f"{c['connections']} connection(s) opened"]
+        for label, value in (extra or {}).items():
+            lines.append(f"{label}: {value}")
+        if snap["statements"]:
+            lines.append(f"Top {len(snap['statements'])} statements by total time:")
+        for sql, st in snap["statements"].items():
+            text = sql if len(sql) <= 120 else sql[:117] + "..."
+            lines.append(f"  {st['count']:>7}x  avg {st['avg_ms']:>8.2f} ms  max {st['max_ms']:>8.2f} ms  "
+                         f"rows {st['rows']:>9}  {text}")
+        return "\n".join(lines)
+
+    def start_reporter(self, interval_s, extra=None):
+        """Logs summary() every interval_s seconds from a daemon thread until stop_reporter()."""
+        if self._reporter is not None or not interval_s:
+            return
+
+        def run():
+            while not self._stop.wait(interval_s):
+                logger.info(self.summary(extra=extra() if extra else None))
+
+        self._reporter = threading.Thread(target=run, name="db-stats-reporter", daemon=True)
+        self._reporter.start()
+
+    def stop_reporter(self):
+        self._stop.set()
+        self._reporter = None
@@ -0,0 +1,232 @@
+import re
+import logging
+from functools import lru_cache
+
+from .triggers import defer_on_bulk_insert, register_derived, queue_sql, ensure_trigger
+
+logger = logging.getLogger(__name__)
+
+# Free-text quantity column of each inventory table. Parsed copies are kept in
+# qty_value (REAL, in the canonical unit) and qty_unit ('g', 'mL' or 'count').
+QUANTITY_COLUMNS = {"chemicals": "quantity", "biological": "qty"}
+
+MASS, VOLUME, COUNT = "g", "mL", "count"
+
+# Lower-case unit spelling -> (canonical unit, factor to the canonical unit)
+UNITS = {
+    **{u: (MASS, 1e-9) for u in ("ng",)},
+    **{u: (MASS, 1e-6) for u in ("ug", "µg", "μg", "mcg")},
+    **{u: (MASS, 1e-3) for u in ("mg",)},
+    **{u: (MASS, 1.0) for u in ("g", "gr", "gram", "grams")},
+    **{u: (MASS, 1e3) for u in ("kg", "kilo", "kilos", "kilogram", "kilograms")},
+    **{u: (VOLUME, 1e-6) for u in ("nl",)},
+    **{u: (VOLUME, 1e-3) for u in ("ul", "µl", "μl")},
+    **{u: (VOLUME, 1.0) for u in ("ml", "cc", "cm3")},
+    **{u: (VOLUME, 10.0) for u in ("cl",)},
+    **{u: (VOLUME, 100.0) for u in ("dl",)},
+    **{u: (VOLUME, 1e3) for u in ("l", "lt", "liter", "liters", "litre", "litres")},
+    **{u: (COUNT, 1.0) for u in ("pc", "pcs", "piece", "pieces", "ea", "each", "unit", "units", "x",
+                                 "vial", "vials", "tube", "tubes", "aliquot", "aliquots", "bottle", "bottles",
+                                 "box", "boxes", "plate", "plates", "flask", "flasks", "pack", "packs",
+                                 "ampoule", "ampoules", "straw", "straws")},
+}
+
+NUMBER = r"\d+(?:[.,]\d+)?|[.,]\d+"
+# The unit is matched atomically so that "100 mg/mL" (a concentration) is rejected
+# rather than read as the bare number 100. A lookahead never backtracks once it
+# has matched, so (?=(?P<rest>...))(?P=rest) acts as an atomic group (which the
+# re module only supports from Python 3.11).
+QUANTITY_RE = re.compile(rf"\s*[~≈]?\s*(?P<n>{NUMBER})(?=(?P<rest>\s*(?:[x×*]\s*(?P<m>{NUMBER}))?\s*"
+                         r"(?P<u>[^\W\d_]+\d?)?))(?P=rest)(?![^\W_]|/)", re.IGNORECASE)
+OPERATOR_RE = re.compile(r"\s*(<=|>=|<|>|=)")
+
+
+def _number(text):
+    # "1,000" is a thousands separator; "2,5" is a decimal comma.
+    if re.fullmatch(r"\d{1,3}(?:,\d{3})+", text):
+        return float(text.replace(",", ""))
+    return float(text.replace(",", "."))
+
+
+@lru_cache(maxsize=8192)
+def parse_quantity(text):
+    """
+    Parses a quantity such as "500 mL", "2.5 kg", "2 x 50 mL" or "10 vials" into
+    (value, unit) in the canonical unit ('g', 'mL' or 'count'). A bare number
+    counts items. Returns (None, None) when the text is not a quantity.
+    """
+    m = QUANTITY_RE.match(text or "")
+    if not m:
+        return None, None
+    value = _number(m.group("n"))
+    if m.group("m"):
+        value *= _number(m.group("m"))
+    unit = (m.group("u") or "").lower()
+    if not unit:
+        return value, COUNT
+    if unit not in UNITS:
+        return None, None
+    canonical, factor = UNITS[unit]
+    # Rounded so that e.g. 0.1 L compares equal to 100 mL.
+    return float(f"{value * factor:.12g}"), canonical
+
+
+def qty_value(text):
+    """SQL function: canonical numeric value of a quantity string (NULL if unparseable)."""
+    return parse_quantity(text)[0]
+
+
+def qty_unit(text):
+    """SQL function: canonical unit of a quantity string (NULL if unparseable)."""
+    return parse_quantity(text)[1]
+
+
+def register_functions(conn):
+    """Makes qty_value()/qty_unit() available to refresh() on this connection."""
+    conn.create_function("qty_value", 1, qty_value, deterministic=True)
+    conn.create_function("qty_unit", 1, qty_unit, deterministic=True)
+
+
+def format_quantity(value, unit):
+    """Formats a canonical (value, unit) with a readable prefix, e.g. (2500, 'g') -> '2.5 kg'."""
+    if value is None:
+        return ""
+    if unit == COUNT:
+        return f"{value:g}"
+    scales = {MASS: ((1e3, "kg"), (1, "g"), (1e-3, "mg"), (1e-6, "µg")),
+              VOLUME: ((1e3, "L"), (1, "mL"), (1e-3, "µL"))}[unit]
+    if value == 0:
+        return f"0 {unit}"
+    for factor, name in scales:
+        if abs(value) >= factor:
+            return f"{value / factor:.4g} {name}"
+    factor, name = scales[-1]
+    return f"{value / factor:.4g} {name}"
+
+
+ADJUSTMENT_RE = re.compile(rf"\s*([+-])\s*(?:({NUMBER})\s*%|(.+))\s*$")
+
+
+def parse_adjustment(text):
+    """
+    Parses a stock adjustment: a signed quantity ("-50 mL", "+2 vials") as
+    ("add", value, unit) or a signed percentage ("-10%") as ("scale", factor,
+    None). Returns None when the text is neither.
+    """
+    m = ADJUSTMENT_RE.match(text or "")
+    if not m:
+        return None
+    sign = -1 if m.group(1) == "-" else 1
+    if m.group(2):
+        return "scale", 1 + sign * _number(m.group(2)) / 100, None
+    value, unit = parse_quantity(m.group(3))
+    return None if value is None else ("add", sign * value, unit)
+
+
+def adjust_quantity(text, adjustment):
+    """
+    Applies a parse_adjustment() result to a quantity string and returns the
+    new string (never below zero) in the row's own unit at full precision,
+    e.g. "10.5 kg" - "1 g" -> "10.499 kg". Returns None when the quantity
+    cannot be parsed or is in another kind of unit (mL vs g).
+    """
+    value, unit = parse_quantity(text)
+    if value is None:
+        return None
+    kind, amount, adj_unit = adjustment
+    if kind == "scale":
+        value *= amount
+    elif adj_unit != unit:
+        return None
+    else:
+        value += amount
+    value = max(value, 0.0)
+    # Written back in the unit the row was entered in: "10 vials" -> "8 vials", "1 L" -> "0.95 L".
+    word = QUANTITY_RE.match(text).group("u")
+    factor = UNITS[word.lower()][1] if word else 1.0
+    return f"{value / factor:.12g} {word}" if word else f"{value / factor:.12g}"
+
+
+def quantity_clause(text):
+    """
+    Turns a quantity filter into an indexed (sql, params) range on qty_unit/qty_value:
+    "<100 mL", ">= 2 kg", "=10 vials" or "100 mL..1 L" (either end may be left
+    open; units must be of one kind). Returns None when the text is not a
+    comparison, so callers can fall back to a text match.
+    """
+    text = (text or "").strip()
+    m = OPERATOR_RE.match(text)
+    if m:
+        value, unit = parse_quantity(text[m.end():])
+        if value is None:
+            return None
+        return f"qty_unit = ? AND qty_value {m.group(1)} ?", [unit, value]
+    if ".." not in text:
+        return None
+    lo, hi = (parse_quantity(part) if part.strip() else (None, None) for part in text.split("..", 1))
+    units = {u for _, u in (lo, hi) if u}
+    if len(units) != 1:
+        return None
+    unit = units.pop()
+    if lo[0] is None:
+        return "qty_unit = ? AND qty_value <= ?", [unit, hi[0]]
+    if hi[0] is None:
+        return "qty_unit = ? AND qty_value >= ?", [unit, lo[0]]
+    return "qty_unit = ? AND qty_value BETWEEN ? AND ?", [unit, lo[0], hi[0]]
+
+
+def create_quantity_columns(conn):
+    """
+    Adds the indexed qty_value/qty_unit columns and the triggers that queue
+    rows for refresh() when the text column is written (see triggers.py).
+    Existing rows are converted in one UPDATE the first time. The connection
+    must have register_functions() applied.
+    """
+    for table, col in QUANTITY_COLUMNS.items():
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]
+        new = "qty_value" not in cols
+        if new:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN qty_value REAL")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN qty_unit TEXT")
+        ensure_trigger(conn, insert_trigger_sql(table))
+        ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS {table}_qty_au AFTER UPDATE OF {col} ON {table} BEGIN
+                                     {queue_sql(f'{table}_qty', 'new.id')}
+                                 END""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_qty ON {table}(qty_unit, qty_value)")
+        if new:
+            backfill(conn, table)
+            parsed = conn.execute(f"SELECT COUNT(qty_unit), COUNT(*) FROM {table}").fetchone()
+            logger.info(f"Migrated {table}.{col}: {parsed[0]} of {parsed[1]} quantities parsed.")
+
+
+def insert_trigger_sql(table):
+    return f"""CREATE TRIGGER IF NOT EXISTS {table}_qty_ai AFTER INSERT ON {table} BEGIN
+                  {queue_sql(f'{table}_qty', 'new.id')}
+              END"""
+
+
+def refresh(conn, table, where="1", params=()):
+    """Recomputes qty_value/qty_unit of the rows t of table matching where."""
+    col = QUANTITY_COLUMNS[table]
+    conn.execute(f"UPDATE {table} AS t SET qty_value = qty_value(t.{col}), qty_unit = qty_unit(t.{col}) "
+                 f"WHERE {where}", params)
+
+
+def backfill(conn, table, after_id=0):
+    """Set-based form of the insert trigger for rows with id > after_id."""
+    refresh(conn, table, "t.id > ?", (after_id,))
+
+
+defer_on_bulk_insert("qty_ai", QUANTITY_COLUMNS, insert_trigger_sql, backfill)
+for _table in QUANTITY_COLUMNS:
+    register_derived(f"{_table}_qty", _table, refresh)
+
+
+def stock_totals(db, table, where="1", params=()):
+    """
+    Totals of the rows matching where/params (as built by search.build_filter),
+    per canonical unit: [(unit, total, items)]. Unparseable quantities are
+    reported with unit None and total None.
+    """
+    return db.query(f"""SELECT qty_unit, SUM(qty_value), COUNT(*) FROM {table} WHERE ({where})
+                        GROUP BY qty_unit ORDER BY qty_unit IS NULL, qty_unit""", params)
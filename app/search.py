@@ -0,0 +1,230 @@
+import re
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from .expiry import parse_filter as parse_expiry_filter
+from .quantities import QUANTITY_COLUMNS, quantity_clause
+from .formulas import FORMULA_COLUMNS, formula_clause
+from .hazards import HAZARD_COLUMNS, hazard_clause
+from .triggers import defer_on_bulk_insert
+
+logger = logging.getLogger(__name__)
+
+# Columns mirrored into each FTS5 index. The FTS rowid is the inventory row id.
+FTS_COLUMNS = {
+    "chemicals": ("name", "synonyms", "class", "ghs"),
+    "biological": ("name", "type", "organism", "medium"),
+}
+
+# Filter boxes that search several indexed columns at once.
+FILTER_COLUMNS = {
+    ("chemicals", "name"): ("name", "synonyms"),
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def create_fts_tables(conn):
+    """
+    Creates the FTS5 indexes and the triggers that keep them in sync with the
+    inventory tables. Returns False when this SQLite build lacks FTS5.
+    """
+    for table, cols in FTS_COLUMNS.items():
+        fts = f"{table}_fts"
+        col_list = ", ".join(cols)
+        new_vals = ", ".join(f"new.{c}" for c in cols)
+        old_vals = ", ".join(f"old.{c}" for c in cols)
+        existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+        try:
+            conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                             {col_list}, content='{table}', content_rowid='id',
+                             tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, search falls back to LIKE scans: {e}")
+            return False
+
+        conn.execute(_insert_trigger_sql(table))
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                             INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                         END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col_list} ON {table} BEGIN
+                             INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                             INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+                         END""")
+        if not existed:
+            # Index rows that were stored before the FTS table existed.
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            logger.info(f"Built full-text index {fts}.")
+    return True
+
+
+def _insert_trigger_sql(table):
+    fts, cols = f"{table}_fts", FTS_COLUMNS[table]
+    return f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                  INSERT INTO {fts}(rowid, {', '.join(cols)}) VALUES (new.id, {', '.join(f'new.{c}' for c in cols)});
+              END"""
+
+
+def _fts_backfill(conn, table, after_id):
+    fts, cols = f"{table}_fts", ", ".join(FTS_COLUMNS[table])
+    conn.execute(f"INSERT INTO {fts}(rowid, {cols}) SELECT id, {cols} FROM {table} WHERE id > ?", (after_id,))
+
+
+defer_on_bulk_insert("fts_ai", FTS_COLUMNS, _insert_trigger_sql, _fts_backfill)
+
+
+def match_expression(table, col, value):
+    """Turns a filter box value into an FTS5 prefix query, e.g. {name synonyms} : ("sod"* AND "azi"*)."""
+    tokens = TOKEN_RE.findall(value)
+    if not tokens:
+        return None
+    cols = FILTER_COLUMNS.get((table, col), (col,))
+    terms = " AND ".join(f'"{t}"*' for t in tokens)
+    return f"{{{' '.join(cols)}}} : ({terms})"
+
+
+def build_filter(table, filters, fts=True):
+    """
+    Builds a WHERE clause and parameters from {column: filter text}.
+    Indexed columns go through one FTS5 MATCH, "expiry" becomes a day-number
+    range on the indexed expiry_day column, a quantity comparison such as
+    "<100 mL" a range on qty_unit/qty_value, a formula filter ("Hg|Pb",
+    "150..200", "C2H6O") a lookup on the parsed formula data and a hazard
+    filter ("GHS02 & GHS03", "H3xx") one on ghs_mask and the hazard codes;
+    anything else uses LIKE.
+    Empty filters are ignored. Returns ("1", []) when nothing is filtered.
+    """
+    clauses, params, matches = [], [], []
+    for col, value in filters.items():
+        if not re.fullmatch(r"\w+", col):
+            raise ValueError(f"Invalid filter column: {col}")
+        value = (value or "").strip()
+        if not value:
+            continue
+        if col == "expiry":
+            days = parse_expiry_filter(value)
+            if days:
+                clauses.append("expiry_day BETWEEN ? AND ?")
+                params.extend(days)
+                continue
+        if col == QUANTITY_COLUMNS.get(table):
+            clause = quantity_clause(value)
+            if clause:
+                clauses.append(clause[0])
+                params.extend(clause[1])
+                continue
+        if col == FORMULA_COLUMNS.get(table):
+            clause = formula_clause(table, value)
+            if clause:
+                clauses.append(clause[0])
+                params.extend(clause[1])
+                continue
+        if col == HAZARD_COLUMNS.get(table):
+            clause = hazard_clause(table, value)
+            if clause:
+                clauses.append(clause[0])
+                params.extend(clause[1])
+                continue
+        expr = match_expression(table, col, value) if fts and col in FTS_COLUMNS.get(table, ()) else None
+        if expr:
+            matches.append(expr)
+        else:
+            clauses.append(f"{col} LIKE ?")
+            params.append(f"%{value}%")
+
+    if matches:
+        clauses.insert(0, f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)")
+        params.insert(0, " AND ".join(matches))
+    return (" AND ".join(clauses) or "1"), params
+
+
+class SearchExecutor:
+    """
+    Debounces filter keystrokes and runs the search query on a worker thread.
+    Only the result of the newest search is posted back to Tk via root.after;
+    searches made stale by a later keystroke are skipped, interrupted or dropped.
+    """
+    def __init__(self, root, on_result, db=None, delay_ms=250, name="search"):
+        self.root = root
+        self.on_result = on_result
+        self.db = db
+        self.delay_ms = delay_ms
+        self.name = name
+        self._pending = None
+        self._generation = 0
+        self._running = None
+        self._queue = queue.Queue()
+        self._conn = None
+        self._worker = threading.Thread(target=self._run, name=f"{name}-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, job):
+        """Schedules job (a callable executed on the worker) once typing pauses."""
+        if self._pending:
+            self.root.after_cancel(self._pending)
+        self._pending = self.root.after(self.delay_ms, self._dispatch, job)
+
+    def _dispatch(self, job):
+        self._pending = None
+        self._generation += 1
+        # Abort a query that is still running for an older keystroke.
+        if self._running is not None and self._conn is not None:
+            self._conn.interrupt()
+        self._queue.put((self._generation, job))
+        logger.info(f"{self.name}: queued search #{self._generation} (queue depth {self._queue.qsize()})")
+
+    def _run(self):
+        if self.db is not None:
+            self._conn = self.db.connection()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                gen, job = item
+                if gen != self._generation:
+                    logger.debug(f"{self.name}: skipped stale search #{gen}")
+                    continue
+
+                self._running = gen
+                start = time.perf_counter()
+                try:
+                    result = job()
+                except Exception as e:
+                    logger.error(f"{self.name}: search #{gen} failed: {e}")
+                    continue
+                finally:
+                    self._running = None
+                elapsed = (time.perf_counter() - start) * 1000
+
+                if gen != self._generation:
+                    logger.info(f"{self.name}: dropped stale search #{gen} after {elapsed:.1f} ms")
+                    continue
+                logger.info(f"{self.name}: search #{gen} finished in {elapsed:.1f} ms")
+                try:
+                    self.root.after(0, self._deliver, gen, result)
+                except Exception:
+                    # The window was closed while the query ran (RuntimeError/TclError).
+                    break
+        finally:
+            if self.db is not None:
+                # The executor is recreated on each module switch; its connection goes with it.
+                self._conn = None
+                self.db.release()
+
+    def _deliver(self, gen, result):
+        if gen == self._generation:
+            self.on_result(result)
+
+    def shutdown(self):
+        """Cancels pending work and stops the worker thread (which then releases its connection)."""
+        if self._pending:
+            try:
+                self.root.after_cancel(self._pending)
+            except Exception:
+                pass
+            self._pending = None
+        self._generation += 1
+        self._queue.put(None)
@@ -0,0 +1,303 @@
+import re
+import logging
+import sqlite3
+
+from .triggers import register_derived, queue_sql, ensure_trigger, refresh_derived
+
+logger = logging.getLogger(__name__)
+
+# Storage hierarchy, outermost first; each unit's parent is of the previous kind.
+KINDS = ("site", "freezer", "rack", "box")
+DEFAULT_BOX = (9, 9)
+
+
+class StorageError(ValueError):
+    """A placement or hierarchy change that cannot be made (full box, wrong kind, ...)."""
+
+
+# --- Occupancy bitmaps ---
+
+def bitmap_of(positions, capacity):
+    """Occupancy bitmap (BLOB, bit i = position i) of a box holding samples at positions."""
+    bits = 0
+    for position in positions:
+        bits |= 1 << position
+    return bits.to_bytes((capacity + 7) // 8, "little")
+
+
+def occupied(bitmap):
+    """The bitmap as an int: bit i is position i."""
+    return int.from_bytes(bitmap or b"", "little")
+
+
+def first_free_position(bitmap, capacity):
+    """Lowest free position of a box (None when full): one bit trick, not a scan."""
+    bits = occupied(bitmap)
+    position = (~bits & (bits + 1)).bit_length() - 1
+    return position if position < capacity else None
+
+
+def free_positions(bitmap, capacity):
+    """Every free position of a box, in order."""
+    bits = occupied(bitmap)
+    return [p for p in range(capacity) if not bits >> p & 1]
+
+
+def position_label(position, cols):
+    """0-based position -> "A1" (row letter, column number)."""
+    row, col = divmod(position, cols)
+    letters = ""
+    row += 1
+    while row:
+        row, rem = divmod(row - 1, 26)
+        letters = chr(65 + rem) + letters
+    return f"{letters}{col + 1}"
+
+
+def parse_position(label, rows, cols):
+    """"B7" (or a 1-based number) -> 0-based position; StorageError if outside the box."""
+    label = (label or "").strip().upper()
+    m = re.fullmatch(r"([A-Z]+)\s*(\d+)", label)
+    if m:
+        row = 0
+        for ch in m.group(1):
+            row = row * 26 + ord(ch) - 64
+        row, col = row - 1, int(m.group(2)) - 1
+        if 0 <= row < rows and 0 <= col < cols:
+            return row * cols + col
+    elif label.isdigit() and 1 <= int(label) <= rows * cols:
+        return int(label) - 1
+    raise StorageError(f"No position '{label}' in a {rows} x {cols} box")
+
+
+# --- Schema ---
+
+def create_storage_tables(conn):
+    """
+    Creates storage_units (the site > freezer > rack > box tree; boxes carry
+    their size, an occupancy bitmap and a count of used positions) and
+    sample_positions (one row per stored sample, unique per box position).
+    Triggers keep the counts in step with sample_positions, queue the box for
+    refresh() of its bitmap (see triggers.py) and free a sample's position
+    when it is deleted.
+    """
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS storage_units
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, parent_id INTEGER REFERENCES storage_units(id),
+                      kind TEXT NOT NULL CHECK (kind IN ({', '.join(repr(k) for k in KINDS)})), name TEXT NOT NULL,
+                      rows INTEGER, cols INTEGER, occupancy BLOB, used INTEGER NOT NULL DEFAULT 0,
+                      UNIQUE (parent_id, name))""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sample_positions
+                    (sample_id INTEGER PRIMARY KEY, box_id INTEGER NOT NULL REFERENCES storage_units(id),
+                     position INTEGER NOT NULL, UNIQUE (box_id, position))""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS sample_positions_bi BEFORE INSERT ON sample_positions BEGIN
+                        SELECT RAISE(ABORT, 'not a box position') WHERE NOT EXISTS
+                            (SELECT 1 FROM storage_units WHERE id = new.box_id AND kind = 'box'
+                             AND new.position >= 0 AND new.position < rows * cols);
+                    END""")
+    ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS sample_positions_ai AFTER INSERT ON sample_positions BEGIN
+                                 UPDATE storage_units SET used = used + 1 WHERE id = new.box_id;
+                                 {queue_sql('occupancy', 'new.box_id')}
+                             END""")
+    ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS sample_positions_ad AFTER DELETE ON sample_positions BEGIN
+                                 UPDATE storage_units SET used = used - 1 WHERE id = old.box_id;
+                                 {queue_sql('occupancy', 'old.box_id')}
+                             END""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS biological_position_ad AFTER DELETE ON biological BEGIN
+                        DELETE FROM sample_positions WHERE sample_id = old.id;
+                    END""")
+
+
+def refresh(conn, table, where="1", params=()):
+    """Rebuilds the occupancy bitmaps of the boxes t of storage_units matching where from sample_positions."""
+    boxes = conn.execute(f"SELECT t.id, t.rows * t.cols FROM {table} t WHERE t.kind = 'box' AND {where}",
+                         params).fetchall()
+    updates = []
+    for box_id, capacity in boxes:
+        positions = [r[0] for r in conn.execute("SELECT position FROM sample_positions WHERE box_id = ?", (box_id,))]
+        updates.append((bitmap_of(positions, capacity), box_id))
+    conn.executemany(f"UPDATE {table} SET occupancy = ? WHERE id = ?", updates)
+
+
+register_derived("occupancy", "storage_units", refresh)
+
+
+# --- Units ---
+
+def add_unit(db, kind, name, parent_id=None, rows=None, cols=None):
+    """Creates a site, freezer, rack or box (boxes default to 9 x 9) and returns its id."""
+    if kind not in KINDS:
+        raise StorageError(f"Unknown storage kind '{kind}' (one of: {', '.join(KINDS)})")
+    name = (name or "").strip()
+    if not name:
+        raise StorageError("A storage unit needs a name")
+    with db.transaction() as conn:
+        _check_parent(conn, kind, parent_id)
+        if kind == "box":
+            rows, cols = rows or DEFAULT_BOX[0], cols or DEFAULT_BOX[1]
+            if rows < 1 or cols < 1:
+                raise StorageError("A box needs at least one row and one column")
+            bitmap = bytes((rows * cols + 7) // 8)
+        else:
+            rows = cols = bitmap = None
+        try:
+            unit_id = conn.execute("""INSERT INTO storage_units (parent_id, kind, name, rows, cols, occupancy)
+                                      VALUES (?, ?, ?, ?, ?, ?)""",
+                                   (parent_id, kind, name, rows, cols, bitmap)).lastrowid
+        except sqlite3.IntegrityError:
+            raise StorageError(f"There is already a unit named '{name}' here")
+    logger.info(f"Storage: added {kind} '{name}' (ID {unit_id})")
+    return unit_id
+
+
+def _check_parent(conn, kind, parent_id):
+    level = KINDS.index(kind)
+    if parent_id is None:
+        if level:
+            raise StorageError(f"A {kind} must be placed in a {KINDS[level - 1]}")
+        return
+    row = conn.execute("SELECT kind FROM storage_units WHERE id = ?", (parent_id,)).fetchone()
+    if row is None or not level or row[0] != KINDS[level - 1]:
+        raise StorageError(f"A {kind} cannot be placed in {row[0] if row else 'unit ' + str(parent_id)}")
+
+
+def get_unit(db, unit_id):
+    """{id, parent_id, kind, name, rows, cols, occupancy, used} of one unit, or None."""
+    rows = db.query("SELECT id, parent_id, kind, name, rows, cols, occupancy, used FROM storage_units WHERE id = ?",
+                    (unit_id,), cache=False)
+    if not rows:
+        return None
+    return dict(zip(("id", "parent_id", "kind", "name", "rows", "cols", "occupancy", "used"), rows[0]))
+
+
+def children(db, parent_id=None):
+    """[(id, kind, name, rows, cols, used)] directly inside a unit (the sites for None)."""
+    return db.query("""SELECT id, kind, name, rows, cols, used FROM storage_units
+                       WHERE parent_id IS ? ORDER BY name""", (parent_id,), cache=False)
+
+
+def unit_path(db, unit_id):
+    """"Site / Freezer / Rack / Box" for a unit."""
+    rows = db.query("""WITH RECURSIVE up(id, parent_id, name, depth) AS (
+                           SELECT id, parent_id, name, 0 FROM storage_units WHERE id = ?
+                           UNION ALL SELECT u.id, u.parent_id, u.name, up.depth + 1
+                           FROM storage_units u JOIN up ON u.id = up.parent_id)
+                       SELECT name FROM up ORDER BY depth DESC""", (unit_id,), cache=False)
+    return " / ".join(r[0] for r in rows)
+
+
+def move_unit(db, unit_id, parent_id):
+    """Moves a unit with everything in it (e.g. a box to another rack): one UPDATE."""
+    with db.transaction() as conn:
+        row = conn.execute("SELECT kind FROM storage_units WHERE id = ?", (unit_id,)).fetchone()
+        if row is None:
+            raise StorageError(f"No storage unit {unit_id}")
+        _check_parent(conn, row[0], parent_id)
+        try:
+            conn.execute("UPDATE storage_units SET parent_id = ? WHERE id = ?", (parent_id, unit_id))
+        except sqlite3.IntegrityError:
+            raise StorageError("The destination already holds a unit with that name")
+
+
+def remove_unit(db, unit_id):
+    """Deletes an empty unit (no sub-units, no samples)."""
+    with db.transaction() as conn:
+        if conn.execute("SELECT 1 FROM storage_units WHERE parent_id = ? LIMIT 1", (unit_id,)).fetchone() or \
+                conn.execute("SELECT 1 FROM sample_positions WHERE box_id = ? LIMIT 1", (unit_id,)).fetchone():
+            raise StorageError("Only empty storage units can be removed")
+        conn.execute("DELETE FROM storage_units WHERE id = ?", (unit_id,))
+
+
+# --- Samples ---
+
+def box_contents(db, box_id):
+    """[(position, sample_id, name)] of a box in position order (index range on box_id, position)."""
+    return db.query("""SELECT p.position, p.sample_id, b.name FROM sample_positions p
+                       JOIN biological b ON b.id = p.sample_id
+                       WHERE p.box_id = ? ORDER BY p.position""", (box_id,), cache=False)
+
+
+def sample_location(db, sample_id):
+    """(box_id, position, "Site / Freezer / Rack / Box / B7") of a sample, or None if not stored."""
+    rows = db.query("""SELECT p.box_id, p.position, u.cols FROM sample_positions p
+                       JOIN storage_units u ON u.id = p.box_id WHERE p.sample_id = ?""", (sample_id,), cache=False)
+    if not rows:
+        return None
+    box_id, position, cols = rows[0]
+    return box_id, position, f"{unit_path(db, box_id)} / {position_label(position, cols)}"
+
+
+def _boxes_with_space(conn, unit_id):
+    """Boxes at or under a unit that have a free position, in name order along the tree."""
+    return conn.execute("""WITH RECURSIVE tree(id, kind, sort) AS (
+                               SELECT id, kind, name FROM storage_units WHERE id = ?
+                               UNION ALL SELECT u.id, u.kind, tree.sort || char(31) || u.name
+                               FROM storage_units u JOIN tree ON u.parent_id = tree.id WHERE tree.kind != 'box')
+                           SELECT u.id, u.rows * u.cols, u.occupancy FROM tree JOIN storage_units u ON u.id = tree.id
+                           WHERE u.kind = 'box' AND u.used < u.rows * u.cols ORDER BY tree.sort""",
+                        (unit_id,)).fetchall()
+
+
+def find_free_slot(db, unit_id):
+    """(box_id, position) of the first free position at or under a unit, or None when it is full."""
+    for box_id, capacity, bitmap in _boxes_with_space(db.connection(), unit_id):
+        return box_id, first_free_position(bitmap, capacity)
+    return None
+
+
+def move_samples(db, sample_ids, unit_id, positions=None):
+    """
+    Stores (or moves) samples in one transaction. With positions (one per
+    sample) the samples go to exactly those positions of box unit_id;
+    otherwise they fill the free positions at or under unit_id (a box, rack,
+    freezer or site) in order. The samples' old positions are released first,
+    so a batch may be reshuffled within the same box. Raises StorageError,
+    leaving everything as it was, when there is not enough room or a
+    position is taken. Returns [(sample_id, box_id, position)].
+    """
+    sample_ids = list(dict.fromkeys(sample_ids))
+    if not sample_ids:
+        return []
+    with db.transaction() as conn:
+        marks = ", ".join("?" * len(sample_ids))
+        found = {r[0] for r in conn.execute(f"SELECT id FROM biological WHERE id IN ({marks})", sample_ids)}
+        missing = [i for i in sample_ids if i not in found]
+        if missing:
+            raise StorageError(f"No such sample(s): {', '.join(map(str, missing))}")
+        conn.execute(f"DELETE FROM sample_positions WHERE sample_id IN ({marks})", sample_ids)
+        refresh_derived(conn)    # The bitmaps read below include the positions just released
+
+        if positions is not None:
+            if len(positions) != len(sample_ids):
+                raise StorageError("One position is needed per sample")
+            placements = [(sid, unit_id, pos) for sid, pos in zip(sample_ids, positions)]
+        else:
+            placements, pending = [], iter(sample_ids)
+            for box_id, capacity, bitmap in _boxes_with_space(conn, unit_id):
+                for pos in free_positions(bitmap, capacity):
+                    sid = next(pending, None)
+                    if sid is None:
+                        break
+                    placements.append((sid, box_id, pos))
+                if len(placements) == len(sample_ids):
+                    break
+            if len(placements) < len(sample_ids):
+                raise StorageError(f"Not enough free positions: {len(sample_ids)} needed, "
+                                   f"{len(placements)} available")
+        try:
+            conn.executemany("INSERT INTO sample_positions (sample_id, box_id, position) VALUES (?, ?, ?)",
+                             placements)
+        except sqlite3.IntegrityError as e:
+            raise StorageError(f"Position already taken or invalid ({e})")
+    db.audit.record("storage_move", "biological", after={"unit": unit_id, "samples": sample_ids})
+    logger.info(f"Storage: placed {len(placements)} sample(s) under unit {unit_id}")
+    return placements
+
+
+def remove_samples(db, sample_ids):
+    """Takes samples out of storage (their positions become free)."""
+    sample_ids = list(sample_ids)
+    if not sample_ids:
+        return
+    with db.transaction() as conn:
+        conn.execute(f"DELETE FROM sample_positions WHERE sample_id IN ({', '.join('?' * len(sample_ids))})",
+                     sample_ids)
@@ -0,0 +1,142 @@
+import logging
+from datetime import date
+
+from .expiry import to_day, EXPIRING_SOON_DAYS
+from .hazards import HAZARD_COLUMNS
+from .triggers import defer_on_bulk_insert, ensure_trigger
+
+logger = logging.getLogger(__name__)
+
+# Columns counted per distinct value in inventory_summary.
+SUMMARY_DIMENSIONS = {
+    "chemicals": ("class", "ghs"),
+    "biological": ("type", "bsl", "organism"),
+}
+# Hazard entries ("GHS02 H225; P210+P233") are counted per code, read from the
+# parsed code table (see hazards.py) so that the counts agree with the hazard
+# filters: (table, column) -> code table, with its own triggers.
+CODE_DIMENSIONS = {(table, col): f"{table}_hazard_codes" for table, col in HAZARD_COLUMNS.items()}
+
+
+def _key(ref):
+    return f"IFNULL(TRIM({ref}), '')"
+
+
+def _row_dimensions(table):
+    """Dimensions counted from the column value by the triggers on the table itself."""
+    return [col for col in SUMMARY_DIMENSIONS[table] if (table, col) not in CODE_DIMENSIONS]
+
+
+def _add(table, row, sign):
+    """Statements adding (sign=1) or removing (sign=-1) one row's contribution."""
+    op = "+" if sign > 0 else "-"
+    stmts = [f"""INSERT INTO inventory_summary(tbl, dimension, key, items) VALUES ('{table}', 'total', '', {sign})
+                 ON CONFLICT(tbl, dimension, key) DO UPDATE SET items = items {op} 1;"""]
+    for col in _row_dimensions(table):
+        stmts.append(f"""INSERT INTO inventory_summary(tbl, dimension, key, items)
+                         VALUES ('{table}', '{col}', {_key(f'{row}.{col}')}, {sign})
+                         ON CONFLICT(tbl, dimension, key) DO UPDATE SET items = items {op} 1;""")
+    stmts.append(f"""INSERT INTO expiry_histogram(tbl, day, items) SELECT '{table}', {row}.expiry_day, {sign}
+                     WHERE {row}.expiry_day IS NOT NULL
+                     ON CONFLICT(tbl, day) DO UPDATE SET items = items {op} 1;""")
+    return "\n".join(stmts)
+
+
+def insert_trigger_sql(table):
+    return f"""CREATE TRIGGER IF NOT EXISTS {table}_summary_ai AFTER INSERT ON {table} BEGIN
+                  {_add(table, 'new', 1)}
+              END"""
+
+
+def backfill(conn, table, after_id=0):
+    """Set-based form of the insert trigger for rows with id > after_id."""
+    conn.execute(f"""INSERT INTO inventory_summary(tbl, dimension, key, items)
+                     SELECT '{table}', 'total', '', COUNT(*) FROM {table} WHERE id > ?
+                     ON CONFLICT(tbl, dimension, key) DO UPDATE SET items = items + excluded.items""", (after_id,))
+    for col in _row_dimensions(table):
+        conn.execute(f"""INSERT INTO inventory_summary(tbl, dimension, key, items)
+                         SELECT '{table}', '{col}', {_key(col)}, COUNT(*) FROM {table} WHERE id > ?
+                         GROUP BY {_key(col)}
+                         ON CONFLICT(tbl, dimension, key) DO UPDATE SET items = items + excluded.items""",
+                     (after_id,))
+    conn.execute(f"""INSERT INTO expiry_histogram(tbl, day, items)
+                     SELECT '{table}', expiry_day, COUNT(*) FROM {table}
+                     WHERE id > ? AND expiry_day IS NOT NULL GROUP BY expiry_day
+                     ON CONFLICT(tbl, day) DO UPDATE SET items = items + excluded.items""", (after_id,))
+
+
+defer_on_bulk_insert("summary_ai", SUMMARY_DIMENSIONS, insert_trigger_sql, backfill)
+
+
+def create_summary_tables(conn):
+    """
+    Creates inventory_summary (row counts per table, column and value) and
+    expiry_histogram (row counts per expiry day), plus the triggers that keep
+    them current on every insert, update and delete. Built from the inventory
+    tables the first time, and again when the triggers of an older version
+    are replaced.
+    """
+    new = not conn.execute("SELECT 1 FROM sqlite_master WHERE name='inventory_summary'").fetchone()
+    conn.execute("""CREATE TABLE IF NOT EXISTS inventory_summary
+                    (tbl TEXT NOT NULL, dimension TEXT NOT NULL, key TEXT NOT NULL, items INTEGER NOT NULL,
+                     PRIMARY KEY (tbl, dimension, key)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS expiry_histogram
+                    (tbl TEXT NOT NULL, day INTEGER NOT NULL, items INTEGER NOT NULL,
+                     PRIMARY KEY (tbl, day)) WITHOUT ROWID""")
+    replaced = False
+    for table in SUMMARY_DIMENSIONS:
+        replaced |= ensure_trigger(conn, insert_trigger_sql(table))
+        replaced |= ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS {table}_summary_ad AFTER DELETE ON {table} BEGIN
+                                                 {_add(table, 'old', -1)}
+                                             END""")
+        replaced |= ensure_trigger(conn, f"""CREATE TRIGGER IF NOT EXISTS {table}_summary_au
+                                             AFTER UPDATE OF {', '.join(_row_dimensions(table) + ['expiry'])} ON {table}
+                                             BEGIN
+                                                 {_add(table, 'old', -1)}
+                                                 {_add(table, 'new', 1)}
+                                             END""")
+    for (table, col), codes in CODE_DIMENSIONS.items():
+        for event, row, sign in (("INSERT", "new", 1), ("DELETE", "old", -1)):
+            op = "+" if sign > 0 else "-"
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {codes}_summary_a{event[0].lower()}
+                             AFTER {event} ON {codes} BEGIN
+                                 INSERT INTO inventory_summary(tbl, dimension, key, items)
+                                 VALUES ('{table}', '{col}', {row}.code, {sign})
+                                 ON CONFLICT(tbl, dimension, key) DO UPDATE SET items = items {op} 1;
+                             END""")
+    if new or replaced:
+        rebuild(conn)
+
+
+def rebuild(conn):
+    """Recomputes both summary tables from scratch (e.g. after writes made without the triggers)."""
+    conn.execute("DELETE FROM inventory_summary")
+    conn.execute("DELETE FROM expiry_histogram")
+    for table in SUMMARY_DIMENSIONS:
+        backfill(conn, table)
+    for (table, col), codes in CODE_DIMENSIONS.items():
+        conn.execute(f"""INSERT INTO inventory_summary(tbl, dimension, key, items)
+                         SELECT '{table}', '{col}', code, COUNT(*) FROM {codes} GROUP BY code""")
+    logger.info("Rebuilt inventory summary tables.")
+
+
+def inventory_kpis(db, top=5, soon_days=EXPIRING_SOON_DAYS):
+    """
+    Dashboard figures per inventory table, read from the summary tables only:
+    {table: {"total", "expired", "expiring", "<dimension>": [(value, items), ...]}}.
+    Cost depends on the number of distinct values and expiry days, not on rows.
+    """
+    today = to_day(date.today())
+    kpis = {}
+    for table, dims in SUMMARY_DIMENSIONS.items():
+        total = db.query("SELECT items FROM inventory_summary WHERE tbl=? AND dimension='total' AND key=''", (table,))
+        expired, expiring = db.query("""SELECT IFNULL(SUM(CASE WHEN day < ? THEN items END), 0),
+                                               IFNULL(SUM(CASE WHEN day >= ? THEN items END), 0)
+                                        FROM expiry_histogram WHERE tbl=? AND day < ?""",
+                                     (today, today, table, today + soon_days))[0]
+        kpis[table] = {"total": total[0][0] if total else 0, "expired": expired, "expiring": expiring}
+        for dim in dims:
+            kpis[table][dim] = db.query("""SELECT key, items FROM inventory_summary
+                                           WHERE tbl=? AND dimension=? AND items > 0
+                                           ORDER BY items DESC, key LIMIT ?""", (table, dim, top))
+    return kpis
@@ -0,0 +1,367 @@
+import os
+import re
+import json
+import gzip
+import logging
+from pathlib import Path
+from datetime import datetime
+from collections import namedtuple
+
+from .importer import TABLE_COLUMNS
+from .changes import VERSIONED_TABLES
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SITE_RE = re.compile(r"[A-Za-z0-9_.-]{1,40}")
+FETCH_CHUNK = 500
+
+ExportResult = namedtuple("ExportResult", "path changes from_seq to_seq full")
+ApplyResult = namedtuple("ApplyResult", "applied skipped conflicts")
+
+
+class SyncError(Exception):
+    """A changeset that cannot be written or applied (wrong site, missing earlier changes, bad file)."""
+
+
+def create_sync_tables(conn):
+    """
+    sync_site holds this database's site name (random until set with
+    set_site), sync_peers how far the change_log has been sent to and
+    received from each other site (sent_seq is NULL until the first
+    changeset for the peer is written), and sync_conflicts the incoming
+    changes that clashed with local edits.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS sync_site
+                    (id INTEGER PRIMARY KEY CHECK (id = 1), site TEXT NOT NULL)""")
+    conn.execute("INSERT OR IGNORE INTO sync_site (id, site) VALUES (1, lower(hex(randomblob(4))))")
+    peer_cols = {r[1]: r[3] for r in conn.execute("PRAGMA table_info(sync_peers)")}
+    if peer_cols.get("sent_seq"):
+        # Older databases defaulted sent_seq to 0, which cannot be told apart from
+        # a changeset sent while the change_log was empty; last_sent tells them apart.
+        conn.execute("ALTER TABLE sync_peers RENAME TO sync_peers_old")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sync_peers
+                    (site TEXT PRIMARY KEY, sent_seq INTEGER,
+                     received_seq INTEGER NOT NULL DEFAULT 0, last_sent TEXT, last_received TEXT)""")
+    if peer_cols.get("sent_seq"):
+        conn.execute("""INSERT INTO sync_peers (site, sent_seq, received_seq, last_sent, last_received)
+                        SELECT site, CASE WHEN last_sent IS NULL THEN NULL ELSE sent_seq END,
+                               received_seq, last_sent, last_received FROM sync_peers_old""")
+        conn.execute("DROP TABLE sync_peers_old")
+        logger.info("Migrated sync_peers: sent_seq is NULL for peers never sent a changeset.")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sync_conflicts
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, peer TEXT NOT NULL, tbl TEXT NOT NULL, uid TEXT NOT NULL,
+                     op TEXT NOT NULL, local_version INTEGER, version INTEGER, row TEXT, received_at TEXT NOT NULL)""")
+
+
+def site_name(db):
+    return db.query("SELECT site FROM sync_site WHERE id = 1", cache=False)[0][0]
+
+
+def set_site(db, name):
+    """
+    Names this site. Run it on each copy when a database file has been
+    copied to another site: the rows already there keep the identity they
+    had under the old name (so the copies agree on them), and rows added
+    from now on get ids under the new one.
+    """
+    if not SITE_RE.fullmatch(name or ""):
+        raise SyncError("Site names are 1-40 letters, digits, '.', '_' or '-'")
+    with db.transaction() as conn:
+        old = conn.execute("SELECT site FROM sync_site WHERE id = 1").fetchone()[0]
+        if old == name:
+            return
+        for table in VERSIONED_TABLES:
+            conn.execute(f"UPDATE {table} SET uid = ? || ':' || id WHERE uid IS NULL", (old,))
+            conn.execute("UPDATE change_log SET uid = ? || ':' || row_id WHERE uid IS NULL AND tbl = ?", (old, table))
+        conn.execute("UPDATE sync_site SET site = ? WHERE id = 1", (name,))
+    logger.info(f"Sync: site '{old}' renamed to '{name}'")
+
+
+def peers(db):
+    """[(site, sent_seq, received_seq, last_sent, last_received)]"""
+    return db.query("SELECT site, sent_seq, received_seq, last_sent, last_received FROM sync_peers ORDER BY site",
+                    cache=False)
+
+
+# --- Export ---
+
+def _coalesce(entries, own, peer):
+    """
+    Folds the change_log entries of each row into one change:
+    {(table, row_id): (op, uid, version, base, origin)}. Entries that came
+    from the peer itself are dropped, and rows both inserted and deleted
+    since the last sync are left out.
+    """
+    changes = {}
+    for _, table, row_id, op, uid, version, base, origin in entries:
+        origin = origin or own
+        if origin == peer:
+            continue
+        key = (table, row_id)
+        first = changes.get(key)
+        if first is None:
+            changes[key] = [op, op, uid, version, base, {origin}]
+        else:
+            first[1] = op
+            first[3] = version
+            first[5].add(origin)
+    folded = {}
+    for key, (first_op, last_op, uid, version, base, origins) in changes.items():
+        if last_op == "delete":
+            if first_op == "insert":
+                continue
+            op = "delete"
+        else:
+            op = "insert" if first_op == "insert" else "update"
+        # A relayed change keeps its author; one we edited too becomes ours.
+        folded[key] = (op, uid or f"{own}:{key[1]}", version, base, origins.pop() if len(origins) == 1 else own)
+    return folded
+
+
+def _current_rows(conn, table, row_ids):
+    """{row_id: (version, values)} read in chunks through the primary key."""
+    cols = TABLE_COLUMNS[table]
+    rows = {}
+    for i in range(0, len(row_ids), FETCH_CHUNK):
+        chunk = row_ids[i:i + FETCH_CHUNK]
+        for r in conn.execute(f"SELECT id, version, {', '.join(cols)} FROM {table} "
+                              f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk):
+            rows[r[0]] = (r[1], list(r[2:]))
+    return rows
+
+
+def export_changeset(db, peer, path, full=False):
+    """
+    Writes the changes made since the last changeset sent to `peer` to a
+    gzip-compressed JSON Lines file: a header, then one line per changed row
+    ([table, uid, op, version, base_version, origin_site, values]). Only
+    change_log entries past the peer's sync point are read, so the cost
+    follows the number of changes, not the size of the database. The first
+    changeset for a peer (or full=True, or a log pruned past the sync point)
+    carries every row instead, without deletes. Returns an ExportResult.
+    """
+    tmp_path = f"{path}.part"
+    with db.transaction() as conn:
+        own = conn.execute("SELECT site FROM sync_site WHERE id = 1").fetchone()[0]
+        if peer == own:
+            raise SyncError(f"'{peer}' is this site")
+        if not SITE_RE.fullmatch(peer or ""):
+            raise SyncError(f"Invalid peer site name '{peer}'")
+        conn.execute("INSERT OR IGNORE INTO sync_peers (site) VALUES (?)", (peer,))
+        sent = conn.execute("SELECT sent_seq FROM sync_peers WHERE site = ?", (peer,)).fetchone()[0]
+        oldest, newest = conn.execute("SELECT IFNULL(MIN(seq), 0), IFNULL(MAX(seq), 0) FROM change_log").fetchone()
+        # NULL: nothing sent to this peer yet. 0 is a changeset sent while the log was empty.
+        full = full or sent is None or oldest > sent + 1
+        sent = sent or 0
+
+        lines = []
+        if full:
+            for table in VERSIONED_TABLES:
+                cols = TABLE_COLUMNS[table]
+                for r in conn.execute(f"SELECT id, uid, version, {', '.join(cols)} FROM {table} ORDER BY id"):
+                    lines.append([table, r[1] or f"{own}:{r[0]}", "update", r[2], None, own, list(r[3:])])
+        else:
+            entries = conn.execute("""SELECT seq, tbl, row_id, op, uid, version, base, origin FROM change_log
+                                      WHERE seq > ? AND seq <= ? ORDER BY seq""", (sent, newest)).fetchall()
+            folded = _coalesce(entries, own, peer)
+            for table in VERSIONED_TABLES:
+                ids = [row_id for (t, row_id), c in folded.items() if t == table and c[0] != "delete"]
+                current = _current_rows(conn, table, ids)
+                for (t, row_id), (op, uid, version, base, origin) in folded.items():
+                    if t != table:
+                        continue
+                    if op == "delete":
+                        lines.append([table, uid, op, version, base, origin, None])
+                    elif row_id in current:
+                        version, values = current[row_id]
+                        lines.append([table, uid, op, version, base, origin, values])
+
+        header = {"biolab_changeset": FORMAT_VERSION, "site": own, "peer": peer, "from_seq": sent,
+                  "to_seq": newest, "full": full, "changes": len(lines), "columns": TABLE_COLUMNS,
+                  "created": datetime.now().isoformat(timespec="seconds")}
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+                f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        conn.execute("UPDATE sync_peers SET sent_seq = ?, last_sent = ? WHERE site = ?",
+                     (newest, header["created"], peer))
+    logger.info(f"Sync: {len(lines)} change(s) for '{peer}' written to {path}"
+                f"{' (full)' if full else f' (log {sent + 1}..{newest})'}")
+    return ExportResult(str(path), len(lines), sent, newest, full)
+
+
+# --- Apply ---
+
+def _read_changeset(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("biolab_changeset") != FORMAT_VERSION:
+                raise SyncError(f"{path} is not a changeset this version can read")
+            return header, [json.loads(line) for line in f]
+    except (OSError, ValueError) as e:
+        raise SyncError(f"Cannot read changeset {path}: {e}")
+
+
+def _local_row(conn, table, uid, own):
+    """(id, version, values) of the row with this uid here, or None."""
+    cols = ", ".join(TABLE_COLUMNS[table])
+    site, _, row_id = uid.rpartition(":")
+    if site == own:
+        return conn.execute(f"SELECT id, version, {cols} FROM {table} WHERE id = ? AND uid IS NULL",
+                            (int(row_id),)).fetchone()
+    return conn.execute(f"SELECT id, version, {cols} FROM {table} WHERE uid = ?", (uid,)).fetchone()
+
+
+def _deleted_here(conn, table, uid, own):
+    site, _, row_id = uid.rpartition(":")
+    if site == own:
+        return True    # Row ids are never reused, so a missing own row was deleted.
+    return conn.execute("SELECT 1 FROM change_log WHERE uid = ? AND tbl = ? AND op = 'delete' LIMIT 1",
+                        (uid, table)).fetchone() is not None
+
+
+def _write_row(conn, table, local, uid, own, values, version):
+    """Inserts or overwrites a row with incoming values; version=None lets the trigger bump it."""
+    cols = TABLE_COLUMNS[table]
+    if local is None:
+        # A row created here comes back under its old id.
+        site, _, row_id = uid.rpartition(":")
+        row_id, uid = (int(row_id), None) if site == own else (None, uid)
+        conn.execute(f"INSERT INTO {table} (id, {', '.join(cols)}, uid, version) "
+                     f"VALUES (?, {', '.join('?' * len(cols))}, ?, ?)", [row_id, *values, uid, version or 1])
+    else:
+        # Only the columns that differ, so triggers on the others stay quiet.
+        changed = {c: v for c, v, old in zip(cols, values, local[2:]) if v != old}
+        if version is not None:
+            changed["version"] = version
+        if changed:
+            conn.execute(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in changed)} WHERE id = ?",
+                         [*changed.values(), local[0]])
+
+
+def _apply_one(conn, change, own):
+    """Applies one change; returns "applied", "skipped" or "conflict"."""
+    table, uid, op, version, base, origin, values = change
+    local = _local_row(conn, table, uid, own)
+    if op == "delete":
+        if local is None:
+            return "skipped"
+        if local[1] != version:
+            return "conflict"    # Edited here since the version that was deleted there
+        conn.execute(f"DELETE FROM {table} WHERE id = ?", (local[0],))
+        return "applied"
+    if local is None:
+        if op == "update" and _deleted_here(conn, table, uid, own):
+            return "conflict"
+        _write_row(conn, table, None, uid, own, values, version)
+        return "applied"
+    if list(local[2:]) == values:
+        # Same content: only catch up with the newer version number.
+        if version > local[1]:
+            conn.execute(f"UPDATE {table} SET version = ? WHERE id = ?", (version, local[0]))
+            return "applied"
+        return "skipped"
+    if base is not None and local[1] == base:
+        _write_row(conn, table, local, uid, own, values, version)
+        return "applied"
+    return "conflict"
+
+
+def apply_changeset(db, path, force=False):
+    """
+    Applies a changeset from another site in one transaction. A change is
+    applied when the local row is still at the version the change was made
+    from; a row edited on both sides (or edited here and deleted there) is
+    left alone and recorded in sync_conflicts. Changes this site made itself
+    are skipped, so changesets may be relayed through other sites. Without
+    force, a changeset for another site, one already applied, or one that
+    follows a changeset not yet applied is refused. Returns an ApplyResult.
+    """
+    header, changes = _read_changeset(path)
+    sender = header["site"]
+    counts = {"applied": 0, "skipped": 0, "conflict": 0}
+    now = datetime.now().isoformat(timespec="seconds")
+    with db.transaction() as conn:
+        own = conn.execute("SELECT site FROM sync_site WHERE id = 1").fetchone()[0]
+        if sender == own:
+            raise SyncError("This changeset was written by this site")
+        if header["peer"] != own and not force:
+            raise SyncError(f"This changeset is for site '{header['peer']}', not '{own}'")
+        for table, cols in header["columns"].items():
+            if tuple(cols) != TABLE_COLUMNS.get(table):
+                raise SyncError(f"The {table} columns of this changeset do not match this database")
+        conn.execute("INSERT OR IGNORE INTO sync_peers (site) VALUES (?)", (sender,))
+        received = conn.execute("SELECT received_seq FROM sync_peers WHERE site = ?", (sender,)).fetchone()[0]
+        if not header["full"] and not force:
+            if header["to_seq"] <= received:
+                raise SyncError(f"Changes up to {header['to_seq']} from '{sender}' have already been applied")
+            if header["from_seq"] > received:
+                raise SyncError(f"Changes {received + 1}..{header['from_seq']} from '{sender}' are missing; "
+                                f"apply the earlier changeset(s) first")
+
+        # Changes are grouped by their author so that the change_log entries they
+        # produce can be attributed with one statement per group.
+        by_origin = {}
+        for change in changes:
+            by_origin.setdefault(change[5], []).append(change)
+        for origin, group in by_origin.items():
+            if origin == own:
+                counts["skipped"] += len(group)
+                continue
+            log_seq = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log").fetchone()[0]
+            for change in group:
+                outcome = _apply_one(conn, change, own)
+                counts[outcome] += 1
+                if outcome == "conflict":
+                    local = _local_row(conn, change[0], change[1], own)
+                    conn.execute("""INSERT INTO sync_conflicts
+                                    (peer, tbl, uid, op, local_version, version, row, received_at)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                                 (sender, change[0], change[1], change[2], local[1] if local else None, change[3],
+                                  json.dumps(change[6], ensure_ascii=False), now))
+            conn.execute("UPDATE change_log SET origin = ? WHERE seq > ?", (origin, log_seq))
+        conn.execute("""UPDATE sync_peers SET received_seq = MAX(received_seq, ?), last_received = ?
+                        WHERE site = ?""", (header["to_seq"], now, sender))
+    result = ApplyResult(counts["applied"], counts["skipped"], counts["conflict"])
+    db.audit.record("sync_apply", "change_log", after={"from": sender, "file": str(path), **result._asdict()})
+    logger.info(f"Sync: changeset from '{sender}' applied: {result.applied} change(s), {result.skipped} skipped, "
+                f"{result.conflicts} conflict(s)")
+    return result
+
+
+# --- Conflicts ---
+
+def conflicts(db):
+    """[(id, peer, table, uid, op, local_version, incoming_version, received_at)], oldest first."""
+    return db.query("""SELECT id, peer, tbl, uid, op, local_version, version, received_at
+                       FROM sync_conflicts ORDER BY id""", cache=False)
+
+
+def resolve_conflict(db, conflict_id, theirs):
+    """
+    Settles a conflict: theirs=True writes the incoming change over the local
+    row as an ordinary edit (so it is passed on to other sites), otherwise
+    the local row is kept as it is. Returns False if there is no such conflict.
+    """
+    with db.transaction() as conn:
+        row = conn.execute("SELECT tbl, uid, op, row FROM sync_conflicts WHERE id = ?", (conflict_id,)).fetchone()
+        if row is None:
+            return False
+        table, uid, op, values = row
+        if theirs:
+            own = conn.execute("SELECT site FROM sync_site WHERE id = 1").fetchone()[0]
+            local = _local_row(conn, table, uid, own)
+            if op == "delete":
+                if local is not None:
+                    conn.execute(f"DELETE FROM {table} WHERE id = ?", (local[0],))
+            else:
+                _write_row(conn, table, local, uid, own, json.loads(values), None)
+        conn.execute("DELETE FROM sync_conflicts WHERE id = ?", (conflict_id,))
+    logger.info(f"Sync: conflict {conflict_id} resolved ({'theirs' if theirs else 'ours'})")
+    return True
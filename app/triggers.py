@@ -0,0 +1,116 @@
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Per-row AFTER INSERT triggers that bulk_insert replaces with one set-based
+# statement each. Every feature module registers its own (see defer_on_bulk_insert):
+# trigger suffix -> (tables, create_sql(table), backfill(conn, table, after_id)).
+_DEFERRED = {}
+
+
+def defer_on_bulk_insert(suffix, tables, create_sql, backfill):
+    """
+    Registers the AFTER INSERT trigger {table}_{suffix} of each of tables:
+    create_sql(table) returns its CREATE TRIGGER statement and
+    backfill(conn, table, after_id) does its work for all rows with id > after_id.
+    """
+    _DEFERRED[suffix] = (tuple(tables), create_sql, backfill)
+
+
+def deferred_triggers(table):
+    """Registered triggers of a table: trigger name -> (CREATE TRIGGER sql, backfill)."""
+    return {f"{table}_{suffix}": (create_sql(table), backfill)
+            for suffix, (tables, create_sql, backfill) in _DEFERRED.items() if table in tables}
+
+
+@contextmanager
+def bulk_insert(conn, table):
+    """
+    Defers the registered per-row insert triggers (full-text and trigram
+    indexing, parsed columns, summary counts, change_log entries, ...) of
+    rows inserted inside the block to one set-based statement each, which is
+    several times faster. Must be used inside a transaction; a rollback
+    restores the triggers.
+    """
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name=?",
+                                           (table,))}
+    deferred = {name: t for name, t in deferred_triggers(table).items() if name in existing}
+    if not deferred:
+        yield conn
+        return
+    last_id = conn.execute(f"SELECT IFNULL(MAX(id), 0) FROM {table}").fetchone()[0]
+    for name in deferred:
+        conn.execute(f"DROP TRIGGER {name}")
+    yield conn
+    for create_sql, backfill in deferred.values():
+        backfill(conn, table, last_id)
+        conn.execute(create_sql)
+
+
+# --- Derived data ---
+# Parsed copies of free-text columns (quantities, formulas, hazards) and box
+# occupancy bitmaps are computed by Python functions. The triggers stored in
+# the database only queue the affected rows in derive_queue (plain SQL), so
+# any SQLite client can still write the tables; Database fills in the derived
+# data from the queue before each of its own commits, when it opens the
+# database and when a window polls for other clients' changes.
+# name -> (table, refresh(conn, table, where, params)); where selects rows of table aliased t.
+_DERIVED = {}
+
+
+def register_derived(name, table, refresh):
+    """
+    Registers derived data of a table: refresh(conn, table, where, params)
+    recomputes it for the rows `t` of table matching where.
+    """
+    _DERIVED[name] = (table, refresh)
+
+
+def create_derive_queue(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS derive_queue
+                    (name TEXT NOT NULL, row_id INTEGER NOT NULL, PRIMARY KEY (name, row_id)) WITHOUT ROWID""")
+
+
+def queue_sql(name, row_id):
+    """Trigger statement queuing a row for refresh_derived()."""
+    return f"INSERT OR IGNORE INTO derive_queue (name, row_id) VALUES ('{name}', {row_id});"
+
+
+def ensure_trigger(conn, create_sql):
+    """
+    Creates a trigger, replacing one of the same name with another definition
+    (e.g. from an older version that called Python functions in the schema).
+    Returns True when an existing trigger was replaced.
+    """
+    name = create_sql.split()[5] if "IF NOT EXISTS" in create_sql else create_sql.split()[2]
+    stored = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,)).fetchone()
+    replaced = bool(stored) and stored[0] != create_sql.replace("IF NOT EXISTS ", "", 1)
+    if replaced:
+        conn.execute(f"DROP TRIGGER {name}")
+        logger.info(f"Replaced trigger {name}.")
+    conn.execute(create_sql)
+    return replaced
+
+
+def pending_derived(conn):
+    """True when rows are queued for refresh_derived()."""
+    return conn.execute(f"SELECT 1 FROM derive_queue WHERE name IN ({', '.join('?' * len(_DERIVED))}) LIMIT 1",
+                        list(_DERIVED)).fetchone() is not None
+
+
+def refresh_derived(conn):
+    """
+    Recomputes the derived data of every queued row and empties the queue.
+    Must run inside a transaction, on a connection with the Python functions
+    registered. Returns the tables whose derived data was refreshed.
+    """
+    tables = set()
+    for (name,) in conn.execute("SELECT DISTINCT name FROM derive_queue").fetchall():
+        if name not in _DERIVED:
+            continue    # Queued by a newer version; left for it
+        table, refresh = _DERIVED[name]
+        refresh(conn, table, "t.id IN (SELECT row_id FROM derive_queue WHERE name = ?)", (name,))
+        conn.execute("DELETE FROM derive_queue WHERE name = ?", (name,))
+        tables.add(table)
+    return tables
@@ -0,0 +1,87 @@
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from tkinter import messagebox
+from datetime import datetime
+import logging
+
+from app.batch import BATCH_FIELDS, update_field, adjust_quantities
+
+logger = logging.getLogger(__name__)
+
+
+class BatchEditDialog:
+    """
+    Sets one field or adjusts the stock of every selected row: one
+    confirmation, one transaction, then on_done([(op, row_id)]) so the grid
+    can update just those rows.
+    """
+    def __init__(self, root, db, table, ids, on_done):
+        self.db = db
+        self.table = table
+        self.ids = list(ids)
+        self.on_done = on_done
+
+        self.win = tb.Toplevel(title=f"Batch Edit - {len(self.ids)} row(s)")
+        self.win.transient(root)
+        f = tb.Frame(self.win, padding=15); f.pack(fill=BOTH, expand=True)
+        tb.Label(f, text=f"{len(self.ids)} selected {table} row(s)", font=("Helvetica", 11, "bold")).grid(
+            row=0, column=0, columnspan=3, sticky=W, pady=(0, 10))
+
+        tb.Label(f, text="Set").grid(row=1, column=0, sticky=W, padx=5, pady=5)
+        self.field = tb.Combobox(f, values=BATCH_FIELDS[table], state="readonly", width=12)
+        self.field.current(0)
+        self.field.grid(row=1, column=1, sticky=W, padx=5)
+        self.value = tb.Entry(f, width=24); self.value.grid(row=1, column=2, sticky=EW, padx=5)
+        tb.Button(f, text="Apply", bootstyle=WARNING, command=self.set_field).grid(row=1, column=3, padx=5)
+
+        tb.Label(f, text="Adjust stock").grid(row=2, column=0, sticky=W, padx=5, pady=5)
+        self.adjustment = tb.Entry(f, width=24); self.adjustment.grid(row=2, column=2, sticky=EW, padx=5)
+        tb.Label(f, text="e.g. -50 mL, +2 vials, -10%", bootstyle=SECONDARY).grid(row=3, column=2, sticky=W, padx=5)
+        tb.Button(f, text="Apply", bootstyle=WARNING, command=self.adjust).grid(row=2, column=3, padx=5)
+        f.columnconfigure(2, weight=1)
+
+    def set_field(self):
+        column, value = self.field.get(), self.value.get().strip()
+        if column == "expiry":
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Format Error", "Expiry must be in YYYY-MM-DD format.", parent=self.win)
+                return
+        if not messagebox.askyesno("Confirm Batch Update", f"Set {column} = '{value}' on {len(self.ids)} row(s)?",
+                                   parent=self.win):
+            return
+        try:
+            changed = update_field(self.db, self.table, self.ids, column, value)
+        except Exception as e:
+            logger.error(f"Batch update failed: {e}")
+            messagebox.showerror("Batch Update Failed", str(e), parent=self.win)
+            return
+        self._done(changed)
+
+    def adjust(self):
+        text = self.adjustment.get().strip()
+        if not messagebox.askyesno("Confirm Stock Adjustment", f"Adjust the stock of {len(self.ids)} row(s) by {text}?",
+                                   parent=self.win):
+            return
+        try:
+            changed, skipped = adjust_quantities(self.db, self.table, self.ids, text)
+        except ValueError as e:
+            messagebox.showerror("Invalid Adjustment", str(e), parent=self.win)
+            return
+        except Exception as e:
+            logger.error(f"Batch stock adjustment failed: {e}")
+            messagebox.showerror("Stock Adjustment Failed", str(e), parent=self.win)
+            return
+        if not changed:
+            messagebox.showerror("Stock Adjustment", "No stock was changed: the quantities are missing, in another "
+                                                     "kind of unit or already zero.", parent=self.win)
+            return
+        if skipped:
+            messagebox.showinfo("Stock Adjustment", f"{len(skipped)} row(s) skipped: quantity missing, in another "
+                                                    f"kind of unit or already zero.", parent=self.win)
+        self._done(changed)
+
+    def _done(self, changed):
+        self.win.destroy()
+        self.on_done([("update", row_id) for row_id in changed])
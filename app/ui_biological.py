@@ -3,22 +3,37 @@ from ttkbootstrap.constants import *
 from tkinter import messagebox, filedialog
 from datetime import datetime, date
 import logging
+import threading
 import re
-
-# PDF Generation Imports
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from app.search import build_filter, SearchExecutor
+from app.grid import VirtualGrid
+from app.expiry import STATUS_SQL
+from app.importer import import_file
+
+# PDF export runs in a separate process (reportlab is imported there)
+from app.ui_export import ExportProgress
+from app.export import export_rows
+from app.ui_stats import StatsWindow
+from app.ui_storage import StorageWindow
+from app.storage import sample_location
+from app.batch import delete_rows
+from app.ui_batch import BatchEditDialog
+from app.changes import ChangeFeed, update_row, current_version, UPDATED, CONFLICT
 
 logger = logging.getLogger(__name__)
 
+COLUMNS = ("id", "name", "type", "organism", "medium", "container", "qty", "bsl", "expiry")
+POLL_MS = 1500  # check for other users' changes
+
 class BiologicalUI:
     def __init__(self, root, db, controller):
         self.root = root
         self.db = db
         self.controller = controller
         self.selected_id = None
+        self.selected_version = None
+        self.searcher = None
+        self._poll_job = None
         
         try:
             self.root.state('zoomed') 
@@ -45,6 +60,10 @@ class BiologicalUI:
                   command=self.confirm_full_exit).pack(side=RIGHT, padx=20)
         tb.Button(header, text="← Switch Module", bootstyle=INFO, 
                   command=self.back_to_hub).pack(side=RIGHT, padx=5)
+        tb.Button(header, text="📊 DB Stats", bootstyle=(INFO, OUTLINE),
+                  command=lambda: StatsWindow(self.root, self.db)).pack(side=RIGHT, padx=5)
+        tb.Button(header, text="📦 Storage", bootstyle=(INFO, OUTLINE),
+                  command=self.open_storage).pack(side=RIGHT, padx=5)
 
         # --- Data Entry Form (Fields same as previous) ---
         form = tb.LabelFrame(self.root, text="Sample Specification", padding=15)
@@ -66,6 +85,9 @@ class BiologicalUI:
             self.ents[key] = tb.Entry(form)
             self.ents[key].grid(row=1, column=i*2+1, padx=5, pady=5, sticky=EW)
         self.ents["expiry"].insert(0, date.today().strftime("%Y-%m-%d"))
+        tb.Label(form, text="Stored At").grid(row=2, column=0, padx=5, pady=5, sticky=W)
+        self.location = tb.Label(form, text="-", bootstyle=SECONDARY)
+        self.location.grid(row=2, column=1, columnspan=7, padx=5, pady=5, sticky=W)
 
         # --- Action Buttons ---
         btn_f = tb.Frame(self.root); btn_f.pack(fill=X, padx=20, pady=5)
@@ -73,10 +95,15 @@ class BiologicalUI:
         tb.Button(btn_f, text="Add Sample", bootstyle=SUCCESS, command=self.add_item).pack(side=LEFT, padx=5)
         tb.Button(btn_f, text="Update Record", bootstyle=WARNING, command=self.update_item).pack(side=LEFT, padx=5)
         tb.Button(btn_f, text="Delete", bootstyle=DANGER, command=self.delete_item).pack(side=LEFT, padx=5)
+        tb.Button(btn_f, text="Batch Edit…", bootstyle=(WARNING, OUTLINE), command=self.batch_edit).pack(side=LEFT, padx=5)
         
         # PDF Export Button Added Here
         tb.Button(btn_f, text="📄 Export to PDF", bootstyle=PRIMARY, 
                   command=self.export_to_pdf).pack(side=RIGHT, padx=5)
+        tb.Button(btn_f, text="⬇ Export Data", bootstyle=(PRIMARY, OUTLINE),
+                  command=self.export_data).pack(side=RIGHT, padx=5)
+        tb.Button(btn_f, text="⬆ Import CSV/TSV", bootstyle=(PRIMARY, OUTLINE),
+                  command=self.import_csv).pack(side=RIGHT, padx=5)
         tb.Button(btn_f, text="Clear Form", bootstyle=SECONDARY, command=self.clear_form).pack(side=RIGHT, padx=5)
 
         # --- Search & Filter ---
@@ -102,20 +129,29 @@ class BiologicalUI:
             s.bind("<FocusIn>", lambda e: e.widget.delete(0, END) if "Filter" in e.widget.get() else None)
 
         # --- Treeview ---
+        grid_f = tb.Frame(self.root); grid_f.pack(fill=BOTH, expand=True, padx=20, pady=10)
         cols = ("ID", "Name", "Type", "Organism", "Medium", "Container", "Qty", "BSL", "Expiry")
-        self.tree = tb.Treeview(self.root, columns=cols, show="headings", bootstyle=INFO)
+        self.tree = tb.Treeview(grid_f, columns=cols, show="headings", selectmode="extended", bootstyle=INFO)
         for c in cols: 
             self.tree.heading(c, text=c)
             self.tree.column(c, anchor=CENTER, width=110)
         
-        self.tree.pack(fill=BOTH, expand=True, padx=20, pady=10)
+        vsb = tb.Scrollbar(grid_f, orient=VERTICAL, command=self.tree.yview)
+        vsb.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
         self.tree.tag_configure("expired", background="#ffcccc", foreground="black") 
+        self.tree.tag_configure("expiring", background="#fff3cd", foreground="black")
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.grid = VirtualGrid(self.tree, self.db, "biological", COLUMNS, scrollbar=vsb, tags_for=self.row_tags,
+                                extra_columns=("version", f"{STATUS_SQL} AS status"))
+        self.searcher = SearchExecutor(self.root, self.update_tree, db=self.db, name="biological-search")
 
         self.refresh()
+        self.feed = ChangeFeed(self.db, "biological")
+        self.poll_changes()
 
     def export_to_pdf(self):
-        """Generates a professional PDF report from the current Treeview data."""
+        """Exports every row matching the active filters to PDF in a background process."""
         file_path = filedialog.asksaveasfilename(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf")],
@@ -124,48 +160,58 @@ class BiologicalUI:
         if not file_path: return
 
         try:
-            # Setup Document (Landscape A4 to fit 9 columns)
-            doc = SimpleDocTemplate(file_path, pagesize=landscape(A4))
-            elements = []
-            styles = getSampleStyleSheet()
-
-            # Title and Timestamp
-            elements.append(Paragraph("Biological Samples Inventory Report", styles['Title']))
-            elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-            elements.append(Spacer(1, 20))
-
-            # Table Header and Data
-            data = [["ID", "Name", "Type", "Source", "Medium", "Container", "Qty", "BSL", "Expiry"]]
-            
-            # Get data currently visible in the Treeview (honors active filters)
-            for child in self.tree.get_children():
-                data.append(self.tree.item(child)["values"])
-
-            # Create Table with Formatting
-            table = Table(data, repeatRows=1)
-            style = TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ])
-            table.setStyle(style)
-
-            elements.append(table)
-            doc.build(elements)
-            
-            logger.info(f"PDF Exported: {file_path}")
-            messagebox.showinfo("Export Successful", f"Report saved to:\n{file_path}")
-
+            # Rows are streamed from the database in page-sized tables (see app.export)
+            ExportProgress(self.root, self.db, self.grid, file_path,
+                           "Biological Samples Inventory Report", ["ID", "Name", "Type", "Source", "Medium", "Container", "Qty", "BSL", "Expiry"])
         except Exception as e:
             logger.error(f"PDF Generation Failed: {e}")
             messagebox.showerror("Export Error", f"An error occurred while creating the PDF: {e}")
 
+    def export_data(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("CSV (gzip)", "*.csv.gz"),
+                       ("JSON Lines", "*.jsonl"), ("JSON Lines (gzip)", "*.jsonl.gz")],
+            initialfile=f"Biological_Inventory_{date.today()}.csv")
+        if not file_path: return
+
+        # Same filters as the grid, streamed straight from the database
+        where, params = self.grid.where, list(self.grid.params)
+        def work():
+            try: result = export_rows(self.db.db_name, "biological", file_path, where, params)
+            except Exception as e: result = e
+            self.root.after(0, self._export_done, file_path, result)
+        threading.Thread(target=work, name="biological-export", daemon=True).start()
+
+    def _export_done(self, file_path, result):
+        if isinstance(result, Exception):
+            logger.error(f"Data export failed: {result}")
+            messagebox.showerror("Export Error", str(result))
+        else:
+            messagebox.showinfo("Export Successful", f"{result:,} sample(s) saved to:\n{file_path}")
+
+    def import_csv(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("CSV/TSV files", "*.csv *.tsv *.txt"), ("All files", "*.*")])
+        if not file_path or not messagebox.askyesno("Confirm", f"Import samples from {file_path}?"): return
+
+        def work():
+            try: result = import_file(self.db, file_path, "biological")
+            except Exception as e: result = e
+            finally: self.db.release()
+            self.root.after(0, self._import_done, result)
+        threading.Thread(target=work, name="biological-import", daemon=True).start()
+
+    def _import_done(self, result):
+        if isinstance(result, Exception):
+            logger.error(f"Import failed: {result}")
+            messagebox.showerror("Import Error", str(result))
+            return
+        msg = f"{result.inserted:,} sample(s) imported."
+        if result.rejected: msg += f"\n{result.rejected:,} rejected, see {result.reject_path}"
+        messagebox.showinfo("Import Complete", msg)
+        self.grid.reload()
+
     def is_valid_date(self, date_str):
         if not re.match(r"^\d{4}-\d{2}-\d{2}$", date_str): return False
         try:
@@ -177,32 +223,25 @@ class BiologicalUI:
         try:
             def clean(e):
                 v = e.get()
-                return f"%{v}%" if v and "Filter" not in v else "%%"
+                return v if v and "Filter" not in v else ""
 
-            query = """SELECT * FROM biological WHERE name LIKE ? AND type LIKE ? 
-                       AND bsl LIKE ? AND expiry LIKE ?"""
-            params = (clean(self.s_name), clean(self.s_type), clean(self.s_bsl), clean(self.s_date))
-            self.update_tree(self.db.query(query, params))
+            where, params = build_filter("biological", {
+                "name": clean(self.s_name), "type": clean(self.s_type),
+                "bsl": clean(self.s_bsl), "expiry": clean(self.s_date)}, fts=self.db.fts_enabled)
+            self.searcher.submit(lambda: self.grid.first_page(where, params))
         except Exception as e: logger.error(f"Search error: {e}")
 
     def refresh(self):
         try:
-            rows = self.db.query("SELECT * FROM biological")
-            self.update_tree(rows)
+            self.update_tree(self.grid.first_page())
         except Exception as e: logger.error(f"Refresh error: {e}")
 
-    def update_tree(self, rows):
-        self.tree.delete(*self.tree.get_children())
-        today = date.today()
-        for r in rows:
-            tag = ""
-            try:
-                # Expiry is at index 8 for Biological Table
-                if datetime.strptime(r[8], "%Y-%m-%d").date() < today:
-                    tag = "expired"
-            except: pass
-            self.tree.insert("", END, values=r, tags=(tag,))
-        self.tree.tag_configure("expired", background="#ffcccc", foreground="black")
+    def update_tree(self, page):
+        self.grid.show(*page)
+
+    def row_tags(self, r):
+        # Status ('expired', 'expiring' or '') is the last column of the query
+        return (r[-1],) if r[-1] else ()
 
     def add_item(self):
         name = self.ents["name"].get().strip()
@@ -217,51 +256,131 @@ class BiologicalUI:
                     self.ents["qty"].get(), self.ents["bsl"].get(), exp)
             
             sql = "INSERT INTO biological (name, type, organism, medium, container, qty, bsl, expiry) VALUES (?,?,?,?,?,?,?,?)"
-            if self.db.execute(sql, data):
-                logger.info(f"Bio Sample Added: {name}")
-                self.refresh(); self.clear_form()
+            new_id = self.db.insert(sql, data)
+            if new_id:
+                logger.info(f"Bio Sample Added: {name} (ID {new_id})")
+                self.db.audit.record_change("insert", "biological", new_id)
+                self.grid.apply_change("insert", new_id); self.clear_form()
+                self.controller.notify_change("biological", new_id)
 
     def update_item(self):
         if not self.selected_id: return
         exp = self.ents["expiry"].get().strip()
         if not self.is_valid_date(exp): return
 
-        data = (self.ents["name"].get(), self.ents["type"].get(), self.ents["source"].get(), 
-                self.ents["medium"].get(), self.ents["container"].get(),
-                self.ents["qty"].get(), self.ents["bsl"].get(), exp, self.selected_id)
-        
-        sql = "UPDATE biological SET name=?, type=?, organism=?, medium=?, container=?, qty=?, bsl=?, expiry=? WHERE id=?"
-        if self.db.execute(sql, data):
+        values = {"name": self.ents["name"].get(), "type": self.ents["type"].get(),
+                  "organism": self.ents["source"].get(), "medium": self.ents["medium"].get(),
+                  "container": self.ents["container"].get(), "qty": self.ents["qty"].get(),
+                  "bsl": self.ents["bsl"].get(), "expiry": exp}
+
+        # Compare-and-set on the version loaded with the row
+        before = self.db.audit.snapshot("biological", self.selected_id)
+        outcome = update_row(self.db, "biological", self.selected_id, values, self.selected_version)
+        if outcome == UPDATED:
             logger.info(f"Bio Sample Updated ID: {self.selected_id}")
-            self.refresh()
+            self.db.audit.record_change("update", "biological", self.selected_id, before)
+            self.grid.apply_change("update", self.selected_id)
+            self.selected_version += 1
+            self.controller.notify_change("biological", self.selected_id)
+        elif outcome == CONFLICT:
+            logger.warning(f"Bio Sample edit conflict ID: {self.selected_id}")
+            self.grid.apply_change("update", self.selected_id)
+            if messagebox.askyesno("Conflict", "Sample was changed by another user. Load their version?\n"
+                                               "(No keeps your edits; Update again to overwrite.)"):
+                if self.grid.row(self.selected_id):
+                    self.tree.focus(str(self.selected_id)); self.on_select(None)
+                else:
+                    self.clear_form()
+            else:
+                self.selected_version = current_version(self.db, "biological", self.selected_id)
+        elif outcome is not None:
+            messagebox.showerror("Error", "Sample was deleted by another user.")
+            self.grid.apply_change("delete", self.selected_id); self.clear_form()
 
     def delete_item(self):
+        if len(self.selected_ids()) > 1: return self.delete_selected()
         if self.selected_id and messagebox.askyesno("Delete", "Delete sample permanently?"):
+            before = self.db.audit.snapshot("biological", self.selected_id)
             if self.db.execute("DELETE FROM biological WHERE id=?", (self.selected_id,)):
                 logger.warning(f"Bio Sample Deleted ID: {self.selected_id}")
-                self.refresh(); self.clear_form()
+                self.db.audit.record_change("delete", "biological", self.selected_id, before)
+                self.grid.apply_change("delete", self.selected_id)
+                self.controller.notify_change("biological", self.selected_id); self.clear_form()
+
+    def selected_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
+    def delete_selected(self):
+        # One confirmation and one transaction for the whole selection
+        ids = self.selected_ids()
+        if not messagebox.askyesno("Delete", f"Delete {len(ids)} samples permanently?"): return
+        try: deleted = delete_rows(self.db, "biological", ids)
+        except Exception as e:
+            logger.error(f"Batch delete failed: {e}")
+            messagebox.showerror("Error", f"No samples were deleted: {e}"); return
+        self.batch_done([("delete", row_id) for row_id in deleted])
+
+    def batch_edit(self):
+        ids = self.selected_ids()
+        if not ids:
+            messagebox.showwarning("Batch Edit", "Select one or more samples first."); return
+        BatchEditDialog(self.root, self.db, "biological", ids, on_done=self.batch_done)
+
+    def batch_done(self, changes):
+        self.grid.apply_changes(changes)
+        for op, row_id in changes:
+            self.controller.notify_change("biological", row_id)
+        if self.selected_id in {row_id for op, row_id in changes}: self.clear_form()
 
     def on_select(self, e):
         sel = self.tree.focus()
         if not sel: return
         v = self.tree.item(sel)['values']
         self.selected_id = v[0]
+        row = self.grid.row(sel)
+        self.selected_version = row[len(COLUMNS)] if row else None
         # Map values back to entries
         keys = ["name", "type", "source", "medium", "container", "qty", "bsl", "expiry"]
         for i, k in enumerate(keys):
             self.ents[k].delete(0, END)
             self.ents[k].insert(0, v[i+1])
+        self.show_location()
+
+    def show_location(self):
+        loc = sample_location(self.db, self.selected_id) if self.selected_id else None
+        self.location.config(text=loc[2] if loc else "-")
+
+    def open_storage(self):
+        # The storage window places whichever sample is selected here at the time
+        selected = lambda: (self.selected_id, self.ents["name"].get()) if self.selected_id else None
+        StorageWindow(self.root, self.db, selected, on_change=lambda ids: self.show_location())
 
     def clear_form(self):
         for e in self.ents.values(): e.delete(0, END)
         self.ents["expiry"].insert(0, date.today().strftime("%Y-%m-%d"))
         self.selected_id = None
+        self.selected_version = None
+        self.location.config(text="-")
+
+    def poll_changes(self):
+        # Rows changed by other users since the last poll
+        self._poll_job = self.root.after(POLL_MS, self.poll_changes)
+        try: changes = self.feed.poll()
+        except Exception as e:
+            logger.error(f"Change polling failed: {e}"); return
+        self.grid.apply_changes(changes)
+        for op, row_id in changes or ():
+            self.controller.notify_change("biological", row_id)
 
     def back_to_hub(self):
+        if self.searcher: self.searcher.shutdown()
+        if self._poll_job: self.root.after_cancel(self._poll_job)
         self.root.destroy()
         self.controller.start_selection_hub()
 
     def confirm_full_exit(self):
         if messagebox.askyesno("Exit", "Close System?"):
+            if self.searcher: self.searcher.shutdown()
+            if self._poll_job: self.root.after_cancel(self._poll_job)
             self.root.quit()
             self.root.destroy()
\ No newline at end of file
@@ -1,20 +1,36 @@
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
+from ttkbootstrap.scrolled import ScrolledText
 from tkinter import messagebox, filedialog
 from datetime import datetime, date
 import logging
+import threading
 import re
-
-# PDF Generation Imports
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from app.search import build_filter, SearchExecutor
+from app.grid import VirtualGrid
+from app.expiry import STATUS_SQL
+from app.importer import import_file
+
+# PDF export runs in a separate process (reportlab is imported there)
+from app.ui_export import ExportProgress
+from app.export import export_rows
+from app.ui_stats import StatsWindow
+from app.changes import ChangeFeed, update_row, current_version, UPDATED, CONFLICT
+from app.fuzzy import fuzzy_search
+from app.hazards import segregation_report, format_segregation
+from app.batch import delete_rows
+from app.ui_batch import BatchEditDialog
 
 # --- Logging Configuration ---
 # This ensures that all actions within this module are tracked for audit purposes.
 logger = logging.getLogger(__name__)
 
+# SQL columns behind the grid, in display order
+COLUMNS = ("id", "name", "synonyms", "class", "mol_info", "quantity", "ghs", "expiry")
+
+# How often (ms) the grid checks for changes saved by other users
+POLL_MS = 1500
+
 class ChemicalUI:
     """
     A robust UI for Chemical Inventory management.
@@ -28,6 +44,9 @@ class ChemicalUI:
         self.db = db
         self.controller = controller
         self.selected_id = None
+        self.selected_version = None
+        self.searcher = None
+        self._poll_job = None
         # Set to Full Screen / Maximized
         # 'zoomed' works for Windows; for Linux/Mac use self.root.attributes('-fullscreen', True)
         try:
@@ -60,6 +79,10 @@ class ChemicalUI:
                   
         tb.Button(header, text="← Switch Module", bootstyle=INFO, 
                   command=self.back_to_hub).pack(side=RIGHT, padx=5)
+        tb.Button(header, text="📊 DB Stats", bootstyle=(INFO, OUTLINE),
+                  command=lambda: StatsWindow(self.root, self.db)).pack(side=RIGHT, padx=5)
+        tb.Button(header, text="⚠ Segregation", bootstyle=(WARNING, OUTLINE),
+                  command=self.show_segregation).pack(side=RIGHT, padx=5)
 
         # --- Data Entry Form ---
         form = tb.LabelFrame(self.root, text="Material Specification & Safety Data", padding=15)
@@ -102,16 +125,23 @@ class ChemicalUI:
         tb.Button(btn_f, text="Add Chemical", bootstyle=SUCCESS, command=self.add_item).pack(side=LEFT, padx=5)
         tb.Button(btn_f, text="Update Record", bootstyle=WARNING, command=self.update_item).pack(side=LEFT, padx=5)
         tb.Button(btn_f, text="Delete", bootstyle=DANGER, command=self.delete_item).pack(side=LEFT, padx=5)
+        # Applies to every selected row (Ctrl/Shift-click to select several)
+        tb.Button(btn_f, text="Batch Edit…", bootstyle=(WARNING, OUTLINE),
+                  command=self.batch_edit).pack(side=LEFT, padx=5)
         # PDF Export Button Added Here
         tb.Button(btn_f, text="📄 Export to PDF", bootstyle=PRIMARY, 
                   command=self.export_to_pdf).pack(side=RIGHT, padx=5)
+        tb.Button(btn_f, text="⬇ Export Data", bootstyle=(PRIMARY, OUTLINE),
+                  command=self.export_data).pack(side=RIGHT, padx=5)
+        tb.Button(btn_f, text="⬆ Import CSV/TSV", bootstyle=(PRIMARY, OUTLINE),
+                  command=self.import_csv).pack(side=RIGHT, padx=5)
         tb.Button(btn_f, text="Clear Form", bootstyle=SECONDARY, command=self.clear_form).pack(side=RIGHT, padx=5)
 
-        # --- Quad-Filter Search (Dynamic Filtering) ---
+        # --- Multi-Filter Search (Dynamic Filtering) ---
         search_f = tb.LabelFrame(self.root, text="Search & Filter", padding=15)
         search_f.pack(fill=X, padx=20, pady=10)
         
-        for i in range(4): search_f.columnconfigure(i, weight=1)
+        for i in range(5): search_f.columnconfigure(i, weight=1)
 
         self.s_name = tb.Entry(search_f); self.s_name.grid(row=0, column=0, padx=10, sticky=EW)
         self.s_name.insert(0, "Filter Name...")
@@ -125,25 +155,50 @@ class ChemicalUI:
         self.s_date = tb.Entry(search_f); self.s_date.grid(row=0, column=3, padx=10, sticky=EW)
         self.s_date.insert(0, "Filter Year...")
 
+        # Formula filter: elements ("Hg|Pb", "Na & Cl"), weight range ("150..200") or exact formula ("C2H6O")
+        self.s_mol = tb.Entry(search_f); self.s_mol.grid(row=0, column=4, padx=10, sticky=EW)
+        self.s_mol.insert(0, "Filter Formula/MW...")
+
+        # Shown when a name finds nothing and similar spellings are listed instead
+        self.s_hint = tb.Label(search_f, text="", bootstyle=INFO)
+        self.s_hint.grid(row=1, column=0, columnspan=5, padx=10, pady=(5, 0), sticky=W)
+
         # Bind search events to inputs
-        for s in [self.s_name, self.s_class, self.s_ghs, self.s_date]:
+        for s in [self.s_name, self.s_class, self.s_ghs, self.s_date, self.s_mol]:
             s.bind("<KeyRelease>", lambda e: self.perform_search())
             s.bind("<FocusIn>", lambda e: e.widget.delete(0, END) if "Filter" in e.widget.get() else None)
 
         # --- Data Grid (Treeview) ---
+        grid_f = tb.Frame(self.root)
+        grid_f.pack(fill=BOTH, expand=True, padx=20, pady=10)
+
         cols = ("ID", "Name", "Synonyms", "Class", "Mol. Wt", "Qty", "GHS", "Expiry")
-        self.tree = tb.Treeview(self.root, columns=cols, show="headings", bootstyle=INFO)
+        self.tree = tb.Treeview(grid_f, columns=cols, show="headings", selectmode="extended", bootstyle=INFO)
         for c in cols: 
             self.tree.heading(c, text=c)
             self.tree.column(c, anchor=CENTER, width=120)
-        
-        self.tree.pack(fill=BOTH, expand=True, padx=20, pady=10)
-        # Configure the 'expired' tag with a high-contrast color
-        self.tree.tag_configure("expired", background="#F08080", foreground="white")
+
+        vsb = tb.Scrollbar(grid_f, orient=VERTICAL, command=self.tree.yview)
+        vsb.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        # Configure the expiry status tags with high-contrast colors
+        self.tree.tag_configure("expired", background="#ffcccc", foreground="black")
+        self.tree.tag_configure("expiring", background="#fff3cd", foreground="black")
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
+        # Only a window of rows is materialized; neighbouring pages load on scroll
+        # The expiry status is computed by the query itself; the row version is kept for safe updates
+        self.grid = VirtualGrid(self.tree, self.db, "chemicals", COLUMNS, scrollbar=vsb, tags_for=self.row_tags,
+                                extra_columns=("version", f"{STATUS_SQL} AS status"))
+
+        # Filter keystrokes are debounced and queried off the Tk thread
+        self.searcher = SearchExecutor(self.root, self.show_search_result, db=self.db, name="chemical-search")
         self.refresh()
 
+        # Other workstations' edits are pulled in incrementally
+        self.feed = ChangeFeed(self.db, "chemicals")
+        self.poll_changes()
+
     # --- Logic, Validation & Error Handling ---
 
     def is_valid_date(self, date_str):
@@ -157,52 +212,60 @@ class ChemicalUI:
             return False
 
     def perform_search(self):
-        """Performs a real-time multi-criteria search with safety checks."""
+        """Queues a real-time multi-criteria search through the full-text index."""
         try:
             def clean(e):
                 v = e.get()
-                return f"%{v}%" if v and "Filter" not in v else "%%"
-
-            query = """SELECT id, name, synonyms, class, mol_info, quantity, ghs, expiry 
-                       FROM chemicals WHERE name LIKE ? AND class LIKE ? 
-                       AND ghs LIKE ? AND expiry LIKE ?"""
-            params = (clean(self.s_name), clean(self.s_class), clean(self.s_ghs), clean(self.s_date))
-            results = self.db.query(query, params)
-            self.update_tree(results)
+                return v if v and "Filter" not in v else ""
+
+            filters = {"name": clean(self.s_name), "class": clean(self.s_class),
+                       "ghs": clean(self.s_ghs), "expiry": clean(self.s_date), "mol_info": clean(self.s_mol)}
+            where, params = build_filter("chemicals", filters, fts=self.db.fts_enabled)
+            self.searcher.submit(lambda: self.search_job(filters, where, params))
         except Exception as e:
             logger.error(f"Search filtering error: {str(e)}")
 
+    def search_job(self, filters, where, params):
+        """
+        Runs on the search worker. A name filter that matches nothing falls back
+        to typo-tolerant search: rows named like the closest spellings are shown
+        (still narrowed by the other filters). Returns (page, hint).
+        """
+        page = self.grid.first_page(where, params)
+        name = filters["name"].strip()
+        if page[2] or not name or not self.db.fuzzy_enabled:
+            return page, ""
+        similar = fuzzy_search(self.db, name, limit=self.grid.page_size)
+        if not similar:
+            return page, ""
+        where, params = build_filter("chemicals", dict(filters, name=""), fts=self.db.fts_enabled)
+        ids = [r[0] for r in similar]
+        where = f"id IN ({', '.join('?' * len(ids))}) AND {where}"
+        names = list(dict.fromkeys(r[1] for r in similar))[:3]
+        hint = f"No exact match for '{name}' - showing similar: {', '.join(names)}"
+        return self.grid.first_page(where, ids + params), hint
+
+    def show_search_result(self, result):
+        """Shows a search_job() result on the Tk thread."""
+        page, hint = result
+        self.s_hint.config(text=hint)
+        self.update_tree(page)
+
     def refresh(self):
-        """Reloads the entire inventory from the database."""
+        """Reloads the inventory from the first page, without filters."""
         try:
-            rows = self.db.query("SELECT id, name, synonyms, class, mol_info, quantity, ghs, expiry FROM chemicals")
-            self.update_tree(rows)
+            self.s_hint.config(text="")
+            self.update_tree(self.grid.first_page())
         except Exception as e:
             logger.error(f"Failed to refresh data: {str(e)}")
 
-    def update_tree(self, rows):
-        """Repopulates the Treeview and applies expiration styling."""
-        self.tree.delete(*self.tree.get_children())
-        today = date.today()
-        
-        for r in rows:
-            tag = ""
-            try:
-                # In your current SQL (id, name, syn, class, mol, qty, ghs, expiry)
-                # the expiry date is at index 7.
-                expiry_date_str = r[7] 
-                expiry_date = datetime.strptime(expiry_date_str, "%Y-%m-%d").date()
-                
-                if expiry_date < today:
-                    tag = "expired"
-            except (ValueError, IndexError, TypeError):
-                # If date is malformed or index is wrong, skip tagging
-                tag = ""
-                
-            self.tree.insert("", END, values=r, tags=(tag,))
-
-        # Force the tag configuration to ensure it persists after refresh
-        self.tree.tag_configure("expired", background="#ffcccc", foreground="black")
+    def update_tree(self, page):
+        """Shows the first page of a result (where, params, rows) in the grid."""
+        self.grid.show(*page)
+
+    def row_tags(self, r):
+        """Applies expiration styling from the SQL status column ('expired', 'expiring' or '')."""
+        return (r[-1],) if r[-1] else ()
 
     def add_item(self):
         """Processes the 'Add Chemical' request with validation."""
@@ -224,11 +287,13 @@ class ChemicalUI:
                     self.ents["mol"].get(), self.ents["qty"].get(), 
                     self.ents["ghs"].get(), exp)
             
-            success = self.db.execute("INSERT INTO chemicals (name, synonyms, class, mol_info, quantity, ghs, expiry) VALUES (?,?,?,?,?,?,?)", data)
+            new_id = self.db.insert("INSERT INTO chemicals (name, synonyms, class, mol_info, quantity, ghs, expiry) VALUES (?,?,?,?,?,?,?)", data)
             
-            if success:
-                logger.info(f"Inventory Add: {name} successfully created.")
-                self.refresh()
+            if new_id:
+                logger.info(f"Inventory Add: {name} successfully created (ID {new_id}).")
+                self.db.audit.record_change("insert", "chemicals", new_id)
+                self.grid.apply_change("insert", new_id)
+                self.controller.notify_change("chemicals", new_id)
                 self.clear_form()
             else:
                 logger.error(f"DB Error: Could not add chemical '{name}'")
@@ -248,32 +313,101 @@ class ChemicalUI:
             return
 
         if messagebox.askyesno("Confirm Update", f"Apply changes to '{name}' (ID: {self.selected_id})?"):
-            data = (name, self.ents["syn"].get(), self.ents["class"].get(), 
-                    self.ents["mol"].get(), self.ents["qty"].get(), 
-                    self.ents["ghs"].get(), exp, self.selected_id)
-            
-            sql = "UPDATE chemicals SET name=?, synonyms=?, class=?, mol_info=?, quantity=?, ghs=?, expiry=? WHERE id=?"
-            if self.db.execute(sql, data):
+            values = {"name": name, "synonyms": self.ents["syn"].get(), "class": self.ents["class"].get(),
+                      "mol_info": self.ents["mol"].get(), "quantity": self.ents["qty"].get(),
+                      "ghs": self.ents["ghs"].get(), "expiry": exp}
+
+            # Only saved if nobody else changed the record since it was selected
+            before = self.db.audit.snapshot("chemicals", self.selected_id)
+            outcome = update_row(self.db, "chemicals", self.selected_id, values, self.selected_version)
+            if outcome == UPDATED:
                 logger.info(f"Inventory Update: Record ID {self.selected_id} modified.")
-                self.refresh()
+                self.db.audit.record_change("update", "chemicals", self.selected_id, before)
+                self.grid.apply_change("update", self.selected_id)
+                self.selected_version += 1
+                self.controller.notify_change("chemicals", self.selected_id)
+            elif outcome == CONFLICT:
+                self.resolve_conflict()
+            elif outcome is not None:
+                logger.warning(f"Inventory Update: Record ID {self.selected_id} was deleted by another user.")
+                messagebox.showerror("Update Failed", "This record has been deleted by another user.")
+                self.grid.apply_change("delete", self.selected_id)
+                self.clear_form()
             else:
                 messagebox.showerror("Update Failed", "Changes could not be saved to the database.")
 
+    def resolve_conflict(self):
+        """Handles an update rejected because another user saved the record first."""
+        logger.warning(f"Inventory Update: Edit conflict on record ID {self.selected_id}.")
+        self.grid.apply_change("update", self.selected_id)
+        if messagebox.askyesno("Edit Conflict",
+                               "Another user changed this record after you selected it.\n\n"
+                               "Yes: discard your edits and load their version.\n"
+                               "No: keep your edits (press Update again to overwrite theirs)."):
+            if self.grid.row(self.selected_id):
+                self.tree.focus(str(self.selected_id))
+                self.on_select(None)
+            else:
+                self.clear_form()   # No longer matches the active filters
+        else:
+            # Adopt the current version so that the next Update is a deliberate overwrite
+            self.selected_version = current_version(self.db, "chemicals", self.selected_id)
+
     def delete_item(self):
         """Safely removes a record from the inventory."""
+        if len(self.selected_ids()) > 1:
+            return self.delete_selected()
         if not self.selected_id:
             return
             
         if messagebox.askyesno("CRITICAL: Delete Record", "This action is permanent. Do you want to continue?"):
             try:
+                before = self.db.audit.snapshot("chemicals", self.selected_id)
                 success = self.db.execute("DELETE FROM chemicals WHERE id=?", (self.selected_id,))
                 if success:
                     logger.warning(f"Inventory Delete: User removed record ID {self.selected_id}")
-                    self.refresh()
+                    self.db.audit.record_change("delete", "chemicals", self.selected_id, before)
+                    self.grid.apply_change("delete", self.selected_id)
+                    self.controller.notify_change("chemicals", self.selected_id)
                     self.clear_form()
             except Exception as e:
                 logger.error(f"Critical error during deletion: {str(e)}")
 
+    def selected_ids(self):
+        """Ids of all rows selected in the grid."""
+        return [int(iid) for iid in self.tree.selection()]
+
+    def delete_selected(self):
+        """Removes every selected record in one transaction after a single confirmation."""
+        ids = self.selected_ids()
+        if not messagebox.askyesno("CRITICAL: Delete Records",
+                                   f"{len(ids)} records will be permanently removed. Do you want to continue?"):
+            return
+        try:
+            deleted = delete_rows(self.db, "chemicals", ids)
+        except Exception as e:
+            logger.error(f"Critical error during batch deletion: {str(e)}")
+            messagebox.showerror("Delete Failed", f"No records were removed: {e}")
+            return
+        self.batch_done([("delete", row_id) for row_id in deleted])
+
+    def batch_edit(self):
+        """Opens the batch dialog for the selected records."""
+        ids = self.selected_ids()
+        if not ids:
+            messagebox.showwarning("Batch Edit", "Select one or more records first (Ctrl/Shift-click).")
+            return
+        BatchEditDialog(self.root, self.db, "chemicals", ids, on_done=self.batch_done)
+
+    def batch_done(self, changes):
+        """Updates the grid (one re-read for all rows) after a batch operation."""
+        self.grid.apply_changes(changes)
+        for op, row_id in changes:
+            self.controller.notify_change("chemicals", row_id)
+        if self.selected_id in {row_id for op, row_id in changes}:
+            self.clear_form()   # The form shows stale values
+        logger.info(f"Batch operation applied to {len(changes)} chemical record(s)")
+
     def on_select(self, e):
         """Handles record selection and populates form fields."""
         sel = self.tree.focus()
@@ -282,6 +416,8 @@ class ChemicalUI:
         try:
             v = self.tree.item(sel)['values']
             self.selected_id = v[0]
+            row = self.grid.row(sel)
+            self.selected_version = row[len(COLUMNS)] if row else None
             # Map grid columns back to input boxes
             for i, k in enumerate(["name", "syn", "class", "mol", "qty", "ghs", "expiry"]):
                 self.ents[k].delete(0, END)
@@ -294,10 +430,41 @@ class ChemicalUI:
         for e in self.ents.values(): e.delete(0, END)
         self.ents["expiry"].insert(0, date.today().strftime("%Y-%m-%d"))
         self.selected_id = None
+        self.selected_version = None
+
+    def poll_changes(self):
+        """Pulls rows that other users added, changed or deleted into the grid."""
+        self._poll_job = self.root.after(POLL_MS, self.poll_changes)
+        try:
+            changes = self.feed.poll()
+        except Exception as e:
+            logger.error(f"Change polling failed: {e}")
+            return
+        self.grid.apply_changes(changes)
+        for op, row_id in changes or ():
+            self.controller.notify_change("chemicals", row_id)
+
+    def show_segregation(self):
+        """Lists classes whose members carry incompatible GHS pictograms (e.g. flammables with oxidizers)."""
+        try:
+            report = format_segregation(segregation_report(self.db, "chemicals"))
+        except Exception as e:
+            logger.error(f"Segregation report failed: {e}")
+            messagebox.showerror("Report Error", "The segregation report could not be produced.")
+            return
+        win = tb.Toplevel(title="Hazard Segregation by Class")
+        win.geometry("900x500")
+        win.transient(self.root)
+        text = ScrolledText(win, font=("Courier", 9), autohide=True, padding=10)
+        text.pack(fill=BOTH, expand=True)
+        text.insert(END, report)
+        text.text.configure(state=DISABLED)
 
     def back_to_hub(self):
         """Returns the user to the selection hub and closes current view."""
         logger.info("User navigating back to Selection Hub.")
+        if self.searcher: self.searcher.shutdown()
+        if self._poll_job: self.root.after_cancel(self._poll_job)
         self.root.destroy()
         self.controller.start_selection_hub()
 
@@ -305,11 +472,13 @@ class ChemicalUI:
         """Prompts for a clean system shutdown."""
         if messagebox.askyesno("Exit BioLab", "Are you sure you want to terminate the session?"):
             logger.info("System shutdown initiated by user.")
+            if self.searcher: self.searcher.shutdown()
+            if self._poll_job: self.root.after_cancel(self._poll_job)
             self.root.quit()
             self.root.destroy()
 
     def export_to_pdf(self):
-        """Generates a professional PDF report from the current Treeview data."""
+        """Exports every row matching the active filters to PDF in a background process."""
         file_path = filedialog.asksaveasfilename(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf")],
@@ -318,43 +487,64 @@ class ChemicalUI:
         if not file_path: return
 
         try:
-            # Setup Document (Landscape A4 to fit 9 columns)
-            doc = SimpleDocTemplate(file_path, pagesize=landscape(A4))
-            elements = []
-            styles = getSampleStyleSheet()
-
-            # Title and Timestamp
-            elements.append(Paragraph("Chemical Inventory Report", styles['Title']))
-            elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-            elements.append(Spacer(1, 20))
-
-            # Table Header and Data
-            data = [["ID", "Name", "Synonyms", "Class", "Mol. Wt", "Qty", "GHS", "Expiry"]]
-            
-            # Get data currently visible in the Treeview (honors active filters)
-            for child in self.tree.get_children():
-                data.append(self.tree.item(child)["values"])
-
-            # Create Table with Formatting
-            table = Table(data, repeatRows=1)
-            style = TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ])
-            table.setStyle(style)
-
-            elements.append(table)
-            doc.build(elements)
-            
-            logger.info(f"PDF Exported: {file_path}")
-            messagebox.showinfo("Export Successful", f"Report saved to:\n{file_path}")
+            # Rows are streamed from the database in page-sized tables (see app.export)
+            ExportProgress(self.root, self.db, self.grid, file_path,
+                           "Chemical Inventory Report", ["ID", "Name", "Synonyms", "Class", "Mol. Wt", "Qty", "GHS", "Expiry"])
         except Exception as e:
             logger.error(f"PDF Generation Failed: {e}")
             messagebox.showerror("Export Error", f"An error occurred while creating the PDF: {e}")
+
+    def import_csv(self):
+        """Bulk-imports chemicals from a CSV/TSV spreadsheet on a background thread."""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("CSV/TSV files", "*.csv *.tsv *.txt"), ("All files", "*.*")])
+        if not file_path: return
+
+        if messagebox.askyesno("Confirm Import", f"Import chemicals from:\n{file_path}?"):
+            def work():
+                try:
+                    result = import_file(self.db, file_path, "chemicals")
+                except Exception as e:
+                    result = e
+                finally:
+                    self.db.release()   # This thread's connection is not needed again
+                self.root.after(0, self._import_done, result)
+            threading.Thread(target=work, name="chemical-import", daemon=True).start()
+
+    def _import_done(self, result):
+        """Reports the import outcome and reloads the grid."""
+        if isinstance(result, Exception):
+            logger.error(f"Import failed: {result}")
+            messagebox.showerror("Import Error", f"The file could not be imported: {result}")
+            return
+        msg = f"{result.inserted:,} chemical(s) imported in {result.seconds:.1f}s."
+        if result.rejected:
+            msg += f"\n{result.rejected:,} row(s) rejected, see:\n{result.reject_path}"
+        messagebox.showinfo("Import Complete", msg)
+        self.grid.reload()
+
+    def export_data(self):
+        """Streams every chemical matching the active filters to CSV or JSON Lines (optionally gzipped)."""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("CSV (gzip)", "*.csv.gz"),
+                       ("JSON Lines", "*.jsonl"), ("JSON Lines (gzip)", "*.jsonl.gz")],
+            initialfile=f"Chemical_Inventory_{date.today()}.csv"
+        )
+        if not file_path: return
+
+        where, params = self.grid.where, list(self.grid.params)
+        def work():
+            try:
+                result = export_rows(self.db.db_name, "chemicals", file_path, where, params)
+            except Exception as e:
+                result = e
+            self.root.after(0, self._export_done, file_path, result)
+        threading.Thread(target=work, name="chemical-export", daemon=True).start()
+
+    def _export_done(self, file_path, result):
+        if isinstance(result, Exception):
+            logger.error(f"Data export failed: {result}")
+            messagebox.showerror("Export Error", f"An error occurred while exporting: {result}")
+        else:
+            messagebox.showinfo("Export Successful", f"{result:,} chemical(s) saved to:\n{file_path}")
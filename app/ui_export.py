@@ -0,0 +1,77 @@
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from tkinter import messagebox
+import multiprocessing
+import queue
+import logging
+
+from app.export import write_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class ExportProgress:
+    """
+    Runs a PDF export in a background process and shows its progress with a
+    Cancel button, keeping the Tk event loop free while pages are generated.
+    """
+    def __init__(self, root, db, grid, file_path, title, headers):
+        self.root = root
+        self.file_path = file_path
+        # 'spawn' avoids forking the Tk process on Linux/macOS.
+        ctx = multiprocessing.get_context("spawn")
+        self.queue = ctx.Queue()
+        self.cancel_event = ctx.Event()
+
+        sql, params = grid.current_query()
+        self.proc = ctx.Process(target=write_pdf, daemon=True, kwargs=dict(
+            db_name=db.db_name, out_path=file_path, title=title, headers=headers, sql=sql,
+            params=params, progress=self.queue, cancel=self.cancel_event))
+
+        self.win = tb.Toplevel(title="Exporting PDF")
+        self.win.geometry("420x160")
+        self.win.transient(root)
+        self.win.protocol("WM_DELETE_WINDOW", self.cancel)
+        f = tb.Frame(self.win, padding=20); f.pack(fill=BOTH, expand=True)
+        self.status = tb.Label(f, text="Preparing report...")
+        self.status.pack(fill=X, pady=(0, 10))
+        self.bar = tb.Progressbar(f, mode=DETERMINATE, maximum=100, bootstyle=INFO)
+        self.bar.pack(fill=X, pady=(0, 10))
+        self.cancel_btn = tb.Button(f, text="Cancel", bootstyle=DANGER, command=self.cancel)
+        self.cancel_btn.pack(side=RIGHT)
+
+        self.proc.start()
+        logger.info(f"PDF export started in process {self.proc.pid}: {file_path}")
+        self.root.after(100, self.poll)
+
+    def poll(self):
+        """Drains progress messages from the export process."""
+        try:
+            while True:
+                msg = self.queue.get_nowait()
+                if msg[0] == "progress":
+                    done, total = msg[1], msg[2]
+                    self.bar["value"] = done * 100 / total if total else 100
+                    self.status.config(text=f"{done:,} of {total:,} rows written")
+                else:
+                    return self.finish(msg)
+        except queue.Empty:
+            pass
+        if not self.proc.is_alive() and self.queue.empty():
+            return self.finish(("error", f"Export process exited with code {self.proc.exitcode}"))
+        self.root.after(100, self.poll)
+
+    def finish(self, msg):
+        self.win.destroy()
+        self.proc.join(timeout=1)
+        if msg[0] == "done":
+            messagebox.showinfo("Export Successful", f"Report saved to:\n{msg[1]}")
+        elif msg[0] == "cancelled":
+            logger.info(f"PDF export cancelled: {self.file_path}")
+        else:
+            messagebox.showerror("Export Error", f"An error occurred while creating the PDF: {msg[1]}")
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.cancel_btn.config(state=DISABLED)
+        self.status.config(text="Cancelling...")
@@ -0,0 +1,45 @@
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from ttkbootstrap.scrolled import ScrolledText
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StatsWindow:
+    """Shows Database.stats_summary() in a window that refreshes while it is open."""
+    def __init__(self, root, db, interval_ms=2000):
+        self.root = root
+        self.db = db
+        self.interval_ms = interval_ms
+        self._job = None
+
+        self.win = tb.Toplevel(title="Database Statistics")
+        self.win.geometry("1000x500")
+        self.win.transient(root)
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+        f = tb.Frame(self.win, padding=10); f.pack(fill=BOTH, expand=True)
+        self.text = ScrolledText(f, font=("Courier", 9), autohide=True)
+        self.text.pack(fill=BOTH, expand=True)
+        btn_f = tb.Frame(f); btn_f.pack(fill=X, pady=(10, 0))
+        tb.Button(btn_f, text="Close", bootstyle=SECONDARY, command=self.close).pack(side=RIGHT, padx=5)
+        tb.Button(btn_f, text="Log Snapshot", bootstyle=(INFO, OUTLINE), command=self.log_snapshot).pack(side=RIGHT, padx=5)
+        self.refresh()
+
+    def refresh(self):
+        """Redraws the report, keeping the scroll position."""
+        top = self.text.text.yview()[0]
+        self.text.text.configure(state=NORMAL)
+        self.text.delete("1.0", END)
+        self.text.insert(END, self.db.stats_summary(top=25))
+        self.text.text.configure(state=DISABLED)
+        self.text.text.yview_moveto(top)
+        self._job = self.win.after(self.interval_ms, self.refresh)
+
+    def log_snapshot(self):
+        logger.info(self.db.stats_summary(top=25))
+
+    def close(self):
+        if self._job:
+            self.win.after_cancel(self._job)
+        self.win.destroy()
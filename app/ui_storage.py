@@ -0,0 +1,213 @@
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from tkinter import messagebox, simpledialog
+import logging
+import re
+
+from app.storage import (KINDS, StorageError, add_unit, remove_unit, move_unit, move_samples, children, get_unit,
+                         unit_path, box_contents, position_label, occupied)
+
+logger = logging.getLogger(__name__)
+
+
+class StorageWindow:
+    """
+    Browses the site > freezer > rack > box tree and shows one box as a grid
+    of positions (filled ones in colour). The sample selected in the main
+    window can be stored in a clicked position or the first free one under
+    the selected unit; a marked unit (or a marked box's samples) can be moved
+    to another unit in one transaction.
+    """
+    def __init__(self, root, db, selected_sample, on_change=None):
+        self.root = root
+        self.db = db
+        self.selected_sample = selected_sample      # callable -> (id, name) or None
+        self.on_change = on_change
+        self.box = None
+        self.marked = None
+
+        self.win = tb.Toplevel(title="Sample Storage")
+        self.win.geometry("1100x600")
+        self.win.transient(root)
+
+        bar = tb.Frame(self.win, padding=(10, 10, 10, 0)); bar.pack(fill=X)
+        tb.Button(bar, text="+ Site", bootstyle=(SUCCESS, OUTLINE), command=lambda: self.add(None)).pack(side=LEFT, padx=3)
+        tb.Button(bar, text="+ Inside Selected", bootstyle=(SUCCESS, OUTLINE),
+                  command=lambda: self.add(self.selected_unit())).pack(side=LEFT, padx=3)
+        tb.Button(bar, text="Remove", bootstyle=(DANGER, OUTLINE), command=self.remove).pack(side=LEFT, padx=3)
+        tb.Button(bar, text="Store Selected Sample", bootstyle=PRIMARY, command=self.store_selected).pack(side=LEFT, padx=10)
+        tb.Button(bar, text="✂ Mark", bootstyle=(WARNING, OUTLINE), command=self.mark).pack(side=LEFT, padx=3)
+        tb.Button(bar, text="Move Marked Unit Here", bootstyle=(WARNING, OUTLINE),
+                  command=self.move_marked_unit).pack(side=LEFT, padx=3)
+        tb.Button(bar, text="Move Marked Box's Samples Here", bootstyle=(WARNING, OUTLINE),
+                  command=self.move_marked_samples).pack(side=LEFT, padx=3)
+
+        body = tb.Frame(self.win, padding=10); body.pack(fill=BOTH, expand=True)
+        self.tree = tb.Treeview(body, show="tree", bootstyle=INFO)
+        self.tree.column("#0", width=320)
+        self.tree.pack(side=LEFT, fill=Y)
+        self.tree.bind("<<TreeviewOpen>>", lambda e: self.load_children(self.tree.focus()))
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self.show_box())
+        self.grid_f = tb.LabelFrame(body, text="Box", padding=10)
+        self.grid_f.pack(side=LEFT, fill=BOTH, expand=True, padx=(10, 0))
+        self.status = tb.Label(self.win, text="", padding=(10, 0, 10, 10))
+        self.status.pack(fill=X)
+
+        self.load_children("")
+
+    # --- Tree ---
+
+    def _label(self, kind, name, rows, cols, used):
+        return f"{name}  ({used}/{rows * cols})" if kind == "box" else f"{name}  [{kind}]"
+
+    def load_children(self, iid):
+        """Fills one tree level on demand; units other than boxes get a placeholder so they can be opened."""
+        self.tree.delete(*self.tree.get_children(iid))
+        for unit_id, kind, name, rows, cols, used in children(self.db, int(iid) if iid else None):
+            node = self.tree.insert(iid, END, iid=str(unit_id), text=self._label(kind, name, rows, cols, used))
+            if kind != "box":
+                self.tree.insert(node, END, text="…")
+
+    def reload_node(self, unit_id):
+        """Refreshes a unit's label (e.g. box occupancy) and, if opened, its children."""
+        unit = get_unit(self.db, unit_id)
+        iid = str(unit_id)
+        if unit and self.tree.exists(iid):
+            self.tree.item(iid, text=self._label(unit["kind"], unit["name"], unit["rows"] or 0, unit["cols"] or 0,
+                                                 unit["used"]))
+            if self.tree.item(iid, "open"):
+                self.load_children(iid)
+
+    def selected_unit(self):
+        sel = self.tree.focus()
+        return int(sel) if sel and sel.isdigit() else None
+
+    # --- Box grid ---
+
+    def show_box(self):
+        for w in self.grid_f.winfo_children():
+            w.destroy()
+        unit = get_unit(self.db, self.selected_unit()) if self.selected_unit() else None
+        if not unit or unit["kind"] != "box":
+            self.box = None
+            self.grid_f.config(text="Box")
+            return
+        self.box = unit
+        self.grid_f.config(text=f"{unit_path(self.db, unit['id'])}  -  {unit['used']}/{unit['rows'] * unit['cols']} used")
+        names = {pos: (sid, name) for pos, sid, name in box_contents(self.db, unit["id"])}
+        bits = occupied(unit["occupancy"])
+        for pos in range(unit["rows"] * unit["cols"]):
+            r, c = divmod(pos, unit["cols"])
+            filled = bits >> pos & 1
+            cell = tb.Button(self.grid_f, text=position_label(pos, unit["cols"]), width=4,
+                             bootstyle=INFO if filled else (SECONDARY, OUTLINE),
+                             command=lambda p=pos: self.on_cell(p, names.get(p)))
+            cell.grid(row=r, column=c, padx=1, pady=1)
+
+    def on_cell(self, pos, sample):
+        label = position_label(pos, self.box["cols"])
+        if sample:
+            self.status.config(text=f"{label}: sample {sample[0]} - {sample[1]}")
+            return
+        chosen = self.selected_sample()
+        if not chosen:
+            self.status.config(text=f"{label} is free. Select a sample in the main window to store it here.")
+            return
+        if messagebox.askyesno("Store Sample", f"Store '{chosen[1]}' in {label}?", parent=self.win):
+            self._move([chosen[0]], self.box["id"], [pos])
+
+    # --- Actions ---
+
+    def add(self, parent_id):
+        parent = get_unit(self.db, parent_id) if parent_id else None
+        if parent_id and not parent:
+            return
+        level = KINDS.index(parent["kind"]) + 1 if parent else 0
+        if level >= len(KINDS):
+            messagebox.showinfo("Storage", "Boxes hold samples, not other units.", parent=self.win)
+            return
+        kind = KINDS[level]
+        name = simpledialog.askstring("New Storage Unit", f"Name of the new {kind}:", parent=self.win)
+        if not name:
+            return
+        rows = cols = None
+        if kind == "box":
+            size = simpledialog.askstring("Box Size", "Rows x columns:", initialvalue="9x9", parent=self.win)
+            m = re.fullmatch(r"\s*(\d+)\s*[x×*]\s*(\d+)\s*", size or "")
+            if not m:
+                return
+            rows, cols = int(m.group(1)), int(m.group(2))
+        try:
+            add_unit(self.db, kind, name, parent_id, rows, cols)
+        except StorageError as e:
+            messagebox.showerror("Storage", str(e), parent=self.win)
+            return
+        if parent_id:
+            self.tree.item(str(parent_id), open=True)
+            self.load_children(str(parent_id))
+        else:
+            self.load_children("")
+
+    def remove(self):
+        unit_id = self.selected_unit()
+        if not unit_id or not messagebox.askyesno("Remove", "Remove this storage unit?", parent=self.win):
+            return
+        parent = get_unit(self.db, unit_id)["parent_id"]
+        try:
+            remove_unit(self.db, unit_id)
+        except StorageError as e:
+            messagebox.showerror("Storage", str(e), parent=self.win)
+            return
+        self.load_children(str(parent) if parent else "")
+        self.show_box()
+
+    def store_selected(self):
+        chosen, unit_id = self.selected_sample(), self.selected_unit()
+        if not chosen or not unit_id:
+            self.status.config(text="Select a sample in the main window and a unit here.")
+            return
+        self._move([chosen[0]], unit_id)
+
+    def mark(self):
+        self.marked = self.selected_unit()
+        if self.marked:
+            self.status.config(text=f"Marked: {unit_path(self.db, self.marked)}")
+
+    def move_marked_unit(self):
+        dest = self.selected_unit()
+        if not self.marked or not dest:
+            return
+        old_parent = get_unit(self.db, self.marked)["parent_id"]
+        try:
+            move_unit(self.db, self.marked, dest)
+        except StorageError as e:
+            messagebox.showerror("Storage", str(e), parent=self.win)
+            return
+        logger.info(f"Storage unit {self.marked} moved into {dest}")
+        for unit_id in (old_parent, dest):
+            if unit_id:
+                self.reload_node(unit_id)
+
+    def move_marked_samples(self):
+        dest = self.selected_unit()
+        marked = get_unit(self.db, self.marked) if self.marked else None
+        if not marked or marked["kind"] != "box" or not dest:
+            self.status.config(text="Mark a box first, then select where its samples should go.")
+            return
+        samples = [sid for _, sid, _ in box_contents(self.db, marked["id"])]
+        if samples and messagebox.askyesno("Move Samples", f"Move {len(samples)} sample(s) from {marked['name']} "
+                                                           f"to {unit_path(self.db, dest)}?", parent=self.win):
+            self._move(samples, dest, refresh=(marked["id"],))
+
+    def _move(self, sample_ids, unit_id, positions=None, refresh=()):
+        try:
+            placements = move_samples(self.db, sample_ids, unit_id, positions)
+        except StorageError as e:
+            messagebox.showerror("Storage", str(e), parent=self.win)
+            return
+        self.status.config(text=f"Stored {len(placements)} sample(s).")
+        for box_id in {b for _, b, _ in placements} | set(refresh):
+            self.reload_node(box_id)
+        self.show_box()
+        if self.on_change:
+            self.on_change(sample_ids)
@@ -0,0 +1,9 @@
+"""
+Performance benchmarks, run as modules from the repository root:
+
+    python -m benchmarks.bench_suite      # DB and UI hot paths on generated data -> JSON
+    python -m benchmarks.compare OLD NEW  # regressions between two result files
+    python -m benchmarks.datagen          # build a synthetic inventory database
+    python -m benchmarks.bench_connections
+    python -m benchmarks.bench_startup
+"""
@@ -0,0 +1,107 @@
+"""
+Compares the old connect-per-call database access with the pooled Database.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_connections --rows 10000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from app.database import Database
+from app import quantities, formulas
+
+
+def _legacy_connect(db_name):
+    conn = sqlite3.connect(db_name)
+    # The inventory triggers call these SQL functions
+    quantities.register_functions(conn)
+    formulas.register_functions(conn)
+    return conn
+
+
+def legacy_query(db_name, sql, params=()):
+    """The previous Database.query: a brand new connection on every call."""
+    with _legacy_connect(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def legacy_execute(db_name, sql, params=()):
+    """The previous Database.execute: connect, execute, commit."""
+    with _legacy_connect(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        conn.commit()
+        return True
+
+
+def populate(db, rows):
+    """Fills the chemicals table with simple synthetic rows."""
+    rng = random.Random(42)
+    classes = ["Solvent", "Acid", "Base", "Salt", "Oxidizer", "Buffer"]
+    batch = []
+    with db.transaction() as conn:
+        for i in range(rows):
+            batch.append((f"Reagent {i}", f"Syn {i}", rng.choice(classes), "C2H6O/46.07",
+                          f"{rng.randint(1, 1000)} mL", "GHS02", f"20{rng.randint(20, 35)}-01-01"))
+            if len(batch) == 10000:
+                conn.executemany("INSERT INTO chemicals (name, synonyms, class, mol_info, quantity, ghs, expiry) "
+                                 "VALUES (?,?,?,?,?,?,?)", batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO chemicals (name, synonyms, class, mol_info, quantity, ghs, expiry) "
+                             "VALUES (?,?,?,?,?,?,?)", batch)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(rows, lookups, writes):
+    tmp = tempfile.mkdtemp(prefix="biolab-bench-")
+    path = os.path.join(tmp, "bench.db")
+    db = Database(path)
+    populate(db, rows)
+    ids = [random.Random(i).randint(1, rows) for i in range(lookups)]
+
+    point = "SELECT id, name, synonyms, class, mol_info, quantity, ghs, expiry FROM chemicals WHERE id=?"
+    page = "SELECT id, name, synonyms, class, mol_info, quantity, ghs, expiry FROM chemicals WHERE id > ? ORDER BY id LIMIT 50"
+    update = "UPDATE chemicals SET quantity=? WHERE id=?"
+
+    results = {
+        "point lookup": (timed(lambda i: legacy_query(path, point, (ids[i],)), lookups),
+                         timed(lambda i: db.query(point, (ids[i],)), lookups)),
+        "page of 50": (timed(lambda i: legacy_query(path, page, (ids[i],)), lookups),
+                       timed(lambda i: db.query(page, (ids[i],)), lookups)),
+        "single-row update": (timed(lambda i: legacy_execute(path, update, ("1 L", ids[i])), writes),
+                              timed(lambda i: db.execute(update, ("1 L", ids[i])), writes)),
+    }
+    db.close()
+
+    print(f"\n{rows:,} rows ({lookups} lookups, {writes} writes) - ms per call")
+    print(f"{'Operation':<20} {'connect/call':>14} {'pooled':>10} {'speedup':>9}")
+    print("-" * 56)
+    for op, (old, new) in results.items():
+        print(f"{op:<20} {old:>14.3f} {new:>10.3f} {old / new:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--writes", type=int, default=300)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.lookups, args.writes)
+
+
+if __name__ == "__main__":
+    main()
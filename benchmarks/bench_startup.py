@@ -0,0 +1,89 @@
+"""
+Measures cold start-up time of the command-line and GUI entry points against
+a budget, and checks that the CLI never imports Tk or ReportLab.
+
+Each case runs in a fresh interpreter; the median of --repeat runs is reported.
+The GUI case imports everything needed to show the login window (no display is
+required). Exits with status 1 when a budget is exceeded.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median wall-clock budgets in milliseconds, including interpreter start-up.
+BUDGETS_MS = {
+    "python (baseline)": None,
+    "biolab --help": 150,
+    "biolab users list": 200,
+    "GUI login imports": 400,
+    "GUI + inventory modules": 500,
+}
+
+GUI_MODULES = ("tkinter", "ttkbootstrap", "reportlab", "PIL")
+
+
+def cases(db_path):
+    return {
+        "python (baseline)": [sys.executable, "-c", "pass"],
+        "biolab --help": [sys.executable, "-m", "app", "--help"],
+        "biolab users list": [sys.executable, "-m", "app", "--db", db_path, "users", "list"],
+        "GUI login imports": [sys.executable, "-c", "import main"],
+        "GUI + inventory modules": [sys.executable, "-c", "import main, app.ui_chemical, app.ui_biological"],
+    }
+
+
+def time_command(cmd, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def cli_gui_imports():
+    """GUI modules loaded by a full CLI run (should be none)."""
+    code = ("import sys, app.cli; "
+            f"print(','.join(m for m in {GUI_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="biolab-bench-")
+    db_path = os.path.join(tmp, "bench.db")
+    # Create the schema once so the timed runs measure start-up, not migration.
+    subprocess.run([sys.executable, "-m", "app", "--db", db_path, "users", "list"], cwd=ROOT,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    failed = False
+    print(f"{'Entry point':<26} {'median ms':>10} {'budget':>8}")
+    print("-" * 46)
+    for name, cmd in cases(db_path).items():
+        ms = time_command(cmd, args.repeat)
+        budget = BUDGETS_MS[name]
+        verdict = "" if budget is None else ("ok" if ms <= budget else "OVER")
+        failed |= verdict == "OVER"
+        print(f"{name:<26} {ms:>10.1f} {budget or '-':>8}  {verdict}")
+
+    loaded = cli_gui_imports()
+    print(f"\nGUI modules imported by the CLI: {', '.join(loaded) or 'none'}")
+    failed |= bool(loaded)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Times the database and UI hot paths on generated inventories and writes the
+results as JSON, tagged with the git commit, for benchmarks.compare.
+
+Database cases run the same calls the inventory screens make (build_filter +
+VirtualGrid.first_page for perform_search/refresh, keyset paging, exports).
+UI cases (update_tree, refresh, scrolling, row edits) need Tk; on a machine
+without a display run the suite under Xvfb (xvfb-run python -m ...) or they
+are recorded as skipped.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_suite --sizes 1k 100k
+    python -m benchmarks.bench_suite --sizes 1m --repeat 3 --out results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from app.database import Database
+from app.expiry import STATUS_SQL
+from app.export import export_rows, write_pdf
+from app.grid import VirtualGrid
+from app.search import build_filter
+
+from .datagen import SIZES, cached_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Displayed grid columns, as in ui_chemical / ui_biological.
+GRID_COLUMNS = {
+    "chemicals": ("id", "name", "synonyms", "class", "mol_info", "quantity", "ghs", "expiry"),
+    "biological": ("id", "name", "type", "organism", "medium", "container", "qty", "bsl", "expiry"),
+}
+
+# Filter-box contents typed by users; values come from the generator's vocabulary.
+SEARCHES = {
+    "chemicals": {
+        "name prefix": {"name": "sod"},
+        "name two words": {"name": "sodium chl"},
+        "synonym": {"name": "dmso"},
+        "class": {"class": "solvent"},
+        "ghs": {"ghs": "GHS06"},
+        "expiry year": {"expiry": "2026"},
+        "combined": {"name": "acid", "ghs": "GHS05", "expiry": "2024..2027"},
+        "no match": {"name": "zzzz"},
+    },
+    "biological": {
+        "name prefix": {"name": "coli"},
+        "organism": {"organism": "homo sapiens"},
+        "bsl (LIKE)": {"bsl": "BSL-2"},
+        "expiry month": {"expiry": "2027-03"},
+        "combined": {"type": "cell", "medium": "dmem", "expiry": "2020..2030"},
+    },
+}
+
+
+class NullTree:
+    """Just enough of a Treeview for VirtualGrid's SQL-only methods."""
+    def __init__(self, headings):
+        self._columns = headings
+
+    def __getitem__(self, key):
+        return self._columns
+
+    def heading(self, *args, **kwargs):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+
+def measure(fn, repeat, warmup=1):
+    """Runs fn warmup + repeat times; returns timing stats in ms (and the row count, when known)."""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    stats = {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(samples[0], 3),
+        "max_ms": round(samples[-1], 3),
+        "runs": repeat,
+    }
+    if isinstance(result, int) and not isinstance(result, bool):
+        stats["rows"] = result  # exports return the row count
+    elif isinstance(result, tuple) and len(result) == 3:
+        stats["rows"] = len(result[2])  # first_page returns (where, params, rows)
+    return stats
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def make_grid(tree, db, table, page_size=200):
+    return VirtualGrid(tree, db, table, GRID_COLUMNS[table], extra_columns=(f"{STATUS_SQL} AS status",),
+                       page_size=page_size)
+
+
+# --- Database cases ---
+
+def db_cases(db, path, table, args):
+    grid = make_grid(NullTree([c.title() for c in GRID_COLUMNS[table]]), db, table)
+    results = {}
+
+    def search(filters):
+        where, params = build_filter(table, filters, fts=db.fts_enabled)
+        return grid.first_page(where, params)
+
+    for label, filters in SEARCHES[table].items():
+        results[f"perform_search: {label}"] = measure(lambda f=filters: search(f), args.repeat)
+    results["refresh: first page"] = measure(grid.first_page, args.repeat)
+
+    for col in ("name", "expiry"):
+        grid.sort_col = col
+        first = grid._page("1", [])
+        key = grid._key(first[-1])
+        results[f"sort by {col}: next page"] = measure(lambda: grid._page("1", [], key), args.repeat)
+    grid.sort_col = "id"
+
+    tmp = tempfile.mkdtemp(prefix="biolab-bench-")
+    out = os.path.join(tmp, f"{table}.csv")
+    results["export_data: csv"] = measure(lambda: export_rows(path, table, out), args.export_repeat, warmup=0)
+    out = os.path.join(tmp, f"{table}.jsonl.gz")
+    results["export_data: jsonl.gz"] = measure(lambda: export_rows(path, table, out), args.export_repeat, warmup=0)
+
+    if args.pdf_rows:
+        sql, params = grid.current_query()
+        sql += f" LIMIT {int(args.pdf_rows)}"
+        headers = [c.title() for c in GRID_COLUMNS[table]]
+        pdf = os.path.join(tmp, f"{table}.pdf")
+        rows = min(args.pdf_rows, db.query(f"SELECT COUNT(*) FROM {table}")[0][0])
+        results["export_to_pdf"] = measure(lambda: write_pdf(path, pdf, "Benchmark", headers, sql, params) and rows,
+                                           args.export_repeat, warmup=0)
+    return results
+
+
+# --- UI cases ---
+
+def open_tk():
+    """A hidden Tk root, or None when no display is available."""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+        root.withdraw()
+        return root, ttk
+    except Exception as e:
+        print(f"  Tk unavailable ({e}); UI cases skipped. Run under xvfb-run to include them.")
+        return None, None
+
+
+def ui_cases(db, table, root, ttk, args):
+    headings = [c.title() for c in GRID_COLUMNS[table]]
+    tree = ttk.Treeview(root, columns=headings, show="headings")
+    grid = make_grid(tree, db, table)
+    grid.tags_for = lambda r: (r[-1],) if r[-1] else ()
+    results = {}
+
+    page = grid.first_page(*build_filter(table, SEARCHES[table]["name prefix"], fts=db.fts_enabled))
+    results["update_tree: first page"] = measure(lambda: (grid.show(*page), root.update_idletasks()), args.repeat)
+    results["refresh: reload + render"] = measure(lambda: (grid.show(*grid.first_page()), root.update_idletasks()),
+                                                 args.repeat)
+
+    def scroll():
+        grid.show(*grid.first_page())
+        for _ in range(5):
+            grid._fetch_after()
+        root.update_idletasks()
+    results["scroll: 5 pages"] = measure(scroll, args.repeat)
+
+    grid.show(*grid.first_page())
+    row_id = int(tree.get_children()[10])
+    col = "quantity" if table == "chemicals" else "qty"
+    results["apply_change: update"] = measure(
+        lambda: (db.execute(f"UPDATE {table} SET {col}={col} WHERE id=?", (row_id,)),
+                 grid.apply_change("update", row_id)), args.repeat)
+    tree.destroy()
+    return results
+
+
+# --- Runner ---
+
+def run(args):
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "query_cache": args.query_cache,
+        "results": {},
+    }
+    root = ttk = None
+    if not args.no_ui:
+        root, ttk = open_tk()
+    report["ui"] = root is not None
+
+    for size in args.sizes:
+        n = SIZES[size]
+        source = cached_database(n, args.seed)
+        # Work on a copy: the UI cases write to the database.
+        tmp = tempfile.mkdtemp(prefix="biolab-bench-")
+        path = os.path.join(tmp, "bench.db")
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        db = Database(path, query_cache_size=256 if args.query_cache else 0)
+
+        for table in SEARCHES:
+            print(f"{size} {table}")
+            cases = db_cases(db, path, table, args)
+            if root is not None:
+                cases.update(ui_cases(db, table, root, ttk, args))
+            for name, stats in cases.items():
+                report["results"][f"{size}/{table}/{name}"] = stats
+                print(f"  {name:<32} {stats['median_ms']:>10.2f} ms")
+        db.close()
+
+    if root is not None:
+        root.destroy()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["1k", "100k"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--export-repeat", type=int, default=1)
+    parser.add_argument("--pdf-rows", type=int, default=10_000, help="cap on rows per PDF export (0 to skip)")
+    parser.add_argument("--query-cache", action="store_true", help="enable Database's query cache")
+    parser.add_argument("--no-ui", action="store_true", help="skip the Tk cases")
+    parser.add_argument("--out", help="JSON file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = (report["commit"] or "unknown")[:12] + ("-dirty" if report["dirty"] else "")
+        out = os.path.join(RESULTS_DIR, f"{name}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Compares two bench_suite result files and flags regressions.
+
+A case regresses when its median time grows by more than --threshold percent
+and by at least --min-ms (to ignore noise on sub-millisecond cases). Exits
+with status 1 when any case regressed.
+
+Usage (from the repository root):
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold=20.0, min_ms=0.5):
+    """Yields (case, old_ms, new_ms, change %, verdict) for every case present in both runs."""
+    for case in sorted(set(old["results"]) & set(new["results"])):
+        a, b = old["results"][case]["median_ms"], new["results"][case]["median_ms"]
+        change = (b - a) / a * 100 if a else 0.0
+        if change > threshold and b - a >= min_ms:
+            verdict = "REGRESSED"
+        elif change < -threshold and a - b >= min_ms:
+            verdict = "improved"
+        else:
+            verdict = ""
+        yield case, a, b, change, verdict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=20.0, help="percent slowdown allowed (default: 20)")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore changes smaller than this")
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    print(f"old: {(old['commit'] or '?')[:12]} ({old['timestamp']})   new: {(new['commit'] or '?')[:12]} "
+          f"({new['timestamp']})")
+    if old.get("platform") != new.get("platform"):
+        print("warning: results come from different platforms")
+
+    rows = list(compare(old, new, args.threshold, args.min_ms))
+    width = max((len(r[0]) for r in rows), default=10)
+    print(f"{'Case':<{width}} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    print("-" * (width + 32))
+    for case, a, b, change, verdict in rows:
+        print(f"{case:<{width}} {a:>10.2f} {b:>10.2f} {change:>+7.1f}%  {verdict}")
+
+    for label, cases in (("only in old", set(old["results"]) - set(new["results"])),
+                         ("only in new", set(new["results"]) - set(old["results"]))):
+        if cases:
+            print(f"\n{label}: {', '.join(sorted(cases))}")
+
+    regressed = [r[0] for r in rows if r[4] == "REGRESSED"]
+    print(f"\n{len(regressed)} regression(s) over {args.threshold:g}%")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
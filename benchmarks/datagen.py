@@ -0,0 +1,173 @@
+"""
+Seeded generator of realistic chemicals and biological inventory rows.
+
+The same (size, seed) always produces the same rows, so benchmark databases can
+be rebuilt identically on any machine. Built databases are kept in
+benchmarks/.data and reused by later runs.
+
+Usage (from the repository root):
+    python -m benchmarks.datagen --rows 100000 --out /tmp/inventory.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from app.database import Database
+from app.importer import TABLE_COLUMNS
+from app.triggers import bulk_insert
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# name, synonyms, class, formula / molecular weight, GHS pictograms
+CHEMICALS = [
+    ("Acetone", "Propanone; Dimethyl ketone", "Solvent", "C3H6O / 58.08", "GHS02, GHS07"),
+    ("Ethanol", "Ethyl alcohol; EtOH", "Solvent", "C2H6O / 46.07", "GHS02, GHS07"),
+    ("Methanol", "Methyl alcohol; MeOH", "Solvent", "CH4O / 32.04", "GHS02, GHS06, GHS08"),
+    ("Acetonitrile", "Methyl cyanide; MeCN", "Solvent", "C2H3N / 41.05", "GHS02, GHS07"),
+    ("Chloroform", "Trichloromethane", "Solvent", "CHCl3 / 119.38", "GHS06, GHS08"),
+    ("Dimethyl sulfoxide", "DMSO", "Solvent", "C2H6OS / 78.13", ""),
+    ("Hydrochloric acid", "Muriatic acid; HCl", "Acid", "HCl / 36.46", "GHS05, GHS07"),
+    ("Sulfuric acid", "Oil of vitriol; H2SO4", "Acid", "H2SO4 / 98.08", "GHS05"),
+    ("Nitric acid", "Aqua fortis; HNO3", "Acid", "HNO3 / 63.01", "GHS03, GHS05"),
+    ("Acetic acid", "Ethanoic acid; Glacial acetic acid", "Acid", "C2H4O2 / 60.05", "GHS02, GHS05"),
+    ("Sodium hydroxide", "Caustic soda; Lye", "Base", "NaOH / 40.00", "GHS05"),
+    ("Potassium hydroxide", "Caustic potash", "Base", "KOH / 56.11", "GHS05, GHS07"),
+    ("Ammonium hydroxide", "Aqueous ammonia", "Base", "NH4OH / 35.05", "GHS05, GHS07, GHS09"),
+    ("Sodium chloride", "Table salt; Halite", "Salt", "NaCl / 58.44", ""),
+    ("Potassium chloride", "Sylvite", "Salt", "KCl / 74.55", ""),
+    ("Magnesium sulfate", "Epsom salt", "Salt", "MgSO4 / 120.37", ""),
+    ("Sodium azide", "Azium", "Toxic", "NaN3 / 65.01", "GHS06, GHS08, GHS09"),
+    ("Potassium cyanide", "Cyanide of potassium", "Toxic", "KCN / 65.12", "GHS05, GHS06, GHS08, GHS09"),
+    ("Hydrogen peroxide", "Perhydrol; H2O2", "Oxidizer", "H2O2 / 34.01", "GHS03, GHS05, GHS07"),
+    ("Potassium permanganate", "Chameleon mineral", "Oxidizer", "KMnO4 / 158.03", "GHS03, GHS07, GHS09"),
+    ("Tris base", "Trometamol; THAM", "Buffer", "C4H11NO3 / 121.14", "GHS07"),
+    ("HEPES", "4-(2-Hydroxyethyl)piperazine-1-ethanesulfonic acid", "Buffer", "C8H18N2O4S / 238.30", ""),
+    ("Sodium phosphate dibasic", "Disodium phosphate", "Buffer", "Na2HPO4 / 141.96", ""),
+    ("Ethidium bromide", "EtBr; Homidium bromide", "Stain", "C21H20BrN3 / 394.31", "GHS06, GHS08"),
+    ("Coomassie Brilliant Blue", "Brilliant blue R-250", "Stain", "C45H44N3NaO7S2 / 825.97", ""),
+    ("Formaldehyde", "Methanal; Formalin", "Fixative", "CH2O / 30.03", "GHS05, GHS06, GHS08"),
+    ("Glutaraldehyde", "Pentanedial", "Fixative", "C5H8O2 / 100.12", "GHS05, GHS06, GHS08, GHS09"),
+    ("Sodium dodecyl sulfate", "SDS; Sodium lauryl sulfate", "Detergent", "C12H25NaO4S / 288.38", "GHS02, GHS05, GHS07"),
+    ("Triton X-100", "Octoxynol-9", "Detergent", "C14H22O(C2H4O)n / ~625", "GHS05, GHS07, GHS09"),
+    ("Glucose", "Dextrose; D-Glucose", "Reagent", "C6H12O6 / 180.16", ""),
+]
+GRADES = ["", "ACS reagent", "HPLC grade", "anhydrous", "99.8%", "1 M solution", "0.1 M solution", "BioReagent"]
+CHEM_UNITS = [("mL", (50, 100, 250, 500, 1000, 2500)), ("g", (5, 10, 25, 100, 500, 1000)), ("L", (1, 2, 4))]
+
+# name, organism, typical media
+BIOLOGICALS = [
+    ("E. coli DH5α", "Escherichia coli", "Bacteria", ("LB + 15% glycerol", "LB broth")),
+    ("E. coli BL21(DE3)", "Escherichia coli", "Bacteria", ("LB + 15% glycerol", "TB medium")),
+    ("S. aureus ATCC 25923", "Staphylococcus aureus", "Bacteria", ("TSB + 20% glycerol",)),
+    ("B. subtilis 168", "Bacillus subtilis", "Bacteria", ("LB + 15% glycerol",)),
+    ("S. cerevisiae BY4741", "Saccharomyces cerevisiae", "Yeast", ("YPD + 25% glycerol",)),
+    ("HeLa", "Homo sapiens", "Cell line", ("DMEM + 10% DMSO", "FBS + 10% DMSO")),
+    ("HEK293T", "Homo sapiens", "Cell line", ("DMEM + 10% DMSO",)),
+    ("CHO-K1", "Cricetulus griseus", "Cell line", ("F-12K + 10% DMSO",)),
+    ("Jurkat", "Homo sapiens", "Cell line", ("RPMI 1640 + 10% DMSO",)),
+    ("pUC19 plasmid", "Escherichia coli", "Plasmid", ("TE buffer", "Nuclease-free water")),
+    ("pET-28a(+) plasmid", "Escherichia coli", "Plasmid", ("TE buffer",)),
+    ("Lentivirus pLKO.1", "Homo sapiens", "Virus", ("PBS", "DMEM")),
+    ("AAV2-GFP", "Adeno-associated virus", "Virus", ("PBS + 5% glycerol",)),
+    ("Mouse liver tissue", "Mus musculus", "Tissue", ("RNAlater", "OCT compound")),
+    ("Human serum", "Homo sapiens", "Serum", ("None",)),
+    ("Fetal bovine serum", "Bos taurus", "Serum", ("None",)),
+    ("Arabidopsis seeds Col-0", "Arabidopsis thaliana", "Seeds", ("Dry",)),
+]
+CONTAINERS = ["Cryovial 2 mL", "Eppendorf 1.5 mL", "Falcon 15 mL", "Falcon 50 mL", "96-well plate", "Petri dish"]
+BSL = {"Bacteria": ("BSL-1", "BSL-2"), "Yeast": ("BSL-1",), "Cell line": ("BSL-1", "BSL-2"),
+       "Plasmid": ("BSL-1",), "Virus": ("BSL-2", "BSL-3"), "Tissue": ("BSL-2",), "Serum": ("BSL-2",),
+       "Seeds": ("BSL-1",)}
+
+EXPIRY_START = date(2018, 1, 1)
+EXPIRY_SPAN_DAYS = 15 * 365
+
+
+def _expiry(rng):
+    # About 5% of items have no expiry date.
+    if rng.random() < 0.05:
+        return ""
+    return (EXPIRY_START + timedelta(days=rng.randrange(EXPIRY_SPAN_DAYS))).isoformat()
+
+
+def chemical_rows(n, seed=42):
+    """Yields n chemicals rows in importer.TABLE_COLUMNS order."""
+    rng = random.Random(f"chemicals-{seed}")
+    for i in range(n):
+        name, synonyms, cls, mol, ghs = rng.choice(CHEMICALS)
+        grade = rng.choice(GRADES)
+        unit, amounts = rng.choice(CHEM_UNITS)
+        yield (f"{name}, {grade}" if grade else name, synonyms, cls, mol,
+               f"{rng.choice(amounts)} {unit}", ghs, _expiry(rng))
+
+
+def biological_rows(n, seed=42):
+    """Yields n biological rows in importer.TABLE_COLUMNS order."""
+    rng = random.Random(f"biological-{seed}")
+    for i in range(n):
+        name, organism, kind, media = rng.choice(BIOLOGICALS)
+        yield (f"{name} #{rng.randint(1, 9999):04d}", kind, organism, rng.choice(media), rng.choice(CONTAINERS),
+               f"{rng.choice((0.5, 1, 1.5, 2, 5, 10))} mL", rng.choice(BSL[kind]), _expiry(rng))
+
+
+GENERATORS = {"chemicals": chemical_rows, "biological": biological_rows}
+
+
+def populate(db, table, n, seed=42, batch_size=50_000):
+    """Inserts n generated rows into table with executemany, one transaction per batch."""
+    columns = TABLE_COLUMNS[table]
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows = GENERATORS[table](n, seed)
+    while True:
+        batch = [r for _, r in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        with db.transaction() as conn, bulk_insert(conn, table):
+            conn.executemany(sql, batch)
+
+
+def build_database(path, n, seed=42):
+    """Creates a database at path with n rows in each inventory table."""
+    db = Database(path)
+    for table in GENERATORS:
+        populate(db, table, n, seed)
+    with db.transaction() as conn:
+        conn.execute("ANALYZE")
+    db.close()
+    return path
+
+
+def cached_database(n, seed=42, data_dir=DATA_DIR):
+    """Path of a generated database of n rows per table, built on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"inventory-{n}-seed{seed}.db")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        tmp = path + ".building"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp + suffix):
+                os.remove(tmp + suffix)
+        build_database(tmp, n, seed)
+        os.replace(tmp, path)
+        print(f"Built {path} ({n:,} rows per table) in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows per inventory table")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True, help="database file to create")
+    args = parser.parse_args()
+    if os.path.exists(args.out):
+        parser.error(f"{args.out} already exists")
+    start = time.perf_counter()
+    build_database(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows:,} rows per table to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,48 @@
-import ttkbootstrap as tb
-from ttkbootstrap.constants import * # Defines INFO, OUTLINE, etc.
 import logging
 import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Command-line use (python main.py search ...): dispatch before any GUI module is imported.
+    from app.cli import main as cli_main
+    sys.exit(cli_main())
+
+import ttkbootstrap as tb
+from ttkbootstrap.constants import * # Defines INFO, OUTLINE, etc.
+from app import configure_logging
 from app.database import Database
 from app.auth import AuthManager
-from app.ui_chemical import ChemicalUI
-from app.ui_biological import BiologicalUI
-
-# Professional Logging Setup
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler("biolab.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from app.summary import inventory_kpis, SUMMARY_DIMENSIONS
+from app.alerts import ExpiryWatcher
+from app.backup import BackupService
+
 logger = logging.getLogger("BioLabMain")
 
 class BioLabController:
     """Orchestrates the application flow between Login, Hub, and Inventories."""
     def __init__(self):
         logger.info("BioLab System starting up...")
-        self.db = Database()
+        # Grids re-run the same page queries on refresh and while typing;
+        # query statistics are summarized in biolab.log every 10 minutes.
+        self.db = Database(query_cache_size=256, stats_interval_s=600)
         self.auth = AuthManager(self.db)
-        self.show_login()
+        self.root = None        # Window currently shown; alerts are posted to it.
+        self.watcher = None
+        self.backups = None
+        try:
+            self.show_login()
+        finally:
+            # Every window has closed by the time the nested mainloops return.
+            if self.watcher:
+                self.watcher.stop()
+            if self.backups:
+                self.backups.stop()
+            self.db.close()
 
     def show_login(self):
         """Initial login interface."""
         self.login_root = tb.Window(themename="flatly", title="BIOLAB Security Login")
         self.login_root.geometry("400x450")
+        self.root = self.login_root
         f = tb.Frame(self.login_root, padding=30); f.pack(expand=True, fill='both')
         
         tb.Label(f, text="BIOLAB LOGIN", font=("Helvetica", 18, "bold")).pack(pady=20)
@@ -56,6 +69,9 @@ class BioLabController:
     def attempt(self, user, pw):
         """Attempts to log in and transitions to Selection Hub."""
         if self.auth.login(user, pw):
+            self.watcher = ExpiryWatcher(self.db, on_alert=self.on_alerts).start()
+            # Daily online snapshot into backups/ while the application runs.
+            self.backups = BackupService(self.db.db_name).start()
             self.login_root.destroy()
             self.start_selection_hub()
         else:
@@ -65,28 +81,91 @@ class BioLabController:
     def start_selection_hub(self):
         """Allows user to choose between Chemical or Biological inventories."""
         self.hub = tb.Window(themename="flatly", title="BIOLAB Module Selection")
-        self.hub.geometry("500x350")
-        f = tb.Frame(self.hub, padding=40); f.pack(expand=True)
+        self.hub.geometry("820x560")
+        self.root = self.hub
+        f = tb.Frame(self.hub, padding=30); f.pack(expand=True, fill='both')
         
-        tb.Label(f, text="SELECT INVENTORY MODULE", font=("Helvetica", 14, "bold")).pack(pady=20)
-        tb.Button(f, text="Chemical Inventory", width=30, bootstyle=INFO, 
-                  command=lambda: self.launch("Chemical")).pack(pady=10)
-        tb.Button(f, text="Biological Inventory", width=30, bootstyle=SUCCESS, 
-                  command=lambda: self.launch("Biological")).pack(pady=10)
+        tb.Label(f, text="SELECT INVENTORY MODULE", font=("Helvetica", 14, "bold")).pack(pady=10)
+        btns = tb.Frame(f); btns.pack(pady=5)
+        tb.Button(btns, text="Chemical Inventory", width=30, bootstyle=INFO, 
+                  command=lambda: self.launch("Chemical")).pack(side=LEFT, padx=10)
+        tb.Button(btns, text="Biological Inventory", width=30, bootstyle=SUCCESS, 
+                  command=lambda: self.launch("Biological")).pack(side=LEFT, padx=10)
+
+        # --- Live KPIs (read from the trigger-maintained summary tables) ---
+        kpi_f = tb.Frame(f); kpi_f.pack(fill='both', expand=True, pady=(20, 0))
+        self.kpi_labels = {}
+        for col, (table, title) in enumerate((("chemicals", "Chemicals"), ("biological", "Biological Samples"))):
+            box = tb.LabelFrame(kpi_f, text=title, padding=10)
+            box.grid(row=0, column=col, sticky='nsew', padx=8)
+            kpi_f.columnconfigure(col, weight=1)
+            self.kpi_labels[table] = tb.Label(box, justify=LEFT, font=("Courier", 10), anchor='nw')
+            self.kpi_labels[table].pack(fill='both', expand=True)
+        self.refresh_kpis()
         self.hub.mainloop()
 
+    def refresh_kpis(self):
+        """Redraws the hub dashboard; the figures come from summary tables, so this is cheap."""
+        self._kpi_job = self.hub.after(5000, self.refresh_kpis)
+        try:
+            kpis = inventory_kpis(self.db)
+        except Exception as e:
+            logger.error(f"Failed to load inventory KPIs: {e}")
+            return
+        for table, k in kpis.items():
+            lines = [f"Items:           {k['total']:>8,}",
+                     f"Expired:         {k['expired']:>8,}",
+                     f"Expiring (30 d): {k['expiring']:>8,}"]
+            for dim in SUMMARY_DIMENSIONS[table]:
+                lines.append("")
+                lines.append(f"Top {dim}:")
+                lines += [f"  {(key or '(none)')[:22]:<22} {n:>8,}" for key, n in k[dim]]
+            self.kpi_labels[table].config(text="\n".join(lines))
+
     def launch(self, lab_type):
         """Launches the specific inventory dashboard."""
+        self.hub.after_cancel(self._kpi_job)
         self.hub.destroy()
         main_root = tb.Window(themename="flatly")
+        self.root = main_root
         
+        # Inventory modules are imported on first use to keep start-up fast.
         if lab_type == "Chemical":
+            from app.ui_chemical import ChemicalUI
             ChemicalUI(main_root, self.db, self)
         else:
+            from app.ui_biological import BiologicalUI
             BiologicalUI(main_root, self.db, self)
             
         main_root.mainloop()
 
+    # --- Expiry alerts ---
+
+    def notify_change(self, table, item_id):
+        """Called by the inventory modules after a row is added, edited or deleted."""
+        if self.watcher:
+            self.watcher.notify_change(table, item_id)
+
+    def on_alerts(self, alerts):
+        """ExpiryWatcher callback (watcher thread): hands the batch to the Tk event loop."""
+        try:
+            self.root.after(0, lambda: self.show_alerts(alerts))
+        except Exception as e:
+            logger.warning(f"Could not display {len(alerts)} expiry alert(s): {e}")
+
+    def show_alerts(self, alerts):
+        """Shows one toast per batch of new expiry alerts."""
+        from ttkbootstrap.toast import ToastNotification
+        expired = [a for a in alerts if a["kind"] == "expired"]
+        expiring = [a for a in alerts if a["kind"] == "expiring"]
+        lines = [f"{'EXPIRED' if a['kind'] == 'expired' else 'Expiring'}: {a['name']} ({a['expiry']})"
+                 for a in (expired + expiring)[:8]]
+        if len(alerts) > 8:
+            lines.append(f"... and {len(alerts) - 8} more")
+        ToastNotification(title=f"Expiry alerts: {len(expired)} expired, {len(expiring)} expiring",
+                          message="\n".join(lines), duration=15000,
+                          bootstyle=DANGER if expired else WARNING).show_toast()
+
     def on_entry_click(self,event, entry, default_text):
         """Function to clear placeholder on click"""
         if entry.get() == default_text:
@@ -105,6 +184,7 @@ class BioLabController:
                 entry.config(show="")
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         BioLabController()
     except Exception as e:
@@ -0,0 +1,11 @@
+import pytest
+
+from app.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh Database on a temporary file, closed after the test."""
+    database = Database(str(tmp_path / "biolab.db"))
+    yield database
+    database.close()
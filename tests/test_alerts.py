@@ -0,0 +1,76 @@
+import threading
+from datetime import date, timedelta
+
+from app.alerts import ExpiryWatcher, open_alerts, acknowledge
+from app.expiry import to_day
+
+
+def _add(db, name, days):
+    expiry = (date.today() + timedelta(days=days)).isoformat()
+    return db.insert("INSERT INTO chemicals (name, expiry) VALUES (?, ?)", (name, expiry))
+
+
+def _run_once(db):
+    """Starts a watcher, waits for its first pass and stops it; returns the alerts it raised."""
+    raised = []
+    watcher = ExpiryWatcher(db, on_alert=raised.extend, tables=("chemicals",))
+    passed = threading.Event()
+    original = watcher._seconds_to_midnight
+
+    def seconds_to_midnight():
+        passed.set()
+        return original()
+
+    watcher._seconds_to_midnight = seconds_to_midnight
+    watcher.start()
+    assert passed.wait(5)
+    watcher.stop()
+    watcher._thread.join(5)
+    return {(a["name"], a["kind"]) for a in raised}
+
+
+def test_first_run_alerts_items_already_past_a_threshold(db):
+    _add(db, "Old", -100)
+    _add(db, "Yesterday", -1)
+    _add(db, "Soon", 10)
+    _add(db, "Later", 100)
+    assert _run_once(db) == {("Old", "expired"), ("Yesterday", "expired"), ("Soon", "expiring")}
+    assert len(open_alerts(db)) == 3
+    # A restart on the same day raises nothing again.
+    assert _run_once(db) == set()
+
+
+def test_items_without_an_alert_are_raised_after_a_restart(db):
+    _add(db, "Old", -100)
+    _add(db, "Older", -300)
+    db.execute("INSERT INTO expiry_watch (id, checked_through) VALUES (1, ?)", (to_day(date.today()),))
+    # Written while the watcher was not running, e.g. by another client.
+    assert _run_once(db) == {("Old", "expired"), ("Older", "expired")}
+
+
+def test_rows_written_without_notify_change_are_picked_up(db):
+    raised = []
+    alerted = threading.Event()
+
+    def on_alert(alerts):
+        raised.extend(alerts)
+        alerted.set()
+
+    watcher = ExpiryWatcher(db, on_alert=on_alert, tables=("chemicals",), poll_s=0.02).start()
+    try:
+        _add(db, "Late", -5)
+        assert alerted.wait(5)
+    finally:
+        watcher.stop()
+        watcher._thread.join(5)
+    assert [(a["name"], a["kind"]) for a in raised] == [("Late", "expired")]
+
+
+def test_acknowledge(db):
+    _add(db, "Old", -100)
+    _run_once(db)
+    (alert,) = open_alerts(db)
+    assert acknowledge(db, [])
+    assert len(open_alerts(db)) == 1
+    assert acknowledge(db, [alert[0]])
+    assert open_alerts(db) == []
@@ -0,0 +1,80 @@
+import json
+import logging
+import logging.handlers
+
+from app import configure_logging, _stop_listener
+from app.audit import AuditTrail, history, user_activity
+
+
+def _insert(db, name, quantity="1 L"):
+    return db.insert("INSERT INTO chemicals (name, quantity) VALUES (?, ?)", (name, quantity))
+
+
+def test_flush_and_close_write_the_queued_events(db):
+    trail = AuditTrail(db, batch_size=3, linger_s=5)
+    for i in range(7):
+        trail.record("login", user=f"user{i}")
+    assert trail.flush()
+    assert db.query("SELECT COUNT(*) FROM audit_log", cache=False) == [(7,)]
+    trail.record("logout", user="user0")
+    trail.close()
+    assert trail._thread is None
+    assert db.query("SELECT action FROM audit_log ORDER BY id DESC LIMIT 1", cache=False) == [("logout",)]
+
+
+def test_flush_without_events_does_not_start_the_writer(db):
+    trail = AuditTrail(db)
+    assert trail.flush()
+    assert trail._thread is None
+
+
+def test_record_change_keeps_only_changed_columns(db):
+    audit = db.audit
+    audit.user = "alice"
+    row_id = _insert(db, "Acetone")
+    audit.record_change("insert", "chemicals", row_id)
+    before = audit.snapshot("chemicals", row_id)
+    db.update("UPDATE chemicals SET quantity = '2 L', class = 'Solvent' WHERE id = ?", (row_id,))
+    audit.record_change("update", "chemicals", row_id, before)
+    before = audit.snapshot("chemicals", row_id)
+    db.update("DELETE FROM chemicals WHERE id = ?", (row_id,))
+    audit.record_change("delete", "chemicals", row_id, before)
+    assert audit.snapshot("chemicals", row_id) is None
+    audit.flush()
+
+    events = history(db, "chemicals", row_id)
+    assert [(e[2], e[3]) for e in events] == [("alice", "delete"), ("alice", "update"), ("alice", "insert")]
+    delete, update, insert = events
+    assert json.loads(update[4]) == {"class": None, "quantity": "1 L"}
+    assert json.loads(update[5]) == {"class": "Solvent", "quantity": "2 L"}
+    assert json.loads(insert[5])["name"] == "Acetone" and insert[4] is None
+    assert json.loads(delete[4])["quantity"] == "2 L" and delete[5] is None
+
+
+def test_user_activity(db):
+    db.audit.record("login", user="alice")
+    db.audit.record("login", user="bob")
+    db.audit.record("delete", "chemicals", 3, {"name": "Acetone"}, user="alice")
+    db.audit.flush()
+    events = user_activity(db, "alice")
+    assert [(e[2], e[3], e[4]) for e in events] == [("delete", "chemicals", 3), ("login", None, None)]
+    assert user_activity(db, "alice", since="9999") == []
+    assert len(user_activity(db, "alice", limit=1)) == 1
+
+
+def test_configure_logging_queues_records(tmp_path):
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    log_file = tmp_path / "biolab.log"
+    configure_logging(stream=None, log_file=str(log_file))
+    try:
+        assert [type(h) for h in root.handlers] == [logging.handlers.QueueHandler]
+        logging.getLogger("app.test").warning("queued record")
+    finally:
+        _stop_listener()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in saved[0]:
+            root.addHandler(handler)
+        root.setLevel(saved[1])
+    assert "app.test: queued record" in log_file.read_text(encoding="utf-8")
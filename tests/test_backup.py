@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+
+from app import backup
+from app.backup import BackupError, backup_database, snapshots, verify_snapshot
+
+
+def test_backups_in_the_same_second_are_kept(db, tmp_path):
+    dest = tmp_path / "backups"
+    first = backup_database(db.db_name, dest, sleep_s=0)
+    second = backup_database(db.db_name, dest, sleep_s=0)
+    assert first.path != second.path
+    assert [str(p) for p in snapshots(db.db_name, dest)] == [first.path, second.path]
+    verify_snapshot(second.path)
+
+
+def test_an_existing_snapshot_is_not_overwritten(db, tmp_path, monkeypatch):
+    dest = tmp_path / "backups"
+    monkeypatch.setattr(backup, "STAMP_FORMAT", "fixed")
+    backup_database(db.db_name, dest, sleep_s=0, compress=False)
+    with pytest.raises(BackupError):
+        backup_database(db.db_name, dest, sleep_s=0, compress=False)
+
+
+def test_snapshots_with_the_old_stamp_are_listed_in_order(db, tmp_path):
+    dest = tmp_path / "backups"
+    dest.mkdir()
+    stem = "biolab"
+    old = dest / f"{stem}-20260101-120000.db.gz"
+    new = dest / f"{stem}-{datetime(2026, 1, 1, 12, 0, 1).strftime(backup.STAMP_FORMAT)}.db.gz"
+    same_second = dest / f"{stem}-20260101-120000-500000.db.gz"
+    for path in (new, old, same_second, dest / f"{stem}-notes.db"):
+        path.write_bytes(b"")
+    assert snapshots(db.db_name, dest) == [old, same_second, new]
@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from app.cache import QueryCache
+from app.database import Database
+
+CHEMICALS = ("SELECT name FROM chemicals", ())
+BIOLOGICAL = ("SELECT name FROM biological", ())
+
+
+def test_a_write_evicts_only_the_queries_reading_its_table():
+    cache = QueryCache()
+    for key in (CHEMICALS, BIOLOGICAL):
+        cache.put(key, [("x",)], cache.get(key)[1])
+    cache.invalidate(["Chemicals"])
+    assert cache.get(CHEMICALS)[0] is None
+    assert cache.get(BIOLOGICAL)[0] == [("x",)]
+    cache.invalidate()
+    assert cache.get(BIOLOGICAL)[0] is None
+
+
+def test_derived_tables_follow_their_source():
+    cache = QueryCache()
+    cache.add_derived("chemicals_fts", "chemicals")
+    key = ("SELECT rowid FROM chemicals_fts WHERE chemicals_fts MATCH ?", ("acetone",))
+    cache.put(key, [(1,)], cache.get(key)[1])
+    cache.invalidate(["chemicals"])
+    assert cache.get(key)[0] is None
+
+
+def test_a_result_read_before_a_write_is_not_stored():
+    cache = QueryCache()
+    _, generation = cache.get(CHEMICALS)
+    cache.invalidate(["chemicals"])
+    cache.put(CHEMICALS, [("stale",)], generation)
+    assert cache.get(CHEMICALS)[0] is None
+
+
+def test_size_limits_evict_the_least_recently_used():
+    cache = QueryCache(max_entries=2, max_rows=3)
+    keys = [(f"SELECT {i} FROM chemicals", ()) for i in range(3)]
+    for key in keys[:2]:
+        cache.put(key, [(1,)], cache.get(key)[1])
+    cache.get(keys[0])
+    cache.put(keys[2], [(1,)], cache.get(keys[2])[1])
+    assert cache.get(keys[1])[0] is None and cache.get(keys[0])[0] is not None
+    cache.put(BIOLOGICAL, [(1,)] * 4, cache.get(BIOLOGICAL)[1])    # More rows than max_rows: not cached
+    assert cache.get(BIOLOGICAL)[0] is None
+
+
+@pytest.fixture
+def cached_db(tmp_path):
+    database = Database(str(tmp_path / "cached.db"), query_cache_size=32)
+    yield database
+    database.close()
+
+
+def _names(db):
+    return [r[0] for r in db.query("SELECT name FROM chemicals ORDER BY name")]
+
+
+def test_database_writes_invalidate(cached_db):
+    cached_db.insert("INSERT INTO chemicals (name) VALUES ('A')")
+    assert _names(cached_db) == _names(cached_db) == ["A"]
+    assert cached_db.cache_stats()["hits"] >= 1
+    cached_db.insert("INSERT INTO chemicals (name) VALUES ('B')")
+    assert _names(cached_db) == ["A", "B"]
+    cached_db.executemany("INSERT INTO chemicals (name) VALUES (?)", [("C",), ("D",)])
+    assert _names(cached_db) == ["A", "B", "C", "D"]
+    cached_db.execute("DELETE FROM chemicals WHERE name = 'A'")
+    assert _names(cached_db) == ["B", "C", "D"]
+
+
+def test_derived_data_refreshed_on_commit_invalidates(cached_db):
+    elements = "SELECT DISTINCT element FROM chemicals_elements ORDER BY element"
+    row_id = cached_db.insert("INSERT INTO chemicals (name, mol_info) VALUES ('Salt', 'NaCl')")
+    assert cached_db.query(elements) == [("Cl",), ("Na",)]
+    cached_db.execute("UPDATE chemicals SET mol_info = 'KCl' WHERE id = ?", (row_id,))
+    assert cached_db.query(elements) == [("Cl",), ("K",)]
+
+
+def test_another_connection_invalidates(cached_db):
+    assert _names(cached_db) == []
+    conn = sqlite3.connect(cached_db.db_name)
+    try:
+        conn.execute("INSERT INTO chemicals (name) VALUES ('Outside')")
+        conn.commit()
+    finally:
+        conn.close()
+    assert _names(cached_db) == ["Outside"]
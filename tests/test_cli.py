@@ -0,0 +1,28 @@
+import pytest
+
+from app.cli import main, parse_args
+
+
+@pytest.mark.parametrize("argv, text", [
+    (["search", "chemicals", "sodium", "azide"], ["sodium", "azide"]),
+    (["search", "chemicals", "--fuzzy", "acetonitril"], ["acetonitril"]),
+    (["search", "chemicals", "sodium", "--limit", "3", "azide"], ["sodium", "azide"]),
+    (["stock", "chemicals", "-f", "quantity=<1 L", "acetone"], ["acetone"]),
+])
+def test_search_terms_may_follow_options(argv, text):
+    assert parse_args(argv).text == text
+
+
+@pytest.mark.parametrize("argv", [
+    ["search", "chemicals", "--fuzzy", "acetone", "--bogus"],
+    ["stats", "extra"],
+])
+def test_unknown_arguments_are_refused(argv):
+    with pytest.raises(SystemExit):
+        parse_args(argv)
+
+
+def test_fuzzy_search_after_the_option(db, capsys):
+    db.insert("INSERT INTO chemicals (name) VALUES ('Acetonitrile')")
+    assert main(["--db", db.db_name, "search", "chemicals", "--fuzzy", "acetonitril", "--format", "csv"]) == 0
+    assert "Acetonitrile" in capsys.readouterr().out
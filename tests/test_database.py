@@ -0,0 +1,50 @@
+import threading
+
+from app.search import SearchExecutor
+
+
+def _open_connections(db):
+    return len(db._connections)
+
+
+def test_release_closes_the_thread_connection(db):
+    baseline = _open_connections(db)
+
+    def work():
+        try:
+            db.query("SELECT COUNT(*) FROM chemicals", cache=False)
+        finally:
+            db.release()
+
+    threads = [threading.Thread(target=work) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert _open_connections(db) == baseline
+    db.release()
+    db.release()    # Nothing left to release: a no-op
+    assert db.query("SELECT COUNT(*) FROM chemicals", cache=False) == [(0,)]
+
+
+class _Root:
+    """Just enough of a Tk root for SearchExecutor (callbacks run at once)."""
+    def after(self, ms, fn, *args):
+        fn(*args)
+        return "job"
+
+    def after_cancel(self, job):
+        pass
+
+
+def test_search_worker_releases_its_connection(db):
+    baseline = _open_connections(db)
+    results = []
+    done = threading.Event()
+    executor = SearchExecutor(_Root(), lambda r: (results.append(r), done.set()), db, delay_ms=0)
+    executor.submit(lambda: db.query("SELECT COUNT(*) FROM chemicals", cache=False))
+    assert done.wait(5) and results == [[(0,)]]
+    assert _open_connections(db) == baseline + 1
+    executor.shutdown()
+    executor._worker.join(5)
+    assert _open_connections(db) == baseline
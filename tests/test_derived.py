@@ -0,0 +1,73 @@
+import sqlite3
+
+from app.changes import ChangeFeed
+from app.database import Database
+from app.storage import add_unit, get_unit, move_samples, occupied
+
+PYTHON_FUNCTIONS = ("qty_value(", "qty_unit(", "formula(", "mol_weight(", "formula_elements(", "ghs_mask(",
+                    "hazard_codes(", "bit_set(")
+
+
+def test_schema_needs_no_python_functions(db):
+    conn = sqlite3.connect(db.db_name)
+    try:
+        sql = [s for (s,) in conn.execute("SELECT sql FROM sqlite_master WHERE type IN ('trigger', 'view')")]
+    finally:
+        conn.close()
+    assert sql and not [s for s in sql if any(f in s for f in PYTHON_FUNCTIONS)]
+
+
+def test_rows_written_by_another_client_are_refreshed(db):
+    feed = ChangeFeed(db, "chemicals")
+    conn = sqlite3.connect(db.db_name)
+    try:
+        conn.execute("INSERT INTO chemicals (name, quantity, mol_info, ghs) VALUES ('Sublimate', '2.5 kg', 'HgCl2', "
+                     "'GHS06 H300')")
+        conn.commit()
+    finally:
+        conn.close()
+    assert feed.poll()
+    assert db.query("SELECT qty_value, qty_unit, formula, ghs_mask FROM chemicals", cache=False) == \
+        [(2500.0, "g", "Cl2Hg", 32)]
+    assert db.query("SELECT code FROM chemicals_hazard_codes ORDER BY code", cache=False) == [("GHS06",), ("H300",)]
+    assert db.query("SELECT COUNT(*) FROM derive_queue", cache=False) == [(0,)]
+
+
+def test_derived_data_is_current_after_each_commit(db):
+    row_id = db.insert("INSERT INTO chemicals (name, quantity, mol_info) VALUES ('A', '1 L', 'C2H6O')")
+    db.execute("UPDATE chemicals SET quantity = '250 mL', mol_info = 'CH4O' WHERE id = ?", (row_id,))
+    assert db.query("SELECT qty_value, formula FROM chemicals", cache=False) == [(250.0, "CH4O")]
+    assert db.query("SELECT element FROM chemicals_elements ORDER BY element", cache=False) == \
+        [("C",), ("H",), ("O",)]
+
+
+def test_legacy_triggers_are_replaced(tmp_path):
+    path = str(tmp_path / "old.db")
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TRIGGER chemicals_qty_ai")
+    conn.execute("""CREATE TRIGGER chemicals_qty_ai AFTER INSERT ON chemicals BEGIN
+                        UPDATE chemicals SET qty_value = qty_value(new.quantity) WHERE id = new.id;
+                    END""")
+    conn.commit()
+    conn.close()
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("INSERT INTO chemicals (name, quantity) VALUES ('B', '5 g')")
+    finally:
+        conn.close()
+
+
+def test_box_bitmaps_follow_sample_positions(db):
+    site = add_unit(db, "site", "Main")
+    freezer = add_unit(db, "freezer", "F1", site)
+    rack = add_unit(db, "rack", "R1", freezer)
+    box = add_unit(db, "box", "B1", rack, 2, 2)
+    samples = [db.insert("INSERT INTO biological (name) VALUES (?)", (f"S{i}",)) for i in range(3)]
+    move_samples(db, samples[:2], box)
+    assert occupied(get_unit(db, box)["occupancy"]) == 0b11
+    # Reshuffled within the box in one transaction: the released positions are reused
+    move_samples(db, samples, box)
+    unit = get_unit(db, box)
+    assert (unit["used"], occupied(unit["occupancy"])) == (3, 0b111)
@@ -0,0 +1,48 @@
+from datetime import date
+
+import pytest
+
+from app.expiry import parse_date, parse_filter, to_day
+from app.search import build_filter
+
+
+def _days(first, last):
+    return to_day(first), to_day(last)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2025-03-14", date(2025, 3, 14)),
+    ("2025/03/14", date(2025, 3, 14)),
+    ("14.03.2025", date(2025, 3, 14)),
+    ("20250314", date(2025, 3, 14)),
+    ("2025-02-30", None),
+    ("soon", None),
+    ("", None),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2025", _days(date(2025, 1, 1), date(2025, 12, 31))),
+    ("2025-02", _days(date(2025, 2, 1), date(2025, 2, 28))),
+    ("2024-02", _days(date(2024, 2, 1), date(2024, 2, 29))),
+    ("2025-12", _days(date(2025, 12, 1), date(2025, 12, 31))),
+    ("2025-03-14", _days(date(2025, 3, 14), date(2025, 3, 14))),
+    ("2025-01..2025-06", _days(date(2025, 1, 1), date(2025, 6, 30))),
+    ("..2025", _days(date.min, date(2025, 12, 31))),
+    ("2025-03..", _days(date(2025, 3, 1), date.max)),
+    ("2025-13", None),
+    ("2025..soon", None),
+    ("soon", None),
+])
+def test_parse_filter(text, expected):
+    assert parse_filter(text) == expected
+
+
+def test_expiry_filter(db):
+    for name, expiry in (("A", "2025-01-31"), ("B", "2025-02-01"), ("C", "2026-01-01"), ("D", None)):
+        db.insert("INSERT INTO chemicals (name, expiry) VALUES (?, ?)", (name, expiry))
+    for text, names in (("2025-02", ["B"]), ("2025", ["A", "B"]), ("2025-02..", ["B", "C"])):
+        sql, params = build_filter("chemicals", {"expiry": text})
+        assert [r[0] for r in db.query(f"SELECT name FROM chemicals WHERE {sql} ORDER BY name", params)] == names
@@ -0,0 +1,40 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app import export
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """The read-only connections write_pdf opens."""
+    conns = []
+
+    def open_readonly(db_name):
+        conns.append(sqlite3.connect(db_name))
+        return conns[-1]
+
+    monkeypatch.setattr(export, "open_readonly", open_readonly)
+    return conns
+
+
+def _closed(conn):
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+@pytest.mark.parametrize("outcome", ["done", "cancelled", "error"])
+def test_write_pdf_closes_its_connection(db, tmp_path, opened, outcome):
+    db.insert("INSERT INTO chemicals (name) VALUES ('Acetone')")
+    cancel = threading.Event()
+    if outcome == "cancelled":
+        cancel.set()
+    sql = "SELECT name FROM chemicals" if outcome != "error" else "SELECT name FROM missing_table"
+    ok = export.write_pdf(db.db_name, tmp_path / "out.pdf", "Chemicals", ["Name"], sql, cancel=cancel)
+    assert ok == (outcome == "done")
+    assert (tmp_path / "out.pdf").exists() == ok
+    assert len(opened) == 1 and _closed(opened[0])
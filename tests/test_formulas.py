@@ -0,0 +1,52 @@
+import pytest
+
+from app.formulas import parse_formula, parse_mol_info, formula_clause
+from app.search import build_filter
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("H2O", {"H": 2, "O": 1}),
+    ("C2H5OH", {"C": 2, "H": 6, "O": 1}),
+    ("Ca(OH)2", {"Ca": 1, "O": 2, "H": 2}),
+    ("CuSO4·5H2O", {"Cu": 1, "S": 1, "O": 9, "H": 10}),
+    ("acetone", None),
+    ("", None),
+])
+def test_parse_formula(text, expected):
+    assert parse_formula(text) == expected
+
+
+@pytest.mark.parametrize("text, hill, weight", [
+    ("C2H5OH", "C2H6O", 46.069),
+    ("Ca(OH)2", "CaH2O2", 74.092),
+    ("NaCl", "ClNa", 58.44),
+    # A stated weight wins over the computed one.
+    ("C6H12O6, MW 180.16 g/mol", "C6H12O6", 180.16),
+    ("MW: 58.44 g/mol NaCl", "ClNa", 58.44),
+    ("see label", None, None),
+])
+def test_parse_mol_info(text, hill, weight):
+    _, formula, mol_weight = parse_mol_info(text)
+    assert formula == hill
+    assert mol_weight == pytest.approx(weight, abs=0.01) if weight else mol_weight is None
+
+
+def test_unparseable_filters_fall_back():
+    assert formula_clause("chemicals", "nonsense") is None
+    assert build_filter("chemicals", {"mol_info": "nonsense"}, fts=False) == ("mol_info LIKE ?", ["%nonsense%"])
+
+
+@pytest.mark.parametrize("text, names", [
+    ("Hg|Pb", ["Lead acetate", "Sublimate"]),
+    ("Na&Cl", ["Salt"]),
+    ("-Cl", ["Ethanol", "Lead acetate"]),
+    ("40..60", ["Ethanol", "Salt"]),
+    ("C2H6O", ["Ethanol"]),
+    ("HOC2H5", ["Ethanol"]),
+])
+def test_formula_filters(db, text, names):
+    for name, mol_info in (("Sublimate", "HgCl2"), ("Salt", "NaCl"), ("Ethanol", "C2H5OH"),
+                           ("Lead acetate", "Pb(C2H3O2)2")):
+        db.insert("INSERT INTO chemicals (name, mol_info) VALUES (?, ?)", (name, mol_info))
+    sql, params = build_filter("chemicals", {"mol_info": text})
+    assert [r[0] for r in db.query(f"SELECT name FROM chemicals WHERE {sql} ORDER BY name", params)] == names
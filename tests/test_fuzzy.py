@@ -0,0 +1,48 @@
+import sqlite3
+
+from app.fuzzy import similarity, similar_terms, fuzzy_search
+
+
+def _names(results):
+    return [r[1] for r in results]
+
+
+def test_similarity():
+    assert similarity("acetone", "acetone") == 1
+    assert similarity("acetonitril", "acetonitrile") > similarity("acetonitril", "acetone")
+    assert similarity("xyz", "acetone") == 0
+
+
+def test_typos_are_tolerated(db):
+    for name, synonyms in (("Acetonitrile", "Methyl cyanide; MeCN"), ("Acetone", "Propanone"), ("Ethanol", None)):
+        db.insert("INSERT INTO chemicals (name, synonyms) VALUES (?, ?)", (name, synonyms))
+    assert _names(fuzzy_search(db, "acetonitril"))[0] == "Acetonitrile"
+    assert _names(fuzzy_search(db, "methyl cyanid")) == ["Acetonitrile"]
+    assert similar_terms(db, "zz") == []
+
+
+def test_names_added_after_a_search_are_found(db):
+    db.insert("INSERT INTO chemicals (name) VALUES ('Acetone')")
+    assert fuzzy_search(db, "xylazin") == []
+    db.insert("INSERT INTO chemicals (name) VALUES ('Xylazine')")
+    assert _names(fuzzy_search(db, "xylazin")) == ["Xylazine"]
+    assert _names(fuzzy_search(db, "Xylazine")) == ["Xylazine"]
+
+
+def test_names_added_by_another_client_are_found(db):
+    db.insert("INSERT INTO chemicals (name) VALUES ('Acetone')")
+    assert fuzzy_search(db, "ketamin") == []
+    conn = sqlite3.connect(db.db_name)
+    try:
+        conn.execute("INSERT INTO chemicals (name) VALUES ('Ketamine')")
+        conn.commit()
+    finally:
+        conn.close()
+    assert _names(fuzzy_search(db, "ketamin")) == ["Ketamine"]
+
+
+def test_renamed_terms_are_dropped(db):
+    row_id = db.insert("INSERT INTO chemicals (name) VALUES ('Xylazine')")
+    assert _names(fuzzy_search(db, "xylazin")) == ["Xylazine"]
+    db.execute("UPDATE chemicals SET name = 'Ketamine' WHERE id = ?", (row_id,))
+    assert fuzzy_search(db, "xylazin") == []
@@ -0,0 +1,106 @@
+import sqlite3
+
+from app.database import Database
+from app.grid import VirtualGrid
+
+
+class _Tree:
+    """Just enough of a ttk.Treeview for VirtualGrid."""
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.items = []
+
+    def __getitem__(self, key):
+        return self.columns
+
+    def heading(self, *args, **kwargs):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+    def get_children(self, item=""):
+        return tuple(self.items)
+
+    def delete(self, *iids):
+        self.items = [i for i in self.items if i not in iids]
+
+    def insert(self, parent, index, iid, values, tags):
+        self.items.insert(len(self.items) if index == "end" else index, iid)
+
+    def yview(self):
+        return 0.0, 1.0
+
+    def yview_moveto(self, fraction):
+        pass
+
+
+def _ids(db, names):
+    return {db.insert("INSERT INTO chemicals (name, class) VALUES (?, ?)", (name, cls)): name
+            for name, cls in names}
+
+
+def _scroll_through(grid):
+    grid.reload()
+    while grid.more_after:
+        grid._fetch_after()
+    return [int(i) for i in grid.tree.items]
+
+
+ROWS = [("A", "Solvent"), ("B", None), ("C", "Acid"), ("D", None), ("E", "Solvent"), ("F", "")]
+
+
+def test_keyset_paging_covers_missing_values(db):
+    _ids(db, ROWS)
+    grid = VirtualGrid(_Tree(("ID", "Name", "Class")), db, "chemicals", ["id", "name", "class"], page_size=2,
+                       max_pages=10)
+    grid.sort_by("class")
+    expected = [r[0] for r in db.query(*grid.current_query())]
+    assert _scroll_through(grid) == expected and len(expected) == len(ROWS)
+    grid.sort_by("class")    # Descending
+    assert _scroll_through(grid) == expected[::-1]
+
+
+def test_sort_pages_seek_the_index(db, monkeypatch):
+    grid = VirtualGrid(_Tree(("ID", "Class")), db, "chemicals", ["id", "class"])
+    grid.sort_col = "class"
+    queries = []
+    monkeypatch.setattr(db, "query", lambda sql, params=(), cache=True: queries.append((sql, params)) or [])
+    grid._page("1", [], ("Acid", 3))
+    grid._page("1", [], ("Acid", 3), forward=False)
+    monkeypatch.undo()
+    for sql, params in queries:
+        plan = " ".join(r[-1] for r in db.query("EXPLAIN QUERY PLAN " + sql, params, cache=False))
+        assert "SEARCH chemicals USING INDEX idx_chemicals_class" in plan
+
+
+def test_opening_leaves_missing_values_alone(tmp_path):
+    path = str(tmp_path / "grid.db")
+    database = Database(path)
+    row_id = database.insert("INSERT INTO chemicals (name) VALUES ('A')")
+    seq = database.query("SELECT MAX(seq) FROM change_log", cache=False)
+    database.close()
+    database = Database(path)
+    try:
+        assert database.query("SELECT class, ghs, expiry, version FROM chemicals WHERE id = ?", (row_id,),
+                              cache=False) == [(None, None, None, 1)]
+        assert database.query("SELECT MAX(seq) FROM change_log", cache=False) == seq
+    finally:
+        database.close()
+
+
+def test_plain_sort_indexes_are_replaced(tmp_path):
+    path = str(tmp_path / "grid.db")
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX idx_chemicals_name")
+    conn.execute("CREATE INDEX idx_chemicals_name ON chemicals(name)")
+    conn.commit()
+    conn.close()
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    try:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'idx_chemicals_name'").fetchone()[0]
+    finally:
+        conn.close()
+    assert "IFNULL(name, '')" in sql
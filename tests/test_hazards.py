@@ -0,0 +1,37 @@
+import pytest
+
+from app.hazards import parse_hazards, pictogram_names, hazard_clause
+from app.search import build_filter
+
+
+@pytest.mark.parametrize("text, pictograms, codes", [
+    ("GHS02, GHS07 H225 H319", ["GHS02", "GHS07"], ("GHS02", "GHS07", "H225", "H319")),
+    # Pictograms implied by H statements
+    ("Flammable; H300", ["GHS06"], ("H300",)),
+    ("EUH066 P210+P233", [], ("EUH066", "P210", "P233")),
+    ("", [], ()),
+])
+def test_parse_hazards(text, pictograms, codes):
+    mask, found = parse_hazards(text)
+    assert pictogram_names(mask) == pictograms
+    assert found == codes
+
+
+def test_unparseable_filters_fall_back():
+    assert hazard_clause("chemicals", "foo") is None
+
+
+@pytest.mark.parametrize("text, names", [
+    ("GHS02", ["Acetone", "Peroxide"]),
+    ("GHS02&GHS03", ["Peroxide"]),
+    ("toxic|corrosive", ["Acid", "Sublimate"]),
+    ("-GHS02", ["Acid", "Sublimate", "Water"]),
+    ("H300", ["Sublimate"]),
+    ("H3xx", ["Acetone", "Acid", "Sublimate"]),
+])
+def test_hazard_filters(db, text, names):
+    for name, ghs in (("Acetone", "GHS02 GHS07 H225 H319"), ("Peroxide", "GHS02 GHS03 H242"),
+                      ("Sublimate", "GHS06 H300"), ("Acid", "GHS05 H314"), ("Water", "")):
+        db.insert("INSERT INTO chemicals (name, ghs) VALUES (?, ?)", (name, ghs))
+    sql, params = build_filter("chemicals", {"ghs": text})
+    assert [r[0] for r in db.query(f"SELECT name FROM chemicals WHERE {sql} ORDER BY name", params)] == names
@@ -0,0 +1,73 @@
+import csv
+import sqlite3
+
+import pytest
+
+from app.importer import TABLE_COLUMNS, map_headers, import_file
+from app.triggers import bulk_insert, deferred_triggers
+from tests.test_triggers import ROWS, DERIVED, _insert
+
+
+def _triggers(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='chemicals'")}
+
+
+def test_map_headers_uses_aliases_and_explicit_mapping():
+    headers = ["Chemical Name", "Other  names", "Qty", "Expiration Date", "Notes"]
+    assert map_headers("chemicals", headers) == {0: "name", 1: "synonyms", 2: "quantity", 3: "expiry"}
+    assert map_headers("chemicals", ["Label", "Qty"], {"label": "name"}) == {0: "name", 1: "quantity"}
+    with pytest.raises(ValueError):
+        map_headers("chemicals", ["Qty", "Notes"])
+
+
+def test_import_rejects_bad_rows(db, tmp_path):
+    path = tmp_path / "stock.tsv"
+    path.write_text("Reagent\tAmount\tExp\n"
+                    "Acetone\t2.5 L\t01/02/2030\n"
+                    "\t1 L\t2030-01-01\n"
+                    "\t\t\n"
+                    "Ethanol\t1 L\tsoon\n"
+                    "Toluene\t500 mL\t\n", encoding="utf-8")
+    result = import_file(db, path, "chemicals", batch_size=2)
+    assert (result.inserted, result.rejected) == (2, 2)
+    assert db.query("SELECT name, quantity, expiry FROM chemicals ORDER BY id", cache=False) == [
+        ("Acetone", "2.5 L", "2030-02-01"), ("Toluene", "500 mL", "")]
+    with open(result.reject_path, newline="", encoding="utf-8") as f:
+        rejects = list(csv.reader(f))
+    assert [r[:2] for r in rejects] == [["line", "error"], ["3", "missing name"],
+                                        ["5", "invalid expiry date 'soon'"]]
+
+
+def test_import_matches_per_row_inserts(db, tmp_path):
+    path = tmp_path / "stock.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([TABLE_COLUMNS["chemicals"], *ROWS])
+    assert import_file(db, path, "chemicals").inserted == len(ROWS)
+    assert import_file(db, path, "chemicals").reject_path is None
+    imported = [db.query(sql, cache=False) for sql in DERIVED]
+
+    from app.database import Database
+    other = Database(str(tmp_path / "rows.db"))
+    try:
+        for _ in range(2):
+            with other.transaction() as conn:
+                _insert(conn)
+        assert [other.query(sql, cache=False) for sql in DERIVED] == imported
+    finally:
+        other.close()
+    assert set(deferred_triggers("chemicals")) <= _triggers(db.connection())
+
+
+def test_rollback_restores_the_deferred_triggers(db):
+    before = _triggers(db.connection())
+    with pytest.raises(sqlite3.OperationalError):
+        with db.transaction() as conn, bulk_insert(conn, "chemicals"):
+            _insert(conn)
+            assert not set(deferred_triggers("chemicals")) & _triggers(conn)
+            conn.execute("INSERT INTO chemicals (no_such_column) VALUES (1)")
+    assert _triggers(db.connection()) == before
+    assert db.query("SELECT COUNT(*) FROM chemicals", cache=False) == [(0,)]
+    # Rows written afterwards are indexed by the per-row triggers again.
+    with db.transaction() as conn:
+        _insert(conn)
+    assert db.query("SELECT rowid FROM chemicals_fts WHERE chemicals_fts MATCH 'propanone'", cache=False)
@@ -0,0 +1,58 @@
+import pytest
+
+from app.quantities import parse_quantity, parse_adjustment, adjust_quantity, quantity_clause
+from app.batch import adjust_quantities
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500 mL", (500.0, "mL")),
+    ("2.5 kg", (2500.0, "g")),
+    ("2 x 50 mL", (100.0, "mL")),
+    ("10 vials", (10.0, "count")),
+    ("12", (12.0, "count")),
+    ("1,000 g", (1000.0, "g")),
+    ("2,5 L", (2500.0, "mL")),
+    ("100 mg/mL", (None, None)),
+    ("some", (None, None)),
+    ("", (None, None)),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+def test_quantity_clause():
+    assert quantity_clause("<100 mL") == ("qty_unit = ? AND qty_value < ?", ["mL", 100.0])
+    assert quantity_clause("1 g..1 kg") == ("qty_unit = ? AND qty_value BETWEEN ? AND ?", ["g", 1.0, 1000.0])
+    assert quantity_clause("1 g..1 L") is None
+    assert quantity_clause("acetone") is None
+
+
+@pytest.mark.parametrize("text, adjustment, expected", [
+    ("10.5 kg", "-1 g", "10.499 kg"),
+    ("12345 mL", "-1 mL", "12344 mL"),
+    ("1 L", "-50 mL", "0.95 L"),
+    ("10 vials", "-2 vials", "8 vials"),
+    ("12", "+3", "15"),
+    ("100 g", "-10%", "90 g"),
+    ("50 mL", "-100 mL", "0 mL"),
+    ("50 mL", "-1 g", None),
+    ("a lot", "-1 g", None),
+])
+def test_adjust_quantity(text, adjustment, expected):
+    assert adjust_quantity(text, parse_adjustment(adjustment)) == expected
+
+
+def test_parse_adjustment_rejects_unsigned():
+    assert parse_adjustment("50 mL") is None
+    assert parse_adjustment("-10 mg/mL") is None
+
+
+def test_adjust_quantities_skips_and_rejects_noops(db):
+    ids = [db.insert("INSERT INTO chemicals (name, quantity) VALUES (?, ?)", (name, qty))
+           for name, qty in (("A", "10.5 kg"), ("B", "0 g"), ("C", "5 mL"))]
+    changed, skipped = adjust_quantities(db, "chemicals", ids, "-1 g")
+    assert changed == [ids[0]] and sorted(skipped) == ids[1:]
+    assert db.query("SELECT quantity FROM chemicals WHERE id=?", [ids[0]], cache=False)[0][0] == "10.499 kg"
+    for noop in ("+0 g", "-0%", "nonsense"):
+        with pytest.raises(ValueError):
+            adjust_quantities(db, "chemicals", ids, noop)
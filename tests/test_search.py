@@ -0,0 +1,55 @@
+from app.search import match_expression, build_filter
+
+
+def _insert(db, name, synonyms="", cls=""):
+    return db.insert("INSERT INTO chemicals (name, synonyms, class) VALUES (?, ?, ?)", (name, synonyms, cls))
+
+
+def _search(db, filters, fts=True):
+    where, params = build_filter("chemicals", filters, fts=fts)
+    return [r[0] for r in db.query(f"SELECT name FROM chemicals WHERE {where} ORDER BY name", params, cache=False)]
+
+
+def test_match_expression():
+    assert match_expression("chemicals", "name", "sod azi") == '{name synonyms} : ("sod"* AND "azi"*)'
+    assert match_expression("chemicals", "class", "Solv") == '{class} : ("Solv"*)'
+    assert match_expression("chemicals", "name", " ,; ") is None
+
+
+def test_build_filter_combines_fts_and_like():
+    assert build_filter("chemicals", {"name": "", "class": None}) == ("1", [])
+    where, params = build_filter("chemicals", {"name": "acet", "class": "solv", "mol_info": "58"})
+    assert where == ("id IN (SELECT rowid FROM chemicals_fts WHERE chemicals_fts MATCH ?) "
+                     "AND mol_info LIKE ?")
+    assert params == ['{name synonyms} : ("acet"*) AND {class} : ("solv"*)', "%58%"]
+
+
+def test_prefix_search_over_name_and_synonyms(db):
+    _insert(db, "Sodium azide", cls="Toxic")
+    _insert(db, "Acetone", synonyms="Propanone; Dimethyl ketone", cls="Solvent")
+    _insert(db, "Sodium chloride", cls="Salt")
+    assert _search(db, {"name": "sod"}) == ["Sodium azide", "Sodium chloride"]
+    assert _search(db, {"name": "azi sod"}) == ["Sodium azide"]
+    assert _search(db, {"name": "propan"}) == ["Acetone"]
+    assert _search(db, {"name": "sod", "class": "salt"}) == ["Sodium chloride"]
+    assert _search(db, {"name": "ketones"}) == []
+
+
+def test_index_follows_updates_and_deletes(db):
+    row_id = _insert(db, "Acetone")
+    _insert(db, "Ethanol")
+    db.update("UPDATE chemicals SET name = 'Acetonitrile' WHERE id = ?", (row_id,))
+    assert _search(db, {"name": "acetonit"}) == ["Acetonitrile"]
+    db.update("DELETE FROM chemicals WHERE id = ?", (row_id,))
+    assert _search(db, {"name": "acet"}) == []
+    assert _search(db, {"name": "eth"}) == ["Ethanol"]
+
+
+def test_like_fallback_without_fts(db):
+    _insert(db, "Sodium azide")
+    _insert(db, "Acetone", synonyms="Propanone")
+    where, params = build_filter("chemicals", {"name": "azi"}, fts=False)
+    assert (where, params) == ("name LIKE ?", ["%azi%"])
+    # The fallback finds substrings the prefix index does not.
+    assert _search(db, {"name": "zid"}, fts=False) == ["Sodium azide"]
+    assert _search(db, {"name": "zid"}) == []
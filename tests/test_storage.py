@@ -0,0 +1,90 @@
+import pytest
+
+from app.storage import (StorageError, bitmap_of, occupied, first_free_position, free_positions, position_label,
+                         parse_position, add_unit, get_unit, find_free_slot, move_samples, remove_samples,
+                         remove_unit, box_contents, sample_location)
+
+
+def test_bitmap_helpers():
+    bitmap = bitmap_of([0, 1, 3], 10)
+    assert len(bitmap) == 2 and occupied(bitmap) == 0b1011
+    assert first_free_position(bitmap, 10) == 2
+    assert free_positions(bitmap, 5) == [2, 4]
+    assert first_free_position(bitmap_of(range(4), 4), 4) is None
+    assert occupied(None) == 0
+
+
+@pytest.mark.parametrize("label, position", [("A1", 0), ("b3", 11), ("I9", 80), ("12", 11)])
+def test_parse_position(label, position):
+    assert parse_position(label, 9, 9) == position
+
+
+def test_position_label():
+    assert [position_label(p, 9) for p in (0, 11, 80)] == ["A1", "B3", "I9"]
+    assert position_label(26 * 2, 2) == "AA1"
+
+
+@pytest.mark.parametrize("label", ["J1", "A10", "0", "82", ""])
+def test_positions_outside_the_box(label):
+    with pytest.raises(StorageError):
+        parse_position(label, 9, 9)
+
+
+@pytest.fixture
+def rack(db):
+    site = add_unit(db, "site", "Main")
+    freezer = add_unit(db, "freezer", "F1", site)
+    return add_unit(db, "rack", "R1", freezer)
+
+
+def _samples(db, n):
+    return [db.insert("INSERT INTO biological (name) VALUES (?)", (f"S{i}",)) for i in range(n)]
+
+
+def test_units_must_nest_in_order(db, rack):
+    with pytest.raises(StorageError):
+        add_unit(db, "box", "Loose")
+    with pytest.raises(StorageError):
+        add_unit(db, "freezer", "F2", rack)
+    add_unit(db, "box", "B1", rack)
+    with pytest.raises(StorageError):
+        add_unit(db, "box", "B1", rack)
+
+
+def test_samples_fill_boxes_in_order(db, rack):
+    first = add_unit(db, "box", "B1", rack, 1, 2)
+    second = add_unit(db, "box", "B2", rack, 1, 2)
+    samples = _samples(db, 3)
+    assert move_samples(db, samples, rack) == [(samples[0], first, 0), (samples[1], first, 1),
+                                               (samples[2], second, 0)]
+    assert (get_unit(db, first)["used"], occupied(get_unit(db, first)["occupancy"])) == (2, 0b11)
+    assert find_free_slot(db, rack) == (second, 1)
+    assert sample_location(db, samples[2])[2] == "Main / F1 / R1 / B2 / A1"
+
+
+def test_full_or_taken_positions_are_refused(db, rack):
+    box = add_unit(db, "box", "B1", rack, 1, 2)
+    samples = _samples(db, 3)
+    with pytest.raises(StorageError):
+        move_samples(db, samples, box)
+    assert box_contents(db, box) == []
+    move_samples(db, samples[:1], box, [1])
+    with pytest.raises(StorageError):
+        move_samples(db, samples[1:2], box, [1])
+    assert occupied(get_unit(db, box)["occupancy"]) == 0b10
+
+
+def test_remove_samples_frees_their_positions(db, rack):
+    box = add_unit(db, "box", "B1", rack, 2, 2)
+    samples = _samples(db, 3)
+    move_samples(db, samples, box)
+    remove_samples(db, samples[:2])
+    unit = get_unit(db, box)
+    assert (unit["used"], occupied(unit["occupancy"])) == (1, 0b100)
+    assert sample_location(db, samples[0]) is None
+    remove_samples(db, [])    # Nothing to remove: a no-op
+    with pytest.raises(StorageError):
+        remove_unit(db, box)
+    remove_samples(db, samples[2:])
+    remove_unit(db, box)
+    assert get_unit(db, box) is None
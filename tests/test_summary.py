@@ -0,0 +1,61 @@
+import sqlite3
+from datetime import date, timedelta
+
+from app.database import Database
+from app.summary import inventory_kpis, rebuild
+
+
+def _add(db, name, cls, ghs, days=None):
+    expiry = (date.today() + timedelta(days=days)).isoformat() if days is not None else None
+    return db.insert("INSERT INTO chemicals (name, class, ghs, expiry) VALUES (?, ?, ?, ?)", (name, cls, ghs, expiry))
+
+
+def _ghs(db):
+    return dict(inventory_kpis(db, top=20)["chemicals"]["ghs"])
+
+
+def test_hazard_codes_are_counted_one_by_one(db):
+    _add(db, "Acetone", "Solvent", "GHS02 H225")
+    _add(db, "Sublimate", "Salt", "GHS06 GHS08 H300")
+    _add(db, "Ethanol", "Solvent", "Flammable; GHS02, P210+P233")
+    assert _ghs(db) == {"GHS02": 2, "GHS06": 1, "GHS08": 1, "H225": 1, "H300": 1, "P210": 1, "P233": 1}
+    assert inventory_kpis(db)["chemicals"]["class"] == [("Solvent", 2), ("Salt", 1)]
+
+
+def test_counts_follow_updates_and_deletes(db):
+    row_id = _add(db, "Acetone", "Solvent", "GHS02 H225", days=-1)
+    _add(db, "Ethanol", "Solvent", "GHS02", days=10)
+    db.execute("UPDATE chemicals SET ghs = 'GHS07', class = 'Ketone', expiry = NULL WHERE id = ?", (row_id,))
+    kpis = inventory_kpis(db)["chemicals"]
+    assert _ghs(db) == {"GHS02": 1, "GHS07": 1}
+    assert (kpis["total"], kpis["expired"], kpis["expiring"]) == (2, 0, 1)
+    db.execute("DELETE FROM chemicals WHERE id = ?", (row_id,))
+    assert _ghs(db) == {"GHS02": 1}
+    assert inventory_kpis(db)["chemicals"]["class"] == [("Solvent", 1)]
+
+
+def test_rebuild_matches_the_triggers(db):
+    _add(db, "Acetone", "Solvent", "GHS02 H225", days=-1)
+    _add(db, "Sublimate", "Salt", "GHS06 H300", days=5)
+    before = inventory_kpis(db, top=20)
+    with db.transaction() as conn:
+        rebuild(conn)
+    assert inventory_kpis(db, top=20) == before
+
+
+def test_older_summary_triggers_are_replaced_and_counts_rebuilt(tmp_path):
+    path = str(tmp_path / "old.db")
+    database = Database(path)
+    _add(database, "Acetone", "Solvent", "GHS02 H225")
+    database.close()
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TRIGGER chemicals_summary_ai")
+    conn.execute("CREATE TRIGGER chemicals_summary_ai AFTER INSERT ON chemicals BEGIN SELECT 1; END")
+    conn.execute("UPDATE inventory_summary SET key = 'GHS02H225' WHERE dimension = 'ghs' AND key = 'GHS02'")
+    conn.commit()
+    conn.close()
+    database = Database(path)
+    try:
+        assert _ghs(database) == {"GHS02": 1, "H225": 1}
+    finally:
+        database.close()
@@ -0,0 +1,117 @@
+import sqlite3
+
+import pytest
+
+from app.database import Database
+from app.sync import set_site, peers, export_changeset, apply_changeset, conflicts, resolve_conflict
+
+
+def _insert(db, name, quantity="1 L"):
+    return db.insert("INSERT INTO chemicals (name, quantity) VALUES (?, ?)", (name, quantity))
+
+
+def _names(db):
+    return [r[0] for r in db.query("SELECT name FROM chemicals ORDER BY name", cache=False)]
+
+
+@pytest.fixture
+def site_b(tmp_path):
+    database = Database(str(tmp_path / "b.db"))
+    set_site(database, "b")
+    yield database
+    database.close()
+
+
+def test_first_export_is_full_even_with_an_empty_log(db, tmp_path):
+    set_site(db, "a")
+    first = export_changeset(db, "b", tmp_path / "1.gz")
+    assert first.full and first.changes == 0
+    assert peers(db)[0][1] == 0
+
+    _insert(db, "Acetone")
+    second = export_changeset(db, "b", tmp_path / "2.gz")
+    assert not second.full
+    assert (second.changes, second.from_seq) == (1, 0)
+
+
+def test_sync_point_is_null_until_the_first_export(db, site_b, tmp_path):
+    set_site(db, "a")
+    _insert(db, "Acetone")
+    export_changeset(db, "b", tmp_path / "1.gz")
+    apply_changeset(site_b, tmp_path / "1.gz")
+    # b has only received from a: its first changeset for a is still a full one.
+    assert peers(site_b)[0][:2] == ("a", None)
+    assert export_changeset(site_b, "a", tmp_path / "2.gz").full
+
+
+def test_old_sync_peers_table_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE sync_peers
+                    (site TEXT PRIMARY KEY, sent_seq INTEGER NOT NULL DEFAULT 0,
+                     received_seq INTEGER NOT NULL DEFAULT 0, last_sent TEXT, last_received TEXT)""")
+    conn.execute("INSERT INTO sync_peers VALUES ('never', 0, 4, NULL, '2026-01-01T00:00:00')")
+    conn.execute("INSERT INTO sync_peers VALUES ('empty', 0, 0, '2026-01-01T00:00:00', NULL)")
+    conn.commit()
+    conn.close()
+    database = Database(path)
+    try:
+        assert [r[:3] for r in peers(database)] == [("empty", 0, 0), ("never", None, 4)]
+    finally:
+        database.close()
+
+
+def test_changes_flow_both_ways(db, site_b, tmp_path):
+    set_site(db, "a")
+    _insert(db, "Acetone")
+    export_changeset(db, "b", tmp_path / "1.gz")
+    assert apply_changeset(site_b, tmp_path / "1.gz").applied == 1
+
+    _insert(site_b, "Benzene")
+    export_changeset(site_b, "a", tmp_path / "2.gz")
+    result = apply_changeset(db, tmp_path / "2.gz")
+    assert (result.applied, result.conflicts) == (1, 0)
+    assert _names(db) == _names(site_b) == ["Acetone", "Benzene"]
+
+
+def _edited_on_both_sides(db, site_b, tmp_path):
+    set_site(db, "a")
+    row_id = _insert(db, "Acetone", "1 L")
+    export_changeset(db, "b", tmp_path / "1.gz")
+    apply_changeset(site_b, tmp_path / "1.gz")
+    db.update("UPDATE chemicals SET quantity = '2 L' WHERE id = ?", (row_id,))
+    site_b.update("UPDATE chemicals SET quantity = '3 L' WHERE name = 'Acetone'")
+    export_changeset(db, "b", tmp_path / "2.gz")
+    return apply_changeset(site_b, tmp_path / "2.gz")
+
+
+def test_edits_on_both_sides_conflict(db, site_b, tmp_path):
+    result = _edited_on_both_sides(db, site_b, tmp_path)
+    assert (result.applied, result.conflicts) == (0, 1)
+    (conflict,) = conflicts(site_b)
+    assert (conflict[1], conflict[2], conflict[4]) == ("a", "chemicals", "update")
+    # The local edit stays until the conflict is resolved.
+    assert site_b.query("SELECT quantity FROM chemicals", cache=False) == [("3 L",)]
+
+
+def test_resolving_a_conflict_with_theirs(db, site_b, tmp_path):
+    _edited_on_both_sides(db, site_b, tmp_path)
+    conflict_id = conflicts(site_b)[0][0]
+    assert resolve_conflict(site_b, conflict_id, theirs=True)
+    assert site_b.query("SELECT quantity FROM chemicals", cache=False) == [("2 L",)]
+    assert conflicts(site_b) == []
+    assert not resolve_conflict(site_b, conflict_id, theirs=True)
+
+
+def test_delete_of_a_row_edited_here_conflicts(db, site_b, tmp_path):
+    set_site(db, "a")
+    row_id = _insert(db, "Acetone")
+    export_changeset(db, "b", tmp_path / "1.gz")
+    apply_changeset(site_b, tmp_path / "1.gz")
+    db.update("DELETE FROM chemicals WHERE id = ?", (row_id,))
+    site_b.update("UPDATE chemicals SET quantity = '3 L' WHERE name = 'Acetone'")
+    export_changeset(db, "b", tmp_path / "2.gz")
+    result = apply_changeset(site_b, tmp_path / "2.gz")
+    assert result.conflicts == 1
+    assert conflicts(site_b)[0][4] == "delete"
+    assert _names(site_b) == ["Acetone"]
@@ -0,0 +1,46 @@
+from app.importer import TABLE_COLUMNS
+from app.triggers import bulk_insert, deferred_triggers
+
+ROWS = [
+    ("Acetone", "Propanone; Dimethyl ketone", "Solvent", "C3H6O / 58.08", "2.5 L", "GHS02, GHS07", "2030-01-01"),
+    ("Mercury(II) chloride", "Sublimate", "Toxic", "HgCl2", "100 g", "H300 H373; P260", "2026-05-01"),
+    ("Unknown", "", "", "", "a lot", "", ""),
+]
+DERIVED = ["SELECT id, qty_value, qty_unit, formula, mol_weight, ghs_mask, version FROM chemicals ORDER BY id",
+           "SELECT * FROM chemicals_elements ORDER BY item_id, element",
+           "SELECT * FROM chemicals_hazard_codes ORDER BY item_id, code",
+           "SELECT * FROM inventory_summary WHERE tbl = 'chemicals' ORDER BY dimension, key",
+           "SELECT term, items FROM chemicals_terms ORDER BY term",
+           "SELECT tbl, row_id, op, version FROM change_log ORDER BY seq",
+           "SELECT rowid FROM chemicals_fts WHERE chemicals_fts MATCH 'propanone'"]
+
+
+def _insert(conn):
+    cols = TABLE_COLUMNS["chemicals"]
+    conn.executemany(f"INSERT INTO chemicals ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", ROWS)
+
+
+def test_every_feature_registers_its_insert_trigger():
+    names = set(deferred_triggers("chemicals"))
+    assert {"chemicals_fts_ai", "chemicals_qty_ai", "chemicals_summary_ai", "chemicals_changes_ai",
+            "chemicals_terms_ai", "chemicals_formula_ai", "chemicals_hazard_ai"} <= names
+    assert "biological_formula_ai" not in deferred_triggers("biological")
+
+
+def test_bulk_insert_matches_per_row_triggers(db, tmp_path):
+    from app.database import Database
+    with db.transaction() as conn:
+        _insert(conn)
+    expected = [db.query(sql, cache=False) for sql in DERIVED]
+    assert all(expected)
+
+    other = Database(str(tmp_path / "bulk.db"))
+    try:
+        with other.transaction() as conn, bulk_insert(conn, "chemicals"):
+            _insert(conn)
+        assert [other.query(sql, cache=False) for sql in DERIVED] == expected
+        # The triggers are back afterwards
+        names = {r[0] for r in other.query("SELECT name FROM sqlite_master WHERE type='trigger'", cache=False)}
+        assert set(deferred_triggers("chemicals")) <= names
+    finally:
+        other.close()